@@ -29,3 +29,23 @@ app.conf.broker_connection_retry_on_startup = True
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+# Periodic jobs; DatabaseScheduler syncs these entries into django_celery_beat.
+app.conf.beat_schedule = {
+    'reconcile-category-facets': {
+        'task': 'courses.tasks.reconcile_category_facets',
+        'schedule': crontab(minute=15),
+    },
+    'flush-course-views': {
+        'task': 'courses.tasks.flush_course_views',
+        'schedule': crontab(),
+    },
+    'expire-upload-sessions': {
+        'task': 'mediafiles.tasks.expire_upload_sessions',
+        'schedule': crontab(minute=30),
+    },
+    'collect-unreferenced-blobs': {
+        'task': 'mediafiles.tasks.collect_unreferenced_blobs',
+        'schedule': crontab(minute=45, hour=3),
+    },
+}
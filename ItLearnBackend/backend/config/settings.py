@@ -1,5 +1,5 @@
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import watchtower
 import boto3
 from datetime import timedelta
@@ -78,6 +78,7 @@ INSTALLED_APPS = [
     'courses',
     'my_stripe',
     'payments',
+    'mediafiles',
 ]
 
 # ==========================
@@ -121,6 +122,17 @@ REST_AUTH = {
 }
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
         'rest_framework_simplejwt.authentication.JWTAuthentication',    
     ],
@@ -249,6 +261,31 @@ else:
         }
     }
 
+# ==========================
+# CACHE
+# ==========================
+# django_prometheus backends export hit/miss counters on /metrics.
+if 'pytest' in sys.argv[0]:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_prometheus.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_prometheus.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_CACHE_URL', cast=str, default='redis://redis:6379/1'),
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+
+# Seconds a cached catalog page / course detail lives before it is rebuilt,
+# even if no invalidation arrived.
+COURSE_CACHE_TIMEOUT = config('COURSE_CACHE_TIMEOUT', cast=int, default=300)
+
 # ==========================
 # CELERY
 # ==========================
@@ -302,10 +339,44 @@ MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Hand media transfers to the front proxy: None, 'x-accel-redirect' (nginx) or 'x-sendfile'.
+MEDIA_OFFLOAD = config('MEDIA_OFFLOAD', default=None)
+# nginx `internal` location aliased to MEDIA_ROOT, used with x-accel-redirect.
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Media under these prefixes is only served through signed URLs.
+MEDIA_PROTECTED_PREFIXES = ['uploads/lessons/']
+MEDIA_SIGNED_URL_TTL = 300  # seconds
+# CDN hosts whose lesson videos may be probed for metadata (mediafiles/mp4.py), over https only.
+MEDIA_PROBE_HOSTS = config('MEDIA_PROBE_HOSTS', cast=Csv(), default='')
+
+# Resumable uploads (mediafiles.UploadSession). Part files live outside MEDIA_ROOT until finalized.
+RESUMABLE_UPLOAD_DIR = config('RESUMABLE_UPLOAD_DIR', default=os.path.join(BASE_DIR, 'uploads_incomplete'))
+RESUMABLE_UPLOAD_MAX_SIZE = 20 * 1024 ** 3  # 20GB per file
+RESUMABLE_UPLOAD_MAX_CHUNK = 64 * 1024 ** 2  # 64MB per PUT
+RESUMABLE_UPLOAD_EXPIRY = 24 * 60 * 60  # seconds without a chunk before an upload is dropped
+
+# Uploads are stored once per content and reference-counted; see mediafiles/storage.py.
+MEDIA_BLOB_GC_GRACE = 24 * 60 * 60  # seconds a blob stays unreferenced before it is removed
+MEDIA_BLOB_GC_BATCH = 500  # blobs removed per transaction
+
+# 'local' keeps media under MEDIA_ROOT; 's3' puts it on an S3-compatible bucket (mediafiles/s3.py).
+MEDIA_STORAGE = config('MEDIA_STORAGE', cast=str, default='local')
+AWS_STORAGE_BUCKET_NAME = config('AWS_STORAGE_BUCKET_NAME', cast=str, default='itlearn-media')
+AWS_S3_ENDPOINT_URL = config('AWS_S3_ENDPOINT_URL', default=None)  # e.g. http://minio:9000
+AWS_S3_REGION_NAME = config('AWS_S3_REGION_NAME', cast=str, default='us-east-1')
+AWS_S3_ACCESS_KEY_ID = config('AWS_S3_ACCESS_KEY_ID', default=None)
+AWS_S3_SECRET_ACCESS_KEY = config('AWS_S3_SECRET_ACCESS_KEY', default=None)
+AWS_S3_CUSTOM_DOMAIN = config('AWS_S3_CUSTOM_DOMAIN', default=None)  # CDN in front of the bucket
+AWS_S3_QUERYSTRING_AUTH = config('AWS_S3_QUERYSTRING_AUTH', cast=bool, default=False)  # presign every media URL
+AWS_S3_MAX_WORKERS = config('AWS_S3_MAX_WORKERS', cast=int, default=8)  # parallel part uploads per file
+AWS_S3_MULTIPART_THRESHOLD = 16 * 1024 ** 2
+AWS_S3_MULTIPART_CHUNKSIZE = 16 * 1024 ** 2
+AWS_S3_DIRECT_UPLOAD_TTL = 6 * 60 * 60  # seconds the presigned part URLs stay valid
+
 STORAGES = {
     "default": {
-        "BACKEND": "django.core.files.storage.FileSystemStorage",  # For media files
-        "LOCATION": "media/",  # Ensure this matches your MEDIA_ROOT
+        # For media files: under MEDIA_ROOT, or on the bucket.
+        "BACKEND": "mediafiles.s3.S3Storage" if MEDIA_STORAGE == 's3' else "mediafiles.storage.ContentAddressedStorage",
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",  # For static files
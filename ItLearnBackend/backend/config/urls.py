@@ -1,7 +1,8 @@
 
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+import re
+from django.urls import path, include, re_path
+from django.views.decorators.http import require_safe
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework.permissions import AllowAny
@@ -9,6 +10,8 @@ from courses import urls as courses_urls
 from my_stripe import urls as stripe_urls
 from django.conf import settings
 from useraccounts import urls as useraccounts_urls
+from mediafiles import urls as mediafiles_urls
+from mediafiles.views import serve_media
 
 
 schema_view = get_schema_view(
@@ -30,7 +33,10 @@ urlpatterns = [
     path('api/user/accounts/', include(useraccounts_urls)),
     path('api/courses/', include(courses_urls)),
     path('api/stripe/', include(stripe_urls)),
+    path('api/media/', include(mediafiles_urls)),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Range-capable media serving; see mediafiles/serving.py.
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.*)$', require_safe(serve_media), name='media'),
+]
 
@@ -1,7 +1,38 @@
 import pytest
+from django.core.cache import cache
 from rest_framework.test import APIClient
 
 
 @pytest.fixture
 def api_client():
-    return APIClient()
\ No newline at end of file
+    return APIClient()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """The locmem cache outlives each test's database rollback; start every test empty."""
+    cache.clear()
+
+
+@pytest.fixture
+def query_budget(django_assert_max_num_queries):
+    """
+    Assert that an endpoint stays within a fixed number of queries no matter
+    how much data sits behind it, e.g. "the catalog list costs at most 2
+    queries at any N".
+
+    ``seed(n)`` grows the data set to ``n`` rows before each measurement and
+    ``request()`` performs the call under test. Returns the last response.
+    """
+    def check(budget, request, seed=None, sizes=(1,)):
+        response = None
+        for size in sizes:
+            if seed is not None:
+                seed(size)
+                # Budgets describe the uncached path; bulk seeding skips invalidation signals.
+                cache.clear()
+            with django_assert_max_num_queries(budget):
+                response = request()
+            assert response.status_code < 400, response.data
+        return response
+    return check
@@ -0,0 +1,106 @@
+"""
+Fixed-size WebP/JPEG derivatives of uploaded images (course previews, avatars).
+
+Derivatives are rendered by Celery tasks after the upload commits and recorded
+on the owning row as a JSON document::
+
+    {"source": <file name>, "sha256": <source digest>,
+     "files": {"card": {"webp": <path>, "jpeg": <path>}, ...}}
+
+Replacing or clearing the source releases the recorded derivatives and
+clears the record (mediafiles.signals), so until the task has run for a new
+upload no derivatives are listed.
+"""
+import hashlib
+import posixpath
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from mediafiles.signing import absolute_url
+
+# Format name -> (Pillow format, save options, file extension).
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}, 'webp'),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}, 'jpg'),
+}
+
+
+def file_sha256(fieldfile):
+    digest = hashlib.sha256()
+    with fieldfile.open('rb') as source:
+        for chunk in source.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def needs_refresh(fieldfile, record):
+    """Cheap check for signal handlers: has the stored file changed since ``record`` was made?"""
+    source = fieldfile.name or None
+    return source != (record or {}).get('source')
+
+
+def render_derivatives(fieldfile, sizes, prefix):
+    """
+    Render every ``{name: (width, height)}`` in ``sizes`` in every format,
+    center-cropped to the exact size, and store them under ``prefix``.
+    Returns ``{name: {format: path}}``.
+    """
+    with fieldfile.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    files = {}
+    for name, size in sizes.items():
+        resized = ImageOps.fit(image, size, Image.LANCZOS)
+        files[name] = {}
+        for format_name, (pillow_format, options, extension) in FORMATS.items():
+            output = resized.convert('RGB') if pillow_format == 'JPEG' else resized
+            buffer = BytesIO()
+            output.save(buffer, pillow_format, **options)
+            path = posixpath.join(prefix, f'{name}.{extension}')
+            files[name][format_name] = fieldfile.storage.save(path, ContentFile(buffer.getvalue()))
+    return files
+
+
+def refresh_derivatives(fieldfile, sizes, prefix, record):
+    """
+    The derivative record for ``fieldfile``'s current content, or ``None`` if
+    ``record`` is already current. The files of the record being replaced
+    were released when its source changed.
+    """
+    if not needs_refresh(fieldfile, record):
+        return None
+    if not fieldfile:
+        return {}
+    sha256 = file_sha256(fieldfile)
+    files = render_derivatives(fieldfile, sizes, posixpath.join(prefix, sha256[:16]))
+    return {'source': fieldfile.name, 'sha256': sha256, 'files': files}
+
+
+def derivative_paths(record):
+    """Every stored path in a derivative record."""
+    return [path for formats in (record or {}).get('files', {}).values() for path in formats.values()]
+
+
+def derivative_urls(record):
+    """``{name: {format: absolute URL}}`` for a derivative record; empty until rendered."""
+    if not record:
+        return {}
+    return {
+        name: {format_name: absolute_url(default_storage.url(path)) for format_name, path in formats.items()}
+        for name, formats in record.get('files', {}).items()
+    }
+
+
+class DerivativeURLsField(serializers.Field):
+    """Read-only field rendering a derivative record column as URLs."""
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return derivative_urls(value)
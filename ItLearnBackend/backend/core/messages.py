@@ -2,6 +2,36 @@ COURSE_MESSAGES = {
     "create_success": "Course successfully created.",
     "unpublish_success": "Course successfully unpublished.",
     "restore_success": "Course successfully restored.",
+    "bulk_unpublish_success": "Bulk unpublish finished; see the result for each id.",
+    "bulk_restore_success": "Bulk restore finished; see the result for each id.",
     "not_found": "Course not found or you do not have permission.",
     "authentication_required": "Authentication required.",
+    "invalid_cursor": "Invalid or expired page cursor.",
+    "invalid_page": "Invalid page.",
+    "search_query_required": "Provide a search query with the `q` parameter.",
+    "rating_success": "Thank you for rating this course.",
+    "rating_requires_enrollment": "Only students who purchased this course can rate it.",
+    "progress_batch_success": "Progress synced.",
+    "videos_reordered": "Lessons reordered.",
+    "videos_created": "Lessons added.",
+    "invalid_video_order": "The new order must list every lesson of the course exactly once.",
+    "export_not_found": "Unknown export. Choose enrollments or progress.",
+    "invalid_export": "`output` must be csv or ndjson and `course` a course id.",
+}
+
+MEDIA_MESSAGES = {
+    "video_not_found": "Lesson not found.",
+    "purchase_required": "Buy this course or subscribe to watch this lesson.",
+    "upload_not_found": "Upload not found.",
+    "upload_offset_mismatch": "Upload-Offset does not match the bytes received so far.",
+    "upload_checksum_mismatch": "Chunk checksum does not match; resend it.",
+    "upload_invalid_headers": "Send Content-Length, Upload-Offset and an optional `Upload-Checksum: sha256 <base64>`.",
+    "upload_chunk_too_large": "Chunk exceeds the maximum chunk size.",
+    "upload_incomplete": "The upload is not complete yet.",
+    "upload_completed": "Upload complete.",
+    "direct_upload_unavailable": "Direct uploads need media on S3-compatible storage.",
+    "direct_upload_invalid_token": "This upload token is invalid or has expired.",
+    "direct_upload_aborted": "Upload aborted.",
+    "direct_upload_failed": "The storage rejected this upload; check the parts and try again.",
+    "direct_upload_size_mismatch": "The uploaded file does not match the declared size and was discarded.",
 }
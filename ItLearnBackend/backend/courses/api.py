@@ -1,19 +1,39 @@
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework.views import APIView
-from .models import Course, Video, CoursesProgress
+from .models import CategoryFacet, Course, CourseEnrollment, CourseRating, Video, CoursesProgress
 from rest_framework.generics import RetrieveAPIView
-from .serializers import CourseDynamicSerializer
+from .serializers import (
+    CategoryFacetSerializer, CourseBulkPublishSerializer, CourseDynamicSerializer, CourseRatingSerializer, ProgressBatchSerializer,
+    VideoIngestSerializer, VideoReorderSerializer, VideoSerializer, LessonSerializer,
+)
+from .pagination import CourseKeysetPagination, SearchPagination, VideoKeysetPagination
+from .search import search_course_ids
+from .cache import catalog_page_key, course_detail_key, course_videos_key, get_or_build
+from .counters import record_view, viewer_key
+from .exports import EXPORTS, FORMATS, stream_export
+from .etags import catalog_validators, course_validators, course_videos_validators, negotiated_etag, not_modified, set_validators
 from core.messages import COURSE_MESSAGES
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from useraccounts.mixins import ParserMixinAPI
+from useraccounts.mixins import ParserMixinAPI, SparseFieldsetMixin
+from useraccounts.serializers import model_columns
 from rest_framework import status
 from drf_yasg.utils import swagger_auto_schema
-from .swagger_usecases import response_recovery_course, response_soft_delete, get_all_courses_response, retrieve_course_response
+from .swagger_usecases import response_recovery_course, response_soft_delete, response_bulk_publish, get_all_courses_response, retrieve_course_response, catalog_pagination_params, search_params, category_facets_response, response_rate_course, response_progress_batch, response_reorder_videos, response_ingest_videos, course_videos_response, video_pagination_params, course_fields_param, export_params, export_response
 
-class CourseAPI(ParserMixinAPI, APIView):
+class CourseAPI(ParserMixinAPI, SparseFieldsetMixin, APIView):
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
+    LIST_FIELDS = [
+        'title', 'description', 'category', 'instructor', 'created_at', 'preview_image', 'image_derivatives',
+        'preview_video', 'enrolled_students', 'total_views', 'average_rating', 'rating_count',
+    ]
+    # What ``?fields=`` may select; LIST_FIELDS is the default selection.
+    SELECTABLE_FIELDS = LIST_FIELDS + ['price', 'updated_at']
 
     def get_permissions(self):
         """
@@ -45,16 +65,88 @@ class CourseAPI(ParserMixinAPI, APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @swagger_auto_schema(
-        operation_description='Retrieve a list of all available courses.',
+        operation_description=(
+            'Retrieve a page of available courses, newest first. Follow `next` to read further pages. '
+            '`total_views` is read fresh on every full response but trails live views by up to a minute.'
+        ),
+        manual_parameters=catalog_pagination_params + [course_fields_param],
         responses={200: get_all_courses_response}
     )
     def get(self, request):
-        qs = Course.objects.all()
-        serializer = CourseDynamicSerializer(
-            qs,
-            many=True,
-            fields=['title', 'description', 'category', 'instructor', 'created_at', 'preview_image', 'preview_video']
+        fields = self.requested_fields(request, self.LIST_FIELDS, self.SELECTABLE_FIELDS)
+        paginator = CourseKeysetPagination()
+        page_size = paginator.get_page_size(request)
+        cursor = request.query_params.get(paginator.cursor_query_param)
+
+        etag, last_modified = catalog_validators(fields, page_size, cursor)
+        etag = negotiated_etag(request, etag)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        key = catalog_page_key(fields, page_size, cursor)
+        built = []
+        page = get_or_build('list', key, lambda: built.append(True) or self.build_page(request, paginator, fields))
+        results = page['results']
+        if 'total_views' in fields and not built:
+            # A page built just now already holds the current counts.
+            results = self.overlay_views(results, page['ids'])
+        response = paginator.get_page_response(request, results, page['next_cursor'])
+        return set_validators(response, etag, last_modified)
+
+    @staticmethod
+    def overlay_views(results, ids):
+        # Views move without bumping updated_at, so the cached page may hold old counts.
+        views = dict(Course.objects.filter(pk__in=ids).values_list('pk', 'total_views'))
+        return [{**row, 'total_views': views.get(pk, row['total_views'])} for pk, row in zip(ids, results)]
+
+    def build_page(self, request, paginator, fields):
+        # Read-only rows go straight from .values() to the serializer's output,
+        # without building Course and User instances; unselected columns are never read.
+        plan = CourseDynamicSerializer.values_plan(fields)
+        rows = paginator.paginate_queryset(
+            Course.objects.values(*plan.columns, 'id', 'created_at'), request, view=self
         )
+        return {'results': plan.render(rows), 'ids': [row['id'] for row in rows], 'next_cursor': paginator.next_cursor}
+
+
+class CourseSearchAPI(SparseFieldsetMixin, APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    FIELDS = CourseAPI.LIST_FIELDS
+    SELECTABLE_FIELDS = CourseAPI.SELECTABLE_FIELDS
+    MAX_QUERY_LENGTH = 200
+
+    @swagger_auto_schema(
+        operation_description='Full-text search over published courses, ranked by title and description matches.',
+        manual_parameters=search_params + [course_fields_param],
+        responses={200: get_all_courses_response}
+    )
+    def get(self, request):
+        fields = self.requested_fields(request, self.FIELDS, self.SELECTABLE_FIELDS)
+        query = request.query_params.get('q', '').strip()[:self.MAX_QUERY_LENGTH]
+        if not query:
+            return Response({'error': COURSE_MESSAGES['search_query_required']}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchPagination()
+        ids = paginator.paginate_ids(lambda limit, offset: search_course_ids(query, limit, offset), request)
+        plan = CourseDynamicSerializer.values_plan(fields)
+        courses = {row['id']: row for row in Course.objects.filter(pk__in=ids).values(*plan.columns, 'id')}
+        ranked = [courses[pk] for pk in ids if pk in courses]
+        return paginator.get_paginated_response(plan.render(ranked))
+
+
+class CategoryFacetAPI(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        operation_description='Number of published courses per category.',
+        responses={200: category_facets_response}
+    )
+    def get(self, request):
+        facets = CategoryFacet.objects.filter(course_count__gt=0).order_by('category')
+        serializer = CategoryFacetSerializer(facets, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -86,33 +178,246 @@ class CourseUpdateAPI(APIView):
             return Response({'error': COURSE_MESSAGES['not_found']}, status=status.HTTP_404_NOT_FOUND)
 
 
-class CourseDetailAPI(RetrieveAPIView):
+class CourseBulkUpdateAPI(APIView):
+    """Unpublish (DELETE) or restore (PATCH) many of the instructor's courses with one UPDATE."""
+
+    @swagger_auto_schema(
+        operation_description='Unpublish several of your courses; reports the outcome per id.',
+        request_body=CourseBulkPublishSerializer,
+        responses=response_bulk_publish
+    )
+    def delete(self, request):
+        return self.set_published(request, False, 'bulk_unpublish_success')
+
+    @swagger_auto_schema(
+        operation_description='Restore several of your unpublished courses; reports the outcome per id.',
+        request_body=CourseBulkPublishSerializer,
+        responses=response_bulk_publish
+    )
+    def patch(self, request):
+        return self.set_published(request, True, 'bulk_restore_success')
+
+    def set_published(self, request, published, message):
+        serializer = CourseBulkPublishSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        results = Course.set_published(request.user, ids, published)
+        return Response({
+            'success': COURSE_MESSAGES[message],
+            'results': [{'id': pk, 'status': results[pk]} for pk in ids],
+        }, status=status.HTTP_200_OK)
+
+
+class VideoReorderAPI(APIView):
+    @swagger_auto_schema(
+        operation_description="Reorder a course's lessons; `order` lists every lesson id in the new order.",
+        request_body=VideoReorderSerializer,
+        responses=response_reorder_videos
+    )
+    def post(self, request, pk):
+        serializer = VideoReorderSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not Course.all_objects.filter(pk=pk, instructor=request.user).exists():
+            return Response({'error': COURSE_MESSAGES['not_found']}, status=status.HTTP_404_NOT_FOUND)
+
+        if not Video.reorder(pk, serializer.validated_data['order']):
+            return Response({'error': COURSE_MESSAGES['invalid_video_order']}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'success': COURSE_MESSAGES['videos_reordered']}, status=status.HTTP_200_OK)
+
+
+class VideoIngestAPI(APIView):
+    @swagger_auto_schema(
+        operation_description='Add many lessons to a course from a manifest in one request. '
+                              'Lessons without an `order` are appended after the last one.',
+        request_body=VideoIngestSerializer,
+        responses=response_ingest_videos
+    )
+    def post(self, request, pk):
+        serializer = VideoIngestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not Course.all_objects.filter(pk=pk, instructor=request.user).exists():
+            return Response({'error': COURSE_MESSAGES['not_found']}, status=status.HTTP_404_NOT_FOUND)
+
+        videos = Video.ingest(pk, [Video(**item) for item in serializer.validated_data['videos']])
+        return Response({
+            'success': COURSE_MESSAGES['videos_created'],
+            'videos': VideoSerializer(videos, many=True).data,
+        }, status=status.HTTP_201_CREATED)
+
+
+class CourseRatingAPI(APIView):
+    @swagger_auto_schema(
+        operation_description='Rate a purchased course from 1 to 5; rating again replaces the earlier score.',
+        request_body=CourseRatingSerializer,
+        responses=response_rate_course
+    )
+    def post(self, request, pk):
+        serializer = CourseRatingSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if not Course.objects.filter(pk=pk).exists():
+            return Response({'error': COURSE_MESSAGES['not_found']}, status=status.HTTP_404_NOT_FOUND)
+        if not CourseEnrollment.objects.filter(course_id=pk, created_by=request.user, has_paid=True).exists():
+            return Response({'error': COURSE_MESSAGES['rating_requires_enrollment']}, status=status.HTTP_403_FORBIDDEN)
+
+        CourseRating.rate(request.user, pk, serializer.validated_data['score'])
+        metrics = Course.objects.values('average_rating', 'rating_count').get(pk=pk)
+        return Response({'success': COURSE_MESSAGES['rating_success'], **metrics}, status=status.HTTP_200_OK)
+
+
+class ProgressBatchAPI(APIView):
+    @swagger_auto_schema(
+        operation_description='Record many completed videos at once, e.g. when an offline player syncs. '
+                              'Progress is recomputed once per affected course.',
+        request_body=ProgressBatchSerializer,
+        responses=response_progress_batch
+    )
+    def post(self, request):
+        serializer = ProgressBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        items = serializer.validated_data['items']
+
+        # One query keeps only videos that belong to the stated course and a course the user paid for.
+        paid = CourseEnrollment.objects.filter(course=OuterRef('course_id'), created_by=request.user, has_paid=True)
+        video_courses = dict(
+            Video.objects.filter(pk__in={item['video'] for item in items})
+            .filter(Exists(paid)).values_list('pk', 'course_id')
+        )
+        now = timezone.now()
+        completions = [
+            (item['course'], item['video'], item.get('completed_at') or now)
+            for item in items if video_courses.get(item['video']) == item['course']
+        ]
+
+        progress = []
+        if completions:
+            progress_ids = CoursesProgress.record_completions(request.user, completions)
+            progress = [
+                {'course': row.pop('course_id'), **row}
+                for row in CoursesProgress.objects.filter(pk__in=progress_ids).order_by('course_id')
+                .values('course_id', 'completed_count', 'progress_percentage', 'completed_at')
+            ]
+        return Response({
+            'success': COURSE_MESSAGES['progress_batch_success'],
+            'accepted': len(completions),
+            'skipped': len(items) - len(completions),
+            'progress': progress,
+        }, status=status.HTTP_200_OK)
+
+
+class CourseDetailAPI(SparseFieldsetMixin, RetrieveAPIView):
+    permission_classes = [AllowAny]
     lookup_field = 'pk'
-    queryset = Course.objects.prefetch_related('videos').all()
     serializer_class = CourseDynamicSerializer
+    FIELDS = [
+        'title', 'description', 'category', 'instructor', 'created_at', 'image_derivatives', 'videos',
+        'enrolled_students', 'total_views', 'average_rating', 'rating_count',
+    ]
+    SELECTABLE_FIELDS = FIELDS + ['price', 'preview_image', 'preview_video', 'video_metadata', 'updated_at']
+
+    def get_queryset(self):
+        return CourseDynamicSerializer.build_queryset(Course.objects.all(), self.fields)
 
     @swagger_auto_schema(
-        operation_description='Retrieve detailed course information',
+        operation_description=(
+            'Retrieve detailed course information; signed-in users also get their progress. '
+            '`total_views` is read fresh on every full response but trails live views by up to a minute.'
+        ),
+        manual_parameters=[course_fields_param],
         responses={200: retrieve_course_response}
     )
     def get(self, request, *args, **kwargs):
-        course = self.get_object()
+        self.fields = self.requested_fields(request, self.FIELDS, self.SELECTABLE_FIELDS)
         user = request.user
+        course_id = self.kwargs[self.lookup_field]
 
-        # Fetch progress if the user is authenticated
-        progress = None
-        # Serialize course details
-        serializer = self.get_serializer(
-            course, 
-            fields=['title', 'description', 'category', 'instructor', 'created_at', 'videos']
-        )
-        course_data = serializer.data
+        # The course body is user-independent and cached per course; signed-in
+        # users get their progress overlaid on top, read in one query.
+        progress = CoursesProgress.overlay(user, course_id) if user.is_authenticated else None
+
+        etag, last_modified, total_views = course_validators(course_id, self.fields, variant=progress)
+        etag = negotiated_etag(request, etag)
+        if etag is not None:
+            # Buffered in Redis and flushed by courses.tasks.flush_course_views.
+            record_view(course_id, viewer_key(request))
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            key = course_detail_key(course_id, self.fields)
+            course_data = dict(get_or_build('detail', key, self.build_course_data))
+            if 'total_views' in self.fields:
+                # Views move without bumping updated_at, so the cached body may hold an old count.
+                course_data['total_views'] = total_views
+            course_data['progress'] = progress
+            response = set_validators(Response(course_data), etag, last_modified)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def build_course_data(self):
+        serializer = self.get_serializer(self.get_object(), fields=self.fields)
+        return dict(serializer.data)
 
-        # Add progress information
-        course_data['progress'] = {
-            "current_video": progress.current_video.id if progress and progress.current_video else None,
-            "progress_percentage": progress.progress_percentage if progress else 0.0,
-            "completed_videos": [video.id for video in progress.completed_videos.all()] if progress else [],
-        } if progress else None
 
-        return Response(course_data)
+class CourseVideosAPI(APIView):
+    @swagger_auto_schema(
+        operation_description="Full lesson data for a course in playback order. Follow `next` to read further pages. "
+                              "Pages carrying signed preview URLs are sent without ETag and must not be stored.",
+        manual_parameters=video_pagination_params,
+        responses={200: course_videos_response}
+    )
+    def get(self, request, pk):
+        paginator = VideoKeysetPagination()
+        page_size = paginator.get_page_size(request)
+        cursor = request.query_params.get(paginator.cursor_query_param)
+
+        etag, last_modified = course_videos_validators(pk, page_size, cursor)
+        if etag is None:
+            return Response({'error': COURSE_MESSAGES['not_found']}, status=status.HTTP_404_NOT_FOUND)
+        etag = negotiated_etag(request, etag)
+
+        key = course_videos_key(pk, page_size, cursor)
+        page = get_or_build('videos', key, lambda: self.build_page(request, paginator, pk))
+        results = LessonSerializer.sign_urls(page['results'])
+        if results is not page['results']:
+            # A revalidated copy would keep URLs whose signatures have expired.
+            response = paginator.get_page_response(request, results, page['next_cursor'])
+            patch_cache_control(response, private=True, no_store=True)
+            return response
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        response = paginator.get_page_response(request, results, page['next_cursor'])
+        return set_validators(response, etag, last_modified)
+
+    def build_page(self, request, paginator, pk):
+        qs = Video.objects.filter(course_id=pk).only(*model_columns(Video, LessonSerializer.Meta.fields))
+        page = paginator.paginate_queryset(qs, request, view=self)
+        data = LessonSerializer(page, many=True, context={'sign_urls': False}).data
+        return {'results': list(data), 'next_cursor': paginator.next_cursor}
+
+
+class CourseExportAPI(APIView):
+    @swagger_auto_schema(
+        operation_description="Stream enrollments or progress as CSV or NDJSON. Staff export every course; instructors their own.",
+        manual_parameters=export_params,
+        responses=export_response
+    )
+    def get(self, request, name):
+        if name not in EXPORTS:
+            return Response({'error': COURSE_MESSAGES['export_not_found']}, status=status.HTTP_404_NOT_FOUND)
+        output = request.query_params.get('output', 'csv')
+        course_id = request.query_params.get('course')
+        if output not in FORMATS or (course_id is not None and not course_id.isdigit()):
+            return Response({'error': COURSE_MESSAGES['invalid_export']}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Rows are read through .iterator() as the client consumes the body, never all at once.
+        response = StreamingHttpResponse(
+            stream_export(name, output, user=request.user, course_id=course_id and int(course_id)),
+            content_type=FORMATS[output],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{name}.{output}"'
+        return response
@@ -0,0 +1,68 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from prometheus_client import Counter
+
+# Every cached catalog page embeds the current list generation and every cached
+# course detail embeds that course's version. Invalidation deletes the
+# generation / version keys; the next read re-seeds them with a fresh value, so
+# stale entries become unreachable and simply age out.
+LIST_GENERATION_KEY = 'courses:list:generation'
+
+cache_hits = Counter('courses_cache_hits_total', 'Catalog cache hits.', ['endpoint'])
+cache_misses = Counter('courses_cache_misses_total', 'Catalog cache misses.', ['endpoint'])
+cache_evictions = Counter('courses_cache_evictions_total', 'Catalog cache entries invalidated by course changes.', ['scope'])
+
+
+def detail_version_key(course_id):
+    return f'courses:detail:version:{course_id}'
+
+
+def fields_digest(fields):
+    return hashlib.md5(','.join(sorted(fields)).encode()).hexdigest()
+
+
+def _current(version_key):
+    return cache.get_or_set(version_key, time.time_ns, timeout=None)
+
+
+def catalog_page_key(fields, page_size, cursor):
+    generation = _current(LIST_GENERATION_KEY)
+    return f'courses:list:{generation}:{fields_digest(fields)}:{page_size}:{cursor or ""}'
+
+
+def course_detail_key(course_id, fields):
+    version = _current(detail_version_key(course_id))
+    return f'courses:detail:{course_id}:{version}:{fields_digest(fields)}'
+
+
+def course_videos_key(course_id, page_size, cursor):
+    # Lessons share the course's detail version, which every video change bumps.
+    version = _current(detail_version_key(course_id))
+    return f'courses:videos:{course_id}:{version}:{page_size}:{cursor or ""}'
+
+
+def get_or_build(endpoint, key, build):
+    """Return the cached payload under ``key``, building and storing it on a miss."""
+    payload = cache.get(key)
+    if payload is not None:
+        cache_hits.labels(endpoint=endpoint).inc()
+        return payload
+
+    cache_misses.labels(endpoint=endpoint).inc()
+    payload = build()
+    cache.set(key, payload, timeout=settings.COURSE_CACHE_TIMEOUT)
+    return payload
+
+
+def invalidate_courses(course_ids):
+    """Drop cached details for ``course_ids`` and every catalog page, in one round trip."""
+    course_ids = list(course_ids)
+    cache.delete_many([detail_version_key(pk) for pk in course_ids] + [LIST_GENERATION_KEY])
+    cache_evictions.labels(scope='detail').inc(len(course_ids))
+    cache_evictions.labels(scope='list').inc()
+
+
+def invalidate_course(course_id):
+    invalidate_courses([course_id])
@@ -43,4 +43,11 @@ def create_course_enrollment(db, create_course, create_user):
         total_price = course.price,
         stripe_checkout_id = Mock(return_value='mock_checkout_id')(),
     )
-    return course_enrollment
\ No newline at end of file
+    return course_enrollment
+
+@pytest.fixture(autouse=True)
+def view_store():
+    """Buffered view counters live in-process under pytest; start every test empty."""
+    from .counters import _local_store
+    _local_store.data.clear()
+    return _local_store
@@ -0,0 +1,71 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+from .cache import fields_digest
+from .models import Course
+
+
+def _validators(last_modified, *parts):
+    raw = ':'.join(str(part) for part in (last_modified, *parts))
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp
+
+
+def catalog_validators(fields, page_size, cursor):
+    """
+    Strong ETag and Last-Modified for a catalog page, from one aggregate over
+    published courses. Unpublishing changes the count; every other change,
+    including video edits, moves ``max(updated_at)``.
+    """
+    stats = Course.objects.aggregate(last_modified=Max('updated_at'), total=Count('id'))
+    return _validators(stats['last_modified'], 'list', stats['total'], fields_digest(fields), page_size, cursor or '')
+
+
+def course_validators(course_id, fields, variant=None):
+    """
+    Validators for one course detail plus its current view count, which is
+    deliberately not part of them; ``(None, None, None)`` if it is not published.
+    ``variant`` folds per-user parts of the response, such as progress, into the ETag.
+    """
+    row = Course.objects.filter(pk=course_id).values_list('updated_at', 'total_views').first()
+    if row is None:
+        return None, None, None
+    updated_at, total_views = row
+    return (*_validators(updated_at, 'detail', course_id, fields_digest(fields), variant), total_views)
+
+
+def course_videos_validators(course_id, page_size, cursor):
+    """Validators for a page of a published course's lessons; video edits move ``updated_at``."""
+    updated_at = Course.objects.filter(pk=course_id).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None, None
+    return _validators(updated_at, 'videos', course_id, page_size, cursor or '')
+
+
+def negotiated_etag(request, etag):
+    """
+    Strong ETags name one representation, so non-JSON renderings (msgpack)
+    get their own tag for the same data.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    if etag is None or renderer is None or renderer.format == 'json':
+        return etag
+    return f'{etag[:-1]}-{renderer.format}"'
+
+
+def not_modified(request, etag, last_modified):
+    """Return a 304 response when the client's copy is still current, else ``None``."""
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ['Accept'])
+    return response
@@ -0,0 +1,88 @@
+import csv
+import orjson
+from core.renderers import ORJSON_OPTIONS, encode_default
+from .models import Course, CourseEnrollment, CoursesProgress
+
+# Rows fetched per round trip; on PostgreSQL .iterator() reads them through a
+# server-side cursor, so memory stays flat however large the export is.
+CHUNK_SIZE = 2_000
+
+# Export name -> (model, [(header, column)]).
+EXPORTS = {
+    'enrollments': (CourseEnrollment, [
+        ('id', 'id'),
+        ('course_id', 'course_id'),
+        ('course_title', 'course__title'),
+        ('user_email', 'created_by__email'),
+        ('total_price', 'total_price'),
+        ('has_paid', 'has_paid'),
+        ('stripe_checkout_id', 'stripe_checkout_id'),
+        ('created_at', 'created_at'),
+    ]),
+    'progress': (CoursesProgress, [
+        ('id', 'id'),
+        ('course_id', 'course_id'),
+        ('course_title', 'course__title'),
+        ('user_email', 'user__email'),
+        ('completed_count', 'completed_count'),
+        ('progress_percentage', 'progress_percentage'),
+        ('started_at', 'started_at'),
+        ('completed_at', 'completed_at'),
+    ]),
+}
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def export_queryset(name, user=None, course_id=None):
+    """
+    Rows of export ``name`` as a ``values_list`` queryset. Staff see every
+    course; anyone else only the courses they instruct.
+    """
+    model, columns = EXPORTS[name]
+    queryset = model.objects.all()
+    if user is not None and not user.is_staff:
+        queryset = queryset.filter(course__in=Course.all_objects.filter(instructor=user))
+    if course_id is not None:
+        queryset = queryset.filter(course_id=course_id)
+    return queryset.order_by('pk').values_list(*(column for _, column in columns))
+
+
+class _Line:
+    """Write-through buffer so csv.writer hands back each line instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, headers):
+    writer = csv.writer(_Line())
+    yield writer.writerow(headers)
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) == CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def ndjson_chunks(rows, headers):
+    lines = []
+    for row in rows:
+        lines.append(orjson.dumps(dict(zip(headers, row)), default=encode_default, option=ORJSON_OPTIONS))
+        if len(lines) == CHUNK_SIZE:
+            lines.append(b'')
+            yield b'\n'.join(lines)
+            lines = []
+    if lines:
+        lines.append(b'')
+        yield b'\n'.join(lines)
+
+
+def stream_export(name, output, user=None, course_id=None):
+    """Yield export ``name`` in ``output`` format (csv or ndjson), one chunk of rows at a time."""
+    headers = [header for header, _ in EXPORTS[name][1]]
+    rows = export_queryset(name, user, course_id).iterator(chunk_size=CHUNK_SIZE)
+    if output == 'csv':
+        return csv_chunks(rows, headers)
+    return ndjson_chunks(rows, headers)
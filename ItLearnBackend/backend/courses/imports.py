@@ -0,0 +1,120 @@
+"""
+Bulk catalog import for ``manage.py import_courses``.
+
+Rows are read and validated one at a time and written per batch: one lookup
+resolves every instructor email in the batch, then one ``bulk_create`` each
+for courses and their videos. bulk_create() sends no signals, so the work the
+Course/Video signals would do (facet counts, FTS rows, cache) happens once per
+batch here instead.
+"""
+import csv
+import orjson
+from collections import Counter
+from django.db import transaction
+from useraccounts.models import User
+from .cache import invalidate_courses
+from .models import CategoryFacet, Course, Video
+from .search import index_courses
+from .serializers import CourseImportSerializer
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_csv(lines):
+    """CSV rows with a header; an optional ``videos`` column holds a JSON list of lessons."""
+    for row in csv.DictReader(lines):
+        # Empty cells mean "not given", so optional columns fall back to their defaults.
+        row = {key: value for key, value in row.items() if value != ''}
+        videos = (row.pop('videos', None) or '').strip()
+        if videos:
+            try:
+                row['videos'] = orjson.loads(videos)
+            except orjson.JSONDecodeError:
+                row['videos'] = videos  # Left for the serializer to reject.
+        yield row
+
+
+def read_jsonl(lines):
+    for line in lines:
+        if line.strip():
+            try:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError as exc:
+                yield exc
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def validated_rows(rows):
+    """Yield ``(line, data, errors)`` per row; exactly one of ``data``/``errors`` is set."""
+    for line, row in enumerate(rows, 1):
+        if isinstance(row, Exception):
+            yield line, None, {'non_field_errors': [str(row)]}
+            continue
+        serializer = CourseImportSerializer(data=row)
+        if serializer.is_valid():
+            yield line, serializer.validated_data, None
+        else:
+            yield line, None, serializer.errors
+
+
+def write_batch(batch):
+    """
+    Create the courses and lessons of ``batch`` (``(line, data)`` pairs).
+    Returns ``(courses, videos, errors)``; rows whose instructor is unknown
+    are skipped and reported in ``errors``.
+    """
+    emails = {data['instructor_email'] for _, data in batch}
+    instructors = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+
+    errors, courses, lessons = [], [], []
+    for line, data in batch:
+        instructor_id = instructors.get(data['instructor_email'])
+        if instructor_id is None:
+            errors.append((line, {'instructor_email': ['No user with this email.']}))
+            continue
+        videos = data.get('videos', [])
+        courses.append(Course(
+            title=data['title'], description=data['description'], category=data['category'],
+            price=data['price'], is_published=data.get('is_published', True),
+            instructor_id=instructor_id, video_count=len(videos),
+        ))
+        lessons.append(videos)
+    if not courses:
+        return 0, 0, errors
+
+    with transaction.atomic():
+        Course.all_objects.bulk_create(courses)
+        videos = [
+            Video(course_id=course.pk, **{'order': position, **video})
+            for course, course_videos in zip(courses, lessons)
+            for position, video in enumerate(course_videos, 1)
+        ]
+        Video.objects.bulk_create(videos)
+        Video.schedule_metadata(videos)
+        CategoryFacet.adjust(Counter(course.category for course in courses if course.is_published))
+        index_courses(courses)
+        transaction.on_commit(lambda: invalidate_courses([]))
+    return len(courses), len(videos), errors
+
+
+def import_catalog(rows, batch_size=500):
+    """
+    Validate and write ``rows`` (dicts, as produced by a reader) in batches.
+    Yields ``(courses, videos, errors)`` per batch, ``errors`` being
+    ``(line, errors)`` pairs, so callers can report progress as it goes.
+    """
+    batch, invalid = [], []
+    for line, data, errors in validated_rows(rows):
+        if errors is not None:
+            invalid.append((line, errors))
+            continue
+        batch.append((line, data))
+        if len(batch) == batch_size:
+            courses, videos, missing = write_batch(batch)
+            yield courses, videos, invalid + missing
+            batch, invalid = [], []
+    if batch or invalid:
+        courses, videos, missing = write_batch(batch) if batch else (0, 0, [])
+        yield courses, videos, invalid + missing
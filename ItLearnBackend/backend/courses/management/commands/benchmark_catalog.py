@@ -0,0 +1,220 @@
+import datetime
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from uuid import uuid4
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from core.renderers import ORJSONRenderer
+from courses.api import CourseAPI, CourseSearchAPI
+from courses.models import Course, CoursesProgress, Video
+from courses.pagination import CourseKeysetPagination
+from courses.search import index_courses
+from courses.serializers import CourseDynamicSerializer
+from useraccounts.mixins import DynamicFieldsMixin
+from useraccounts.models import User
+
+
+class Command(BaseCommand):
+    help = "Benchmark catalog read paths, serialization, rendering and progress writes against synthetic data. Everything is rolled back afterwards."
+
+    scenarios = ['pagination', 'search', 'progress', 'serialize', 'render']
+    # --sizes counts courses for the catalog scenarios and students for 'progress'.
+    default_sizes = {'progress': [1_000, 10_000], 'serialize': [10_000], 'render': [5_000]}
+
+    # Vocabulary for synthetic titles, so search terms have realistic selectivity.
+    words = [
+        'python', 'django', 'data', 'design', 'marketing', 'business', 'react', 'sql',
+        'machine', 'learning', 'cloud', 'security', 'testing', 'docker', 'finance', 'writing',
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=self.scenarios)
+        parser.add_argument('--sizes', nargs='+', type=int)
+        parser.add_argument('--videos', type=int, default=20, help="Lessons in the course for the 'progress' scenario.")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        self.options = options
+        if not options['sizes']:
+            options['sizes'] = self.default_sizes.get(options['scenario'], [1_000, 10_000, 100_000, 1_000_000])
+        self.factory = APIRequestFactory(SERVER_NAME='localhost')
+        with transaction.atomic():
+            self.instructor = User.objects.create(id=uuid4(), email=f'bench-{uuid4().hex}@example.com', name='Benchmark')
+            getattr(self, f"bench_{options['scenario']}")()
+            transaction.set_rollback(True)
+
+    def seed_courses(self, total):
+        """Top the catalog up to ``total`` published courses with bulk inserts."""
+        missing = total - Course.objects.count()
+        batch_size = self.options['batch_size']
+        while missing > 0:
+            size = min(batch_size, missing)
+            courses = Course.objects.bulk_create([
+                Course(
+                    title=self.synthetic_title(i),
+                    description='Synthetic course used for benchmarking.',
+                    category='Programming',
+                    price='19.99',
+                    instructor=self.instructor,
+                )
+                for i in range(missing - size, missing)
+            ], batch_size=batch_size)
+            index_courses(courses)
+            missing -= size
+
+    def synthetic_title(self, i):
+        words = self.words
+        return f'{words[i % len(words)]} {words[(i // len(words)) % len(words)]} course {i}'
+
+    def time_call(self, call):
+        samples = []
+        for _ in range(self.options['repeat']):
+            started = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+        return statistics.median(samples), p95
+
+    def report(self, label, median, p95):
+        self.stdout.write(f'{label:<40} median {median:8.2f} ms   p95 {p95:8.2f} ms')
+
+    def bench_pagination(self):
+        view = CourseAPI.as_view()
+        paginator = CourseKeysetPagination()
+        page_size = paginator.page_size
+
+        for size in sorted(self.options['sizes']):
+            self.seed_courses(size)
+            # Cursor pointing at the last page; OFFSET is only used here, to locate it.
+            anchor = Course.objects.order_by(*paginator.ordering).only('created_at')[size - page_size - 1]
+            deep_cursor = paginator.encode_cursor(anchor)
+
+            first = self.time_call(lambda: view(self.factory.get('/api/courses/get/')).render())
+            deep = self.time_call(lambda: view(self.factory.get('/api/courses/get/', {'cursor': deep_cursor})).render())
+            self.report(f'{size:>9} courses, first page', *first)
+            self.report(f'{size:>9} courses, last page', *deep)
+
+    def bench_search(self):
+        view = CourseSearchAPI.as_view()
+        queries = ['python', 'machine learning', 'docker security', 'fin']
+
+        for size in sorted(self.options['sizes']):
+            self.seed_courses(size)
+            for query in queries:
+                timings = self.time_call(lambda: view(self.factory.get('/api/courses/search/', {'q': query})).render())
+                self.report(f'{size:>9} courses, q={query!r}', *timings)
+        self.stdout.write('Target: p95 under 100 ms at 1M courses on PostgreSQL.')
+
+    def bench_serialize(self):
+        """
+        Serialize N catalog rows as a list endpoint does (one serializer with
+        many=True) and as N single-object serializers, rebuilding the dynamic
+        field set per serializer as before versus cached field plans, plus the
+        ``.values()`` fast path for the list case.
+        """
+        fields = CourseAPI.LIST_FIELDS
+
+        def serialize_list(rebuild):
+            def run():
+                if rebuild:
+                    DynamicFieldsMixin._field_plans.clear()
+                qs = CourseDynamicSerializer.build_queryset(Course.objects.all(), fields)
+                return CourseDynamicSerializer(qs, many=True, fields=fields).data
+            return run
+
+        def serialize_each(courses, rebuild):
+            def run():
+                for course in courses:
+                    if rebuild:
+                        DynamicFieldsMixin._field_plans.clear()
+                    CourseDynamicSerializer(course, fields=fields).data
+            return run
+
+        def serialize_values():
+            plan = CourseDynamicSerializer.values_plan(fields)
+            return plan.render(Course.objects.values(*plan.columns))
+
+        for size in sorted(self.options['sizes']):
+            self.seed_courses(size)
+            courses = list(CourseDynamicSerializer.build_queryset(Course.objects.all(), fields))
+            self.report(f'{size:>9} courses, one by one, rebuilt', *self.time_call(serialize_each(courses, True)))
+            self.report(f'{size:>9} courses, one by one, cached', *self.time_call(serialize_each(courses, False)))
+            self.report(f'{size:>9} courses, many=True, rebuilt', *self.time_call(serialize_list(True)))
+            self.report(f'{size:>9} courses, many=True, cached', *self.time_call(serialize_list(False)))
+            self.report(f'{size:>9} courses, .values() fast path', *self.time_call(serialize_values))
+
+    def bench_render(self):
+        """
+        A catalog-sized payload of already-serialized rows rendered by DRF's
+        JSONRenderer and by ORJSONRenderer; no database access.
+        """
+        created_at = datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc)
+        stock, fast = JSONRenderer(), ORJSONRenderer()
+        for size in sorted(self.options['sizes']):
+            payload = {'results': [
+                {
+                    'id': pk, 'title': f'Course {pk}', 'category': 'Programming', 'price': Decimal('49.99'),
+                    'created_at': created_at, 'duration': timedelta(hours=2),
+                    'instructor': {'id': uuid4(), 'name': 'Instructor', 'email': 'instructor@example.com'},
+                }
+                for pk in range(size)
+            ], 'next': None}
+            stock_timings = self.time_call(lambda: stock.render(payload))
+            fast_timings = self.time_call(lambda: fast.render(payload))
+            self.report(f'{size:>9} rows, JSONRenderer', *stock_timings)
+            self.report(f'{size:>9} rows, ORJSONRenderer', *fast_timings)
+            self.stdout.write(f'{"":<40} {stock_timings[0] / fast_timings[0]:8.1f}x faster')
+
+    def bench_progress(self):
+        """
+        Every student completes every lesson of one course, interleaved so
+        consecutive writes touch different progress rows. Each completion is
+        timed; none of them reads a count or writes the shared course row.
+        The writes run one after another inside the rolled-back transaction,
+        so this measures the cost per call, not lock contention between
+        students writing at the same time.
+        """
+        course = Course.objects.create(
+            title='Progress benchmark', description='Synthetic course used for benchmarking.',
+            category='Programming', price='19.99', instructor=self.instructor,
+        )
+        videos = [
+            Video.objects.create(
+                course=course, title=f'Lesson {i}', description='Lesson',
+                video_url='https://example.com/lesson.mp4', duration=timedelta(minutes=5), order=i,
+            )
+            for i in range(self.options['videos'])
+        ]
+
+        for size in sorted(self.options['sizes']):
+            CoursesProgress.objects.filter(course=course).delete()
+            students = User.objects.bulk_create([
+                User(id=uuid4(), email=f'bench-student-{uuid4().hex}@example.com', name='Student')
+                for _ in range(size)
+            ], batch_size=self.options['batch_size'])
+            progress = CoursesProgress.objects.bulk_create([
+                CoursesProgress(user=student, course=course) for student in students
+            ], batch_size=self.options['batch_size'])
+
+            samples = []
+            started = time.perf_counter()
+            for video in videos:
+                for row in progress:
+                    call_started = time.perf_counter()
+                    row.mark_completed(video)
+                    samples.append((time.perf_counter() - call_started) * 1000)
+            elapsed = time.perf_counter() - started
+
+            samples.sort()
+            p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+            self.report(f'{size:>9} students, mark_completed', statistics.median(samples), p95)
+            self.stdout.write(f'{"":<40} {len(samples) / elapsed:8.0f} completions/s')
+            completed = CoursesProgress.objects.filter(course=course, progress_percentage=100.0).count()
+            if completed != size:
+                raise CommandError(f'{completed} of {size} students reached 100%; the completion counters drifted.')
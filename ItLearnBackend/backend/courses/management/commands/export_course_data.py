@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from courses.exports import EXPORTS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream enrollments or progress to a CSV or NDJSON file without loading them into memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument('--output', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--course', type=int, help='Export a single course.')
+        parser.add_argument('--file', help='Destination path; defaults to stdout.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chunks = stream_export(options['name'], options['output'], course_id=options['course'])
+        if options['output'] == 'ndjson':
+            chunks = (chunk.decode() for chunk in chunks)
+
+        written = 0
+        if options['file']:
+            with open(options['file'], 'w', newline='') as destination:
+                for chunk in chunks:
+                    written += destination.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+                written += len(chunk)
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(f"Exported {options['name']} ({written} characters) in {elapsed:.2f}s"))
@@ -0,0 +1,39 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from courses.imports import FORMATS, READERS, import_catalog
+
+
+class Command(BaseCommand):
+    help = "Import a partner catalog of courses and their videos from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog file; CSV takes lessons as a JSON list in a `videos` column.')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Courses written per bulk INSERT.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(f"Cannot tell the format of {path}; pass --format {' or '.join(FORMATS)}.")
+
+        started = time.perf_counter()
+        totals = {'courses': 0, 'videos': 0, 'rejected': 0}
+        with open(path, newline='', encoding='utf-8') as lines:
+            for courses, videos, errors in import_catalog(READERS[file_format](lines), options['batch_size']):
+                totals['courses'] += courses
+                totals['videos'] += videos
+                totals['rejected'] += len(errors)
+                for line, row_errors in errors:
+                    self.stderr.write(f"Row {line}: {row_errors}")
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{totals['courses']} courses imported...")
+
+        elapsed = time.perf_counter() - started
+        rows = totals['courses'] + totals['rejected']
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['courses']} courses and {totals['videos']} videos, "
+            f"rejected {totals['rejected']} rows, in {elapsed:.2f}s ({rate:,.0f} rows/s)"
+        ))
@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Avg, Count, IntegerField, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from courses.cache import invalidate_courses
+from courses.models import Course, CourseEnrollment, CourseRating, Video
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized course metrics (enrolled_students, average_rating, rating_count, video_count) from source tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Courses updated per UPDATE statement.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        paid = (
+            CourseEnrollment.objects.filter(course=OuterRef('pk'), has_paid=True)
+            .order_by().values('course').annotate(total=Count('id')).values('total')
+        )
+        ratings = (
+            CourseRating.objects.filter(course=OuterRef('pk'))
+            .order_by().values('course').annotate(average=Avg('score'), total=Count('id'))
+        )
+        videos = Video.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(total=Count('id')).values('total')
+
+        ids = Course.all_objects.order_by('pk').values_list('pk', flat=True)
+        last_id, updated = 0, 0
+        while True:
+            batch = list(ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            # One correlated UPDATE per id range keeps row locks short on large catalogs.
+            with transaction.atomic():
+                updated += Course.all_objects.filter(pk__gte=batch[0], pk__lte=batch[-1]).update(
+                    enrolled_students=Coalesce(Subquery(paid, output_field=IntegerField()), Value(0)),
+                    average_rating=Coalesce(Subquery(ratings.values('average'), output_field=FloatField()), Value(0.0)),
+                    rating_count=Coalesce(Subquery(ratings.values('total'), output_field=IntegerField()), Value(0)),
+                    video_count=Coalesce(Subquery(videos, output_field=IntegerField()), Value(0)),
+                )
+            invalidate_courses(batch)
+            last_id = batch[-1]
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt metrics for {updated} courses in {elapsed:.2f}s"))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_alter_courseenrollment_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-created_at', '-id'], name='course_catalog_keyset_idx'),
+        ),
+    ]
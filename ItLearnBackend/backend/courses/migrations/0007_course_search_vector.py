@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:32
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+POSTGRES_FORWARD = """
+CREATE INDEX course_search_vector_gin ON courses_course USING gin (search_vector);
+
+CREATE FUNCTION courses_course_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER courses_course_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON courses_course
+    FOR EACH ROW EXECUTE FUNCTION courses_course_search_vector_update();
+
+UPDATE courses_course SET title = title;
+"""
+
+POSTGRES_BACKWARD = """
+DROP TRIGGER IF EXISTS courses_course_search_vector_trigger ON courses_course;
+DROP FUNCTION IF EXISTS courses_course_search_vector_update();
+DROP INDEX IF EXISTS course_search_vector_gin;
+"""
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE courses_course_fts USING fts5(title, description, tokenize='porter unicode61')",
+    "INSERT INTO courses_course_fts (rowid, title, description) SELECT id, title, description FROM courses_course",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS courses_course_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_BACKWARD)
+    elif vendor == 'sqlite':
+        for statement in SQLITE_BACKWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_video_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
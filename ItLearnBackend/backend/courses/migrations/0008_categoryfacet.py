@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_category_facets(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CategoryFacet = apps.get_model('courses', 'CategoryFacet')
+    counts = (
+        Course.objects.filter(is_published=True)
+        .order_by().values_list('category').annotate(total=Count('id'))
+    )
+    CategoryFacet.objects.bulk_create([
+        CategoryFacet(category=category, course_count=total) for category, total in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryFacet',
+            fields=[
+                ('category', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('course_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_category_facets, migrations.RunPython.noop),
+    ]
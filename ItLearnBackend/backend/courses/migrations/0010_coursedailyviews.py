@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_course_metrics_courserating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='courses.course')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('course', 'date'), name='unique_course_daily_views')],
+            },
+        ),
+    ]
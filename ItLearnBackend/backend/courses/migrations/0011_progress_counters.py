@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def merge_duplicate_progress(apps, schema_editor):
+    """
+    Fold duplicate (user, course) progress rows into the oldest one so the
+    unique constraint below can be added: completed videos are unioned and
+    the earliest start and finish are kept.
+    """
+    CoursesProgress = apps.get_model('courses', 'CoursesProgress')
+    Completed = CoursesProgress.completed_videos.through
+    groups = (
+        CoursesProgress.objects.values('user', 'course').order_by()
+        .annotate(rows=Count('id'), keep=Min('id')).filter(rows__gt=1)
+    )
+    for group in groups:
+        rows = CoursesProgress.objects.filter(user=group['user'], course=group['course'])
+        merged = rows.aggregate(
+            started_at=Min('started_at'), completed_at=Min('completed_at'), progress_percentage=Max('progress_percentage'),
+        )
+        keeper = rows.get(pk=group['keep'])
+        duplicates = rows.exclude(pk=keeper.pk)
+        if keeper.current_video_id is None:
+            keeper.current_video_id = duplicates.exclude(current_video=None).values_list('current_video', flat=True).first()
+        completed = set(Completed.objects.filter(coursesprogress__in=duplicates).values_list('video_id', flat=True))
+        completed -= set(Completed.objects.filter(coursesprogress=keeper).values_list('video_id', flat=True))
+        Completed.objects.bulk_create([Completed(coursesprogress_id=keeper.pk, video_id=video_id) for video_id in completed])
+        duplicates.delete()
+        for field, value in merged.items():
+            setattr(keeper, field, value)
+        keeper.save(update_fields=['current_video', *merged])
+
+
+def seed_progress_counters(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Video = apps.get_model('courses', 'Video')
+    CoursesProgress = apps.get_model('courses', 'CoursesProgress')
+    Completed = CoursesProgress.completed_videos.through
+    videos = Video.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(total=Count('id')).values('total')
+    completed = (
+        Completed.objects.filter(coursesprogress=OuterRef('pk'))
+        .order_by().values('coursesprogress').annotate(total=Count('id')).values('total')
+    )
+    Course.objects.update(video_count=Coalesce(Subquery(videos, output_field=IntegerField()), Value(0)))
+    CoursesProgress.objects.update(completed_count=Coalesce(Subquery(completed, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_coursedailyviews'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='coursesprogress',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(merge_duplicate_progress, migrations.RunPython.noop),
+        migrations.RunPython(seed_progress_counters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='coursesprogress',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='unique_course_progress_per_user'),
+        ),
+    ]
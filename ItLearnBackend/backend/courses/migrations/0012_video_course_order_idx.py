@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['course', 'order', 'id'], name='video_course_order_idx'),
+        ),
+    ]
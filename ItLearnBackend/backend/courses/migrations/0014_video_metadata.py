@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_course_preview_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='preview_video_metadata',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, help_text='Bits per second.', null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='duration',
+            field=models.DurationField(blank=True, null=True),
+        ),
+    ]
@@ -1,15 +1,59 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce, Greatest, Least, Now
+from django.db.models.lookups import GreaterThanOrEqual
+from django.contrib.postgres.search import SearchVectorField
 from useraccounts.models import User
-from datetime import timezone
+from mediafiles.signing import absolute_url
+from .cache import invalidate_course, invalidate_courses
+from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 import uuid
-from django.conf import settings
 
 
 class CourseManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().filter(is_published=True)
 
+class CategoryFacet(models.Model):
+    """
+    Published-course count per category, kept in step with every course write
+    so the catalog can show facet counts without a GROUP BY.
+    ``reconcile_category_facets`` corrects any drift periodically.
+    """
+    category = models.CharField(max_length=100, primary_key=True)
+    course_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.category}: {self.course_count}'
+
+    @classmethod
+    def adjust(cls, deltas):
+        """Apply ``{category: delta}`` with atomic ``F()`` updates, creating missing rows."""
+        for category, delta in deltas.items():
+            if not delta:
+                continue
+            updated = cls.objects.filter(category=category).update(
+                course_count=models.F('course_count') + delta, updated_at=Now()
+            )
+            if not updated:
+                cls.objects.bulk_create([cls(category=category)], ignore_conflicts=True)
+                cls.objects.filter(category=category).update(
+                    course_count=models.F('course_count') + delta, updated_at=Now()
+                )
+
+    @staticmethod
+    def deltas(old_state, new_state):
+        """Facet deltas for a course moving from ``old_state`` to ``new_state``, each ``(category, is_published)`` or None."""
+        deltas = {}
+        if old_state and old_state[1]:
+            deltas[old_state[0]] = deltas.get(old_state[0], 0) - 1
+        if new_state and new_state[1]:
+            deltas[new_state[0]] = deltas.get(new_state[0], 0) + 1
+        return deltas
+
+
 class Course(models.Model):
     CATEGORY_CHOICES = [
         ('Programming', 'Programming'),
@@ -26,6 +70,8 @@ class Course(models.Model):
     created_at =  models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
+    # Maintained by a database trigger on PostgreSQL; see courses/search.py.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     preview_image = models.ImageField(upload_to='uploads/course_previews', null=True, blank=True, help_text="Preview image for the course.")
     preview_video = models.FileField(upload_to='uploads/course_videos', null=True, blank=True, help_text="Introductory video for the course.")
@@ -34,14 +80,92 @@ class Course(models.Model):
 
     objects = CourseManager()
     all_objects = models.Manager()
-     # Metrics
-    # enrolled_students = models.PositiveIntegerField(default=0)  # Number of enrolled students
-    # total_views = models.PositiveIntegerField(default=0)        # Total views of the course
-    # average_rating = models.FloatField(default=0.0)            # Average rating for the course
+    # Metrics, denormalized onto the row and moved with atomic F() updates;
+    # `manage.py rebuild_course_metrics` recomputes them from source tables.
+    enrolled_students = models.PositiveIntegerField(default=0)  # Number of paid enrollments
+    total_views = models.PositiveIntegerField(default=0)        # Total views of the course
+    average_rating = models.FloatField(default=0.0)            # Average rating for the course
+    rating_count = models.PositiveIntegerField(default=0)       # Number of ratings behind the average
+    video_count = models.PositiveIntegerField(default=0)        # Lessons in the course, kept by courses.signals
+
+    # Rendered by courses.tasks.generate_course_image_derivatives; see core/images.py.
+    preview_image_derivatives = models.JSONField(null=True, blank=True, editable=False)
+    # Read from the file's moov box by courses.tasks.extract_preview_video_metadata.
+    preview_video_metadata = models.JSONField(null=True, blank=True, editable=False)
+
+    # Only ever moved by F() updates; a full save() of a stale instance must not overwrite them.
+    COUNTER_FIELDS = frozenset({'enrolled_students', 'total_views', 'average_rating', 'rating_count', 'video_count'})
+    # Columns written in the background, left out of full saves for the same reason.
+    BACKGROUND_FIELDS = COUNTER_FIELDS | {'preview_image_derivatives', 'preview_video_metadata'}
+    PREVIEW_IMAGE_SIZES = {'thumbnail': (320, 180), 'card': (640, 360), 'card_2x': (1280, 720)}
     
+    class Meta:
+        indexes = [
+            # Backs the keyset-paginated catalog: published rows, newest first.
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='course_catalog_keyset_idx',
+                condition=models.Q(is_published=True),
+            ),
+        ]
+
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        # Move the category facet counts in the same transaction as the row.
+        # The stored state is re-read under a row lock: this instance may be stale.
+        with transaction.atomic():
+            old_state = None
+            if not self._state.adding:
+                old_state = (
+                    Course.all_objects.select_for_update()
+                    .filter(pk=self.pk).values_list('category', 'is_published').first()
+                )
+                if kwargs.get('update_fields') is None:
+                    kwargs['update_fields'] = [
+                        field.name for field in self._meta.concrete_fields
+                        if not field.primary_key and field.name not in self.BACKGROUND_FIELDS
+                    ]
+            super().save(*args, **kwargs)
+            CategoryFacet.adjust(CategoryFacet.deltas(old_state, (self.category, self.is_published)))
     
+    @classmethod
+    def bump_metrics(cls, course_id, **updates):
+        """
+        Apply metric ``updates`` (F() expressions) in one UPDATE without
+        loading the row, then refresh the course's cache and validators.
+        """
+        cls.all_objects.filter(pk=course_id).update(updated_at=Now(), **updates)
+        transaction.on_commit(lambda: invalidate_course(course_id))
+
+    @classmethod
+    def set_published(cls, instructor, course_ids, published):
+        """
+        Publish or unpublish the ``instructor``'s courses among ``course_ids``
+        with one UPDATE, moving facet counts and the cache once for the batch.
+        Returns ``{course_id: 'updated' | 'unchanged' | 'not_found'}``.
+        """
+        with transaction.atomic():
+            rows = list(
+                cls.all_objects.select_for_update()
+                .filter(pk__in=course_ids, instructor=instructor).values_list('pk', 'category', 'is_published')
+            )
+            changing = [(pk, category) for pk, category, is_published in rows if is_published != published]
+            if changing:
+                cls.all_objects.filter(pk__in=[pk for pk, _ in changing]).update(is_published=published, updated_at=Now())
+                deltas = {}
+                for _, category in changing:
+                    deltas[category] = deltas.get(category, 0) + (1 if published else -1)
+                CategoryFacet.adjust(deltas)
+                changed_ids = [pk for pk, _ in changing]
+                transaction.on_commit(lambda: invalidate_courses(changed_ids))
+
+        results = dict.fromkeys(course_ids, 'not_found')
+        results.update({pk: 'unchanged' for pk, _, _ in rows})
+        results.update({pk: 'updated' for pk, _ in changing})
+        return results
+
     def soft_delete(self):
         self.is_published = False
         self.save()
@@ -52,12 +176,12 @@ class Course(models.Model):
     
     def course_preview_image_url(self):
         if self.preview_image:
-            return f'{settings.WEBSITE_URL}{self.preview_image.url}'
+            return absolute_url(self.preview_image.url)
         return ''
     
     def course_preview_video_url(self):
         if self.preview_video:
-            return f'{settings.WEBSITE_URL}{self.preview_video.url}'
+            return absolute_url(self.preview_video.url)
         return ''
     
 class CourseEnrollment(models.Model):
@@ -69,22 +193,157 @@ class CourseEnrollment(models.Model):
     has_paid = models.BooleanField(default=False)
     created_at = models.DateField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        # Count the enrollment on its course when it becomes paid, in the same transaction.
+        with transaction.atomic():
+            was_paid = False
+            if not self._state.adding:
+                was_paid = bool(
+                    CourseEnrollment.objects.select_for_update()
+                    .filter(pk=self.pk).values_list('has_paid', flat=True).first()
+                )
+            super().save(*args, **kwargs)
+            if self.has_paid != was_paid:
+                Course.bump_metrics(self.course_id, enrolled_students=models.F('enrolled_students') + (1 if self.has_paid else -1))
+
+
+class CourseRating(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='course_ratings')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='ratings')
+    score = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_course_rating_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} rated {self.course_id}: {self.score}"
+
+    @classmethod
+    def rate(cls, user, course_id, score):
+        """
+        Record ``user``'s score for a course, replacing an earlier one, and fold
+        it into ``Course.average_rating`` with a single F() update.
+        """
+        with transaction.atomic():
+            # A missing rating row cannot be locked; the course row serializes a
+            # user's simultaneous first ratings, and bump_metrics writes it anyway.
+            Course.all_objects.select_for_update().filter(pk=course_id).values_list('pk').first()
+            rating = cls.objects.filter(user=user, course_id=course_id).first()
+            average, count = models.F('average_rating'), models.F('rating_count')
+            if rating is None:
+                rating = cls.objects.create(user=user, course_id=course_id, score=score)
+                Course.bump_metrics(
+                    course_id,
+                    average_rating=(average * count + score) / (count + 1),
+                    rating_count=count + 1,
+                )
+            elif rating.score != score:
+                previous = rating.score
+                rating.score = score
+                rating.save(update_fields=['score', 'updated_at'])
+                Course.bump_metrics(course_id, average_rating=(average * count - previous + score) / count)
+        return rating
+
+
+
+class CourseDailyViews(models.Model):
+    """Per-day view totals and unique-viewer estimates, written by ``flush_course_views``."""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_views')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'date'], name='unique_course_daily_views'),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} on {self.date}: {self.views} views"
+
 
 class Video(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='videos')
     title = models.CharField(max_length=255)
     description = models.TextField()
     video_url = models.URLField()
-    duration = models.DurationField()
+    # Left empty, these are read from the file by courses.tasks.extract_video_metadata.
+    duration = models.DurationField(null=True, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    bitrate = models.PositiveIntegerField(null=True, blank=True, help_text="Bits per second.")
     order = models.PositiveIntegerField()
     is_preview = models.BooleanField(default=False)
     uplodated_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            # Backs the keyset-paginated lesson list of a course.
+            models.Index(fields=['course', 'order', 'id'], name='video_course_order_idx'),
+        ]
+
+    @classmethod
+    def reorder(cls, course_id, video_ids):
+        """
+        Renumber a course's lessons 1..n in the order of ``video_ids`` with a
+        single CASE UPDATE. Returns False, changing nothing, unless
+        ``video_ids`` lists every lesson of the course exactly once.
+        """
+        with transaction.atomic():
+            # The course row lock serializes reorders and ingests of the same course.
+            Course.all_objects.select_for_update().filter(pk=course_id).values_list('pk').first()
+            current = set(cls.objects.filter(course_id=course_id).values_list('pk', flat=True))
+            if len(video_ids) != len(current) or set(video_ids) != current:
+                return False
+            cls.objects.filter(course_id=course_id).update(
+                order=models.Case(
+                    *[models.When(pk=pk, then=models.Value(position)) for position, pk in enumerate(video_ids, 1)],
+                    default=models.F('order'),
+                    output_field=models.PositiveIntegerField(),
+                ),
+                updated_at=Now(),
+            )
+            Course.bump_metrics(course_id)
+        return True
+
+    @classmethod
+    def ingest(cls, course_id, videos):
+        """
+        Add unsaved ``videos`` to a course with one bulk INSERT. Lessons
+        without an ``order`` are appended after the current last one. The
+        course's lesson count, students' progress and cache move once for
+        the whole batch, since bulk_create() sends no signals.
+        """
+        with transaction.atomic():
+            Course.all_objects.select_for_update().filter(pk=course_id).values_list('pk').first()
+            last = cls.objects.filter(course_id=course_id).aggregate(last=models.Max('order'))['last'] or 0
+            for video in videos:
+                video.course_id = course_id
+                if video.order is None:
+                    last += 1
+                    video.order = last
+            created = cls.objects.bulk_create(videos)
+            Course.bump_metrics(course_id, video_count=models.F('video_count') + len(created))
+            CoursesProgress.refresh_course(course_id)
+            cls.schedule_metadata(created)
+        return created
+
+    @staticmethod
+    def schedule_metadata(videos):
+        """Probe the files of lessons saved without a duration once they have committed."""
+        from .tasks import extract_video_metadata
+        video_ids = [video.pk for video in videos if video.duration is None]
+        if video_ids:
+            transaction.on_commit(lambda: extract_video_metadata.delay(video_ids))
 
 
 class CoursesProgress(models.Model):
@@ -95,15 +354,134 @@ class CoursesProgress(models.Model):
     progress_percentage = models.FloatField(default=0.0)
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    completed_count = models.PositiveIntegerField(default=0)  # Rows in completed_videos, kept in step by mark_completed()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_course_progress_per_user'),
+        ]
+
+    @staticmethod
+    def progress_updates(completed, finished_at=None):
+        """
+        UPDATE kwargs that derive the percentage and completion time from
+        ``completed`` (an expression) and the course's cached ``video_count``.
+        A row that reaches 100% gets ``finished_at``, defaulting to now.
+        """
+        total = models.Subquery(Course.all_objects.filter(pk=models.OuterRef('course_id')).values('video_count')[:1])
+        # Clamped to one lesson so the division is safe and a recount of an
+        # emptied course never marks it finished.
+        total = Greatest(total, 1)
+        finished = models.Q(completed_at__isnull=True) & models.Q(GreaterThanOrEqual(completed, total))
+        return {
+            'progress_percentage': models.ExpressionWrapper(
+                Least(completed * 100.0 / total, 100.0),
+                output_field=models.FloatField(),
+            ),
+            'completed_at': models.Case(models.When(finished, then=finished_at or Now()), default=models.F('completed_at')),
+        }
+
+    def mark_completed(self, video):
+        """
+        Record ``video`` as completed: one INSERT into the M2M table and, when
+        that row is new, one UPDATE of this progress row. Nothing is counted
+        and the course row is never written, so concurrent students do not
+        contend. Returns False if the video was already completed; raises
+        ValidationError if it belongs to another course.
+        """
+        if video.course_id != self.course_id:
+            raise ValidationError('The video does not belong to this course.')
+        try:
+            with transaction.atomic():
+                CoursesProgress.completed_videos.through.objects.create(coursesprogress_id=self.pk, video_id=video.pk)
+        except IntegrityError:
+            return False
+
+        completed = models.F('completed_count') + 1
+        CoursesProgress.objects.filter(pk=self.pk).update(
+            completed_count=completed,
+            current_video_id=video.pk,
+            **self.progress_updates(completed),
+        )
+        return True
 
     def update_progress(self):
-        total_videos = self.course.videos.count()
-        if total_videos > 0:
-            completed_count = self.completed_videos.count()
-            self.progress_percentage = (completed_count / total_videos) * 100
-            if self.progress_percentage == 100:
-                self.completed_at = timezone.now()
-        self.save()
+        """Re-derive this row's percentage from its cached counters, in one UPDATE."""
+        CoursesProgress.objects.filter(pk=self.pk).update(**self.progress_updates(models.F('completed_count')))
+
+    @classmethod
+    def record_completions(cls, user, completions):
+        """
+        Apply a batch of ``(course_id, video_id, completed_at)`` completions
+        for ``user``, e.g. an offline client syncing. Whatever the batch size,
+        this is a fixed number of statements: progress rows and M2M rows are
+        bulk-inserted with ``ignore_conflicts`` and each affected row is then
+        recounted once. Returns the affected progress rows' ids.
+        """
+        latest = {}
+        for course_id, video_id, completed_at in completions:
+            if course_id not in latest or completed_at >= latest[course_id][0]:
+                latest[course_id] = (completed_at, video_id)
+
+        with transaction.atomic():
+            cls.objects.bulk_create([cls(user=user, course_id=course_id) for course_id in sorted(latest)], ignore_conflicts=True)
+            progress_ids = dict(cls.objects.filter(user=user, course_id__in=latest).values_list('course_id', 'pk'))
+
+            through = cls.completed_videos.through
+            # Sorted so concurrent batches take row locks in the same order.
+            pairs = sorted({(progress_ids[course_id], video_id) for course_id, video_id, _ in completions})
+            through.objects.bulk_create(
+                [through(coursesprogress_id=progress_id, video_id=video_id) for progress_id, video_id in pairs],
+                ignore_conflicts=True,
+            )
+
+            completed = (
+                through.objects.filter(coursesprogress=models.OuterRef('pk'))
+                .order_by().values('coursesprogress').annotate(total=models.Count('id')).values('total')
+            )
+            rows = cls.objects.filter(pk__in=progress_ids.values())
+            rows.update(
+                completed_count=Coalesce(models.Subquery(completed), 0),
+                current_video_id=models.Case(
+                    *[models.When(course_id=course_id, then=video_id) for course_id, (_, video_id) in latest.items()],
+                    default=models.F('current_video_id'),
+                    output_field=models.BigIntegerField(),
+                ),
+            )
+            # Separate statement: SET expressions only see the old completed_count.
+            rows.update(**cls.progress_updates(
+                models.F('completed_count'),
+                finished_at=models.Case(
+                    *[models.When(course_id=course_id, then=models.Value(at)) for course_id, (at, _) in latest.items()],
+                    output_field=models.DateTimeField(),
+                ),
+            ))
+        return list(progress_ids.values())
+
+    @classmethod
+    def overlay(cls, user, course_id):
+        """
+        ``user``'s progress on a course as the course detail embeds it, or None.
+        One query: the M2M LEFT JOIN yields a row per completed video.
+        """
+        rows = list(
+            cls.objects.filter(user=user, course_id=course_id)
+            .order_by('completed_videos')
+            .values_list('current_video_id', 'progress_percentage', 'completed_videos')
+        )
+        if not rows:
+            return None
+        current_video, percentage, _ = rows[0]
+        return {
+            'current_video': current_video,
+            'progress_percentage': percentage,
+            'completed_videos': [video_id for _, _, video_id in rows if video_id is not None],
+        }
+
+    @classmethod
+    def refresh_course(cls, course_id):
+        """Re-derive every student's percentage after the course's lesson count changed."""
+        cls.objects.filter(course_id=course_id).update(**cls.progress_updates(models.F('completed_count')))
 
     def __str__(self):
         return f"{self.user.username} - {self.course.title} Progress"
@@ -0,0 +1,164 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from core.messages import COURSE_MESSAGES
+
+
+def requested_page_size(request, param, default, maximum):
+    """The client's ``param`` page size, falling back to ``default`` and capped at ``maximum``."""
+    try:
+        size = int(request.query_params[param])
+    except (KeyError, ValueError):
+        return default
+    if size <= 0:
+        return default
+    return min(size, maximum)
+
+
+class CourseKeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over the course catalog.
+
+    Rows are ordered newest first on ``(created_at, id)`` and every page is
+    fetched with a ``WHERE (created_at, id) < (cursor)`` predicate instead of
+    OFFSET, so page 10 000 costs the same index range scan as page 1.
+    Cursors are opaque to clients; rows inserted or unpublished while a client
+    walks the catalog never shift the pages it has not read yet.
+    """
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.next_cursor = None
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = self.seek(queryset, *position)
+
+        # Fetch one extra row to learn whether another page exists without a COUNT(*).
+        rows = list(queryset.order_by(*self.ordering)[:self.page_size + 1])
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def seek(self, queryset, created_at, pk):
+        # The redundant ``created_at <= cursor`` bound gives the planner an
+        # index range to seek into; the OR alone forces a scan on some engines.
+        return queryset.filter(
+            Q(created_at__lte=created_at),
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+        )
+
+    def cursor_position(self, row):
+        if isinstance(row, dict):
+            # A ``.values()`` row from the serializer fast path.
+            return row['created_at'].isoformat(), row['id']
+        return row.created_at.isoformat(), row.pk
+
+    def parse_position(self, key, pk):
+        return datetime.fromisoformat(key), int(pk)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_response(self, request, results, next_cursor):
+        """Build the response for a page whose rows were served from cache."""
+        self.request = request
+        self.next_cursor = next_cursor
+        return self.get_paginated_response(results)
+
+    def get_page_size(self, request):
+        return requested_page_size(request, self.page_size_query_param, self.page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def encode_cursor(self, row):
+        raw = '{}|{}'.format(*self.cursor_position(row))
+        return urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            raw = urlsafe_b64decode(encoded + padding).decode('ascii')
+            key, pk = raw.split('|')
+            return self.parse_position(key, pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(COURSE_MESSAGES['invalid_cursor'])
+
+
+class VideoKeysetPagination(CourseKeysetPagination):
+    """
+    Keyset pagination over one course's lessons in playback order,
+    ``(order, id)`` ascending, for the full lesson data the detail outline omits.
+    """
+    page_size = 50
+    max_page_size = 200
+    ordering = ('order', 'id')
+
+    def seek(self, queryset, order, pk):
+        return queryset.filter(Q(order__gte=order), Q(order__gt=order) | Q(order=order, id__gt=pk))
+
+    def cursor_position(self, row):
+        return row.order, row.pk
+
+    def parse_position(self, key, pk):
+        return int(key), int(pk)
+
+
+class SearchPagination:
+    """
+    Page-number pagination for ranked search results.
+
+    Relevance order cannot be keyset-paginated, so pages are LIMIT/OFFSET
+    windows; ``max_page`` bounds the OFFSET and no COUNT(*) is issued.
+    """
+    page_size = 20
+    max_page_size = 50
+    max_page = 50
+    page_query_param = 'page'
+    page_size_query_param = 'page_size'
+
+    def paginate_ids(self, search, request):
+        """Run ``search(limit, offset)`` for the requested page and return its ids."""
+        self.request = request
+        self.page_size = requested_page_size(request, self.page_size_query_param, self.page_size, self.max_page_size)
+        try:
+            self.page = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound(COURSE_MESSAGES['invalid_page'])
+        if not 1 <= self.page <= self.max_page:
+            raise NotFound(COURSE_MESSAGES['invalid_page'])
+
+        ids = search(self.page_size + 1, (self.page - 1) * self.page_size)
+        self.has_next = len(ids) > self.page_size and self.page < self.max_page
+        return ids[:self.page_size]
+
+    def get_paginated_response(self, data):
+        next_link = None
+        if self.has_next:
+            url = self.request.build_absolute_uri()
+            next_link = replace_query_param(url, self.page_query_param, self.page + 1)
+        return Response({
+            'next': next_link,
+            'results': data,
+        })
@@ -1,33 +1,157 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Course, Video
-from useraccounts.serializers import UserModelDynamicSerializer
+from .models import CategoryFacet, Course, CourseRating, Video
+from core.images import DerivativeURLsField
+from mediafiles.signing import is_protected, media_path, signed_url
+from useraccounts.mixins import DynamicFieldsMixin
+from useraccounts.serializers import UserModelDynamicSerializer, model_columns
 
 class VideoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Video
-        fields = ['id', 'title', 'description', 'video_url', 'duration', 'order', 'is_preview']
+        fields = ['id', 'title', 'description', 'video_url', 'duration', 'width', 'height', 'bitrate', 'order', 'is_preview']
+
+
+class LessonSerializer(VideoSerializer):
+    """
+    Lessons as listed to any signed-in user. Only preview lessons carry their
+    ``video_url``, signed when it points under a protected media prefix; the
+    rest are played through a signed URL from
+    ``mediafiles.api.VideoPlaybackURLAPI``, which checks the enrollment.
+
+    Signed URLs expire, so cached pages are built with ``sign_urls=False`` in
+    the context and signed per response with ``sign_urls()``.
+    """
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if not instance.is_preview:
+            data['video_url'] = None
+        elif self.context.get('sign_urls', True):
+            data['video_url'] = self.sign_url(data['video_url'])
+        return data
+
+    @staticmethod
+    def sign_url(url):
+        path = url and media_path(url)
+        return signed_url(path)[0] if path and is_protected(path) else url
+
+    @classmethod
+    def sign_urls(cls, rows):
+        """``rows`` with protected ``video_url``s signed, or ``rows`` itself when there were none."""
+        signed = [{**row, 'video_url': cls.sign_url(row['video_url'])} for row in rows]
+        return rows if signed == rows else signed
+
+
+class VideoOutlineSerializer(serializers.ModelSerializer):
+    """The compact per-lesson entry embedded in the course detail; full lessons are paged separately."""
+    class Meta:
+        model = Video
+        fields = ['id', 'title', 'duration', 'order']
+
+
+class CategoryFacetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CategoryFacet
+        fields = ['category', 'course_count']
+
+
+class CourseRatingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CourseRating
+        fields = ['score']
+
+
+class VideoReorderSerializer(serializers.Serializer):
+    order = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=2000)
+
+
+class CourseBulkPublishSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+
+
+class VideoManifestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Video
+        fields = ['title', 'description', 'video_url', 'duration', 'order', 'is_preview']
+        extra_kwargs = {'order': {'required': False}}
+
+
+class VideoIngestSerializer(serializers.Serializer):
+    MAX_VIDEOS = 1000
+
+    videos = VideoManifestSerializer(many=True, allow_empty=False, max_length=MAX_VIDEOS)
+
+
+class CourseImportSerializer(serializers.ModelSerializer):
+    """One catalog row for ``manage.py import_courses``; the instructor is given by email."""
+    instructor_email = serializers.EmailField()
+    videos = VideoManifestSerializer(many=True, required=False, max_length=VideoIngestSerializer.MAX_VIDEOS)
+
+    class Meta:
+        model = Course
+        fields = ['title', 'description', 'category', 'price', 'is_published', 'instructor_email', 'videos']
+
+
+class VideoCompletionSerializer(serializers.Serializer):
+    course = serializers.IntegerField(min_value=1)
+    video = serializers.IntegerField(min_value=1)
+    completed_at = serializers.DateTimeField(required=False)
+
+
+class ProgressBatchSerializer(serializers.Serializer):
+    MAX_ITEMS = 500
+
+    items = VideoCompletionSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+
+
+class CourseDynamicSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Columns read by fields that are not named after a column.
+    METHOD_FIELD_SOURCES = {
+        'video_url': ['preview_video'], 'image_url': ['preview_image'],
+        'image_derivatives': ['preview_image_derivatives'], 'video_metadata': ['preview_video_metadata'],
+    }
 
-class CourseDynamicSerializer(serializers.ModelSerializer):
     instructor = UserModelDynamicSerializer(fields=['id', 'email', 'name'], read_only=True)
     video_url = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
-    videos = VideoSerializer(many=True, read_only=True)
-    def __init__(self, *args, **kwargs):
-        fields = kwargs.pop('fields', None)
-        super().__init__(*args, **kwargs)
-
-        if fields is not None:
-            allowed = set(fields)
-            existing = set(self.fields)
-            for field_name in existing - allowed:
-                self.fields.pop(field_name, None)
-    
+    image_derivatives = DerivativeURLsField(source='preview_image_derivatives')
+    video_metadata = serializers.SerializerMethodField()
+    videos = VideoOutlineSerializer(many=True, read_only=True)
+
     def get_video_url(self, obj):
         return obj.course_preview_video_url()
     
     def get_image_url(self, obj):
         return obj.course_preview_image_url()
 
+    def get_video_metadata(self, obj):
+        """Duration, size and bitrate of the preview video; empty until it has been read."""
+        return {key: value for key, value in (obj.preview_video_metadata or {}).items() if key != 'source'}
+
+    @classmethod
+    def build_queryset(cls, queryset, fields, extra_columns=()):
+        """
+        Narrow ``queryset`` to what serializing ``fields`` reads: the instructor
+        is joined and trimmed to the nested field set, and videos are prefetched
+        with only the columns ``VideoOutlineSerializer`` emits.
+        """
+        serializer = cls(fields=fields)
+        columns = model_columns(Course, serializer.fields, cls.METHOD_FIELD_SOURCES)
+        columns.extend(extra_columns)
+
+        if 'instructor' in serializer.fields:
+            instructor_columns = serializer.fields['instructor'].get_columns()
+            queryset = queryset.select_related('instructor')
+            columns.extend(f'instructor__{column}' for column in instructor_columns)
+
+        if 'videos' in serializer.fields:
+            video_columns = model_columns(Video, VideoOutlineSerializer.Meta.fields) + ['course']
+            queryset = queryset.prefetch_related(
+                Prefetch('videos', queryset=Video.objects.only(*video_columns))
+            )
+
+        return queryset.only(*columns)
+
     class Meta:
         model = Course
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['search_vector', 'preview_image_derivatives', 'preview_video_metadata']
\ No newline at end of file
@@ -0,0 +1,141 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from useraccounts.models import User
+from .models import CategoryFacet, Course, CourseEnrollment, CoursesProgress, Video
+from .cache import invalidate_course, invalidate_courses
+from .search import index_courses, unindex_course
+from .tasks import extract_preview_video_metadata, generate_course_image_derivatives
+from core.images import needs_refresh
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    """
+    Drop cached catalog pages and the course detail whenever a course row
+    changes; soft_delete()/soft_revovery() go through save() and land here too.
+    Deferred to commit, so a concurrent read cannot re-cache the old row.
+    """
+    course_id = instance.pk
+    transaction.on_commit(lambda: invalidate_course(course_id))
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+def invalidate_video_course_cache(sender, instance, signal, created=False, **kwargs):
+    """
+    Videos are embedded in the course detail, so they invalidate their course
+    and bump its ``updated_at``, which drives the course's ETag. Adding or
+    removing a lesson also moves ``video_count`` in the same UPDATE and
+    re-derives the students' percentages against the new total.
+    """
+    updates = {'updated_at': timezone.now()}
+    if created or signal is post_delete:
+        updates['video_count'] = F('video_count') + (1 if created else -1)
+    Course.all_objects.filter(pk=instance.course_id).update(**updates)
+    if 'video_count' in updates:
+        CoursesProgress.refresh_course(instance.course_id)
+    course_id = instance.course_id
+    transaction.on_commit(lambda: invalidate_course(course_id))
+
+
+def instructor_identity(user):
+    """The loaded ``(name, email)`` of a user; deferred fields read as ``None``."""
+    return tuple(user.__dict__.get(field) for field in ('name', 'email'))
+
+
+@receiver(post_init, sender=User)
+def remember_instructor_identity(sender, instance, **kwargs):
+    instance._stored_identity = instructor_identity(instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_instructor_courses(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Course payloads embed the instructor's name and email, so a change to
+    either moves ``updated_at`` of the instructor's courses and drops them
+    from the cache. User.save() always lists both fields, so the values are
+    compared against the ones loaded with the row.
+    """
+    if created or (update_fields is not None and not {'name', 'email'} & set(update_fields)):
+        return
+    identity = instructor_identity(instance)
+    changed = identity != getattr(instance, '_stored_identity', None)
+    instance._stored_identity = identity
+    if not changed:
+        return
+    course_ids = list(Course.all_objects.filter(instructor=instance).values_list('pk', flat=True))
+    if course_ids:
+        Course.all_objects.filter(pk__in=course_ids).update(updated_at=timezone.now())
+        transaction.on_commit(lambda: invalidate_courses(course_ids))
+
+
+@receiver(post_delete, sender=CourseEnrollment)
+def release_enrolled_student(sender, instance, **kwargs):
+    """
+    CourseEnrollment.save() counts an enrollment when it becomes paid; take it
+    back out when a paid one goes away, by row or by cascade from its user.
+    """
+    if instance.has_paid:
+        Course.bump_metrics(instance.course_id, enrolled_students=F('enrolled_students') - 1)
+
+
+@receiver(pre_delete, sender=Video)
+def release_completed_video(sender, instance, **kwargs):
+    """The M2M rows cascade away with the video; take them out of the completed counters first."""
+    CoursesProgress.objects.filter(completed_videos=instance).update(completed_count=F('completed_count') - 1)
+
+
+@receiver(post_save, sender=Course)
+def index_course_for_search(sender, instance, update_fields=None, **kwargs):
+    """Keep the SQLite FTS5 shadow table in step; PostgreSQL uses a trigger instead."""
+    if update_fields is not None and not {'title', 'description'} & set(update_fields):
+        return
+    index_courses([instance])
+
+
+@receiver(post_save, sender=Course)
+def schedule_preview_derivatives(sender, instance, update_fields=None, **kwargs):
+    """Render card/thumbnail derivatives once the upload has committed, and only if the file changed."""
+    if update_fields is not None and 'preview_image' not in update_fields:
+        return
+    if needs_refresh(instance.preview_image, instance.preview_image_derivatives):
+        course_id = instance.pk
+        transaction.on_commit(lambda: generate_course_image_derivatives.delay(course_id))
+
+
+@receiver(post_save, sender=Course)
+def schedule_preview_video_metadata(sender, instance, update_fields=None, **kwargs):
+    """Read the new preview video's duration and resolution once the upload has committed."""
+    if update_fields is not None and 'preview_video' not in update_fields:
+        return
+    if needs_refresh(instance.preview_video, instance.preview_video_metadata):
+        course_id = instance.pk
+        transaction.on_commit(lambda: extract_preview_video_metadata.delay(course_id))
+
+
+@receiver(post_save, sender=Video)
+def schedule_video_metadata(sender, instance, **kwargs):
+    if instance.duration is None:
+        Video.schedule_metadata([instance])
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course_for_search(sender, instance, **kwargs):
+    unindex_course(instance.pk)
+
+
+@receiver(pre_delete, sender=Course)
+def release_category_facet(sender, instance, **kwargs):
+    """
+    Runs inside the delete's transaction, so the facet moves atomically with it.
+    The row is re-read because the instance being deleted may be stale.
+    """
+    state = (
+        Course.all_objects.select_for_update()
+        .filter(pk=instance.pk).values_list('category', 'is_published').first()
+    )
+    CategoryFacet.adjust(CategoryFacet.deltas(state, None))
@@ -1,25 +1,123 @@
 from drf_yasg import openapi
 
+# Sparse fieldsets for course list, search and detail
+course_fields_param = openapi.Parameter(
+    'fields',
+    openapi.IN_QUERY,
+    description='Comma-separated subset of course fields to return, e.g. `title,category,price`. Unknown names are rejected.',
+    type=openapi.TYPE_STRING,
+    required=False,
+)
+
+# Query parameters for the keyset-paginated course list
+catalog_pagination_params = [
+    openapi.Parameter(
+        'cursor',
+        openapi.IN_QUERY,
+        description='Opaque cursor taken from the `next` link of the previous page.',
+        type=openapi.TYPE_STRING,
+        required=False,
+    ),
+    openapi.Parameter(
+        'page_size',
+        openapi.IN_QUERY,
+        description='Number of courses per page (default 20, capped at 100).',
+        type=openapi.TYPE_INTEGER,
+        required=False,
+    ),
+]
+
+# Query parameters for the keyset-paginated lesson list of a course
+video_pagination_params = [
+    openapi.Parameter(
+        'cursor',
+        openapi.IN_QUERY,
+        description='Opaque cursor taken from the `next` link of the previous page.',
+        type=openapi.TYPE_STRING,
+        required=False,
+    ),
+    openapi.Parameter(
+        'page_size',
+        openapi.IN_QUERY,
+        description='Number of lessons per page (default 50, capped at 200).',
+        type=openapi.TYPE_INTEGER,
+        required=False,
+    ),
+]
+
+# Query parameters for course search
+search_params = [
+    openapi.Parameter(
+        'q',
+        openapi.IN_QUERY,
+        description='Search terms matched against course titles and descriptions.',
+        type=openapi.TYPE_STRING,
+        required=True,
+    ),
+    openapi.Parameter(
+        'page',
+        openapi.IN_QUERY,
+        description='Result page, starting at 1 (at most 50).',
+        type=openapi.TYPE_INTEGER,
+        required=False,
+    ),
+    openapi.Parameter(
+        'page_size',
+        openapi.IN_QUERY,
+        description='Number of results per page (default 20, capped at 50).',
+        type=openapi.TYPE_INTEGER,
+        required=False,
+    ),
+]
+
+# Views are buffered in Redis and flushed every minute (courses/counters.py).
+TOTAL_VIEWS_DESCRIPTION = (
+    'Views up to the last flush, at most about a minute behind. Views do not change the ETag, '
+    'so a 304 keeps the count the client already has.'
+)
+
 # Schema for the course list response
 get_all_courses_response = openapi.Response(
-    description="A list of all courses",
+    description="A page of courses",
+    schema=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'next': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_URI, description='Link to the next page, null on the last page', x_nullable=True),
+            'results': openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'title': openapi.Schema(type=openapi.TYPE_STRING, description='Title of the course'),
+                        'description': openapi.Schema(type=openapi.TYPE_STRING, description='Course description'),
+                        'category': openapi.Schema(type=openapi.TYPE_STRING, description='Course category'),
+                        'instructor': openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'id': openapi.Schema(type=openapi.TYPE_STRING, description='Instructor ID'),
+                                'email': openapi.Schema(type=openapi.TYPE_STRING, description='Instructor email'),
+                                'name': openapi.Schema(type=openapi.TYPE_STRING, description='Instructor name'),
+                            },
+                        ),
+                        'created_at': openapi.Schema(type=openapi.FORMAT_DATETIME, description='Creation date'),
+                        'total_views': openapi.Schema(type=openapi.TYPE_INTEGER, description=TOTAL_VIEWS_DESCRIPTION),
+                    },
+                ),
+            ),
+        },
+    ),
+)
+
+
+category_facets_response = openapi.Response(
+    description="Published course counts per category",
     schema=openapi.Schema(
         type=openapi.TYPE_ARRAY,
         items=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
-                'title': openapi.Schema(type=openapi.TYPE_STRING, description='Title of the course'),
-                'description': openapi.Schema(type=openapi.TYPE_STRING, description='Course description'),
                 'category': openapi.Schema(type=openapi.TYPE_STRING, description='Course category'),
-                'instructor': openapi.Schema(
-                    type=openapi.TYPE_OBJECT,
-                    properties={
-                        'id': openapi.Schema(type=openapi.TYPE_STRING, description='Instructor ID'),
-                        'email': openapi.Schema(type=openapi.TYPE_STRING, description='Instructor email'),
-                        'name': openapi.Schema(type=openapi.TYPE_STRING, description='Instructor name'),
-                    },
-                ),
-                'created_at': openapi.Schema(type=openapi.FORMAT_DATETIME, description='Creation date'),
+                'course_count': openapi.Schema(type=openapi.TYPE_INTEGER, description='Number of published courses'),
             },
         ),
     ),
@@ -37,6 +135,48 @@ response_soft_delete = {
     ),
 }
 
+response_bulk_publish = {
+    200: openapi.Response(
+        description="Outcome per id: `updated`, `unchanged` (already in that state) or `not_found` (missing or not yours)",
+        examples={"application/json": {
+            "success": "Bulk unpublish finished; see the result for each id.",
+            "results": [{"id": 3, "status": "updated"}, {"id": 4, "status": "not_found"}],
+        }},
+    ),
+    400: openapi.Response(
+        description="`ids` missing, empty or longer than 1000",
+        examples={"application/json": {"ids": ["This list may not be empty."]}},
+    ),
+}
+
+course_videos_response = openapi.Response(
+    description="A page of a course's lessons in playback order",
+    schema=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'next': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_URI, description='Link to the next page, null on the last page', x_nullable=True),
+            'results': openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'id': openapi.Schema(type=openapi.TYPE_INTEGER, description='Video ID'),
+                        'title': openapi.Schema(type=openapi.TYPE_STRING, description='Title of the video'),
+                        'description': openapi.Schema(type=openapi.TYPE_STRING, description='Lesson description'),
+                        'video_url': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_URI, description='Video location for preview lessons, signed when the file is protected; null otherwise, use /api/media/videos/<id>/url/', x_nullable=True),
+                        'duration': openapi.Schema(type=openapi.TYPE_STRING, description='Duration, HH:MM:SS; read from the file when left empty', x_nullable=True),
+                        'width': openapi.Schema(type=openapi.TYPE_INTEGER, description='Frame width in pixels', x_nullable=True),
+                        'height': openapi.Schema(type=openapi.TYPE_INTEGER, description='Frame height in pixels', x_nullable=True),
+                        'bitrate': openapi.Schema(type=openapi.TYPE_INTEGER, description='Bits per second', x_nullable=True),
+                        'order': openapi.Schema(type=openapi.TYPE_INTEGER, description='Position in the course'),
+                        'is_preview': openapi.Schema(type=openapi.TYPE_BOOLEAN, description='Free preview lesson'),
+                    },
+                ),
+            ),
+        },
+    ),
+)
+
 response_recovery_course = {
     200: openapi.Response(
         description="Course successfully restored",
@@ -48,6 +188,97 @@ response_recovery_course = {
     ),
 }
 
+response_rate_course = {
+    200: openapi.Response(
+        description="Rating recorded",
+        examples={"application/json": {"success": "Thank you for rating this course.", "average_rating": 4.5, "rating_count": 2}},
+    ),
+    403: openapi.Response(
+        description="The user has not purchased the course",
+        examples={"application/json": {"error": "Only students who purchased this course can rate it."}},
+    ),
+    404: openapi.Response(
+        description="Course not found",
+        examples={"application/json": {"error": "Course not found."}},
+    ),
+}
+
+response_progress_batch = {
+    200: openapi.Response(
+        description="Completions recorded; items for unknown videos or unpurchased courses are skipped",
+        examples={"application/json": {
+            "success": "Progress synced.",
+            "accepted": 2,
+            "skipped": 1,
+            "progress": [{"course": 1, "completed_count": 2, "progress_percentage": 40.0, "completed_at": None}],
+        }},
+    ),
+    400: openapi.Response(
+        description="Malformed batch",
+        examples={"application/json": {"items": ["Ensure this field has no more than 500 elements."]}},
+    ),
+}
+
+response_reorder_videos = {
+    200: openapi.Response(
+        description="Lessons renumbered in the given order",
+        examples={"application/json": {"success": "Lessons reordered."}},
+    ),
+    400: openapi.Response(
+        description="The order does not list every lesson of the course exactly once",
+        examples={"application/json": {"error": "The new order must list every lesson of the course exactly once."}},
+    ),
+    404: openapi.Response(
+        description="Course not found or not owned by the user",
+        examples={"application/json": {"error": "Course not found or you do not have permission."}},
+    ),
+}
+
+response_ingest_videos = {
+    201: openapi.Response(
+        description="Lessons created",
+        examples={"application/json": {"success": "Lessons added.", "videos": [{"id": 7, "title": "Intro", "order": 1}]}},
+    ),
+    404: openapi.Response(
+        description="Course not found or not owned by the user",
+        examples={"application/json": {"error": "Course not found or you do not have permission."}},
+    ),
+}
+
+# Streaming exports of enrollments and progress
+export_params = [
+    openapi.Parameter(
+        'output',
+        openapi.IN_QUERY,
+        description='Export format: `csv` (default) or `ndjson`.',
+        type=openapi.TYPE_STRING,
+        enum=['csv', 'ndjson'],
+        required=False,
+    ),
+    openapi.Parameter(
+        'course',
+        openapi.IN_QUERY,
+        description='Limit the export to one course.',
+        type=openapi.TYPE_INTEGER,
+        required=False,
+    ),
+]
+
+export_response = {
+    200: openapi.Response(
+        description="Streamed export, one row per line",
+        examples={"text/csv": "id,course_id,course_title,user_email,total_price,has_paid,stripe_checkout_id,created_at"},
+    ),
+    400: openapi.Response(
+        description="Unsupported output format or course id",
+        examples={"application/json": {"error": "`output` must be csv or ndjson and `course` a course id."}},
+    ),
+    404: openapi.Response(
+        description="Unknown export",
+        examples={"application/json": {"error": "Unknown export. Choose enrollments or progress."}},
+    ),
+}
+
 retrieve_course_response = openapi.Response(
     description="Retrieve course response",
     schema=openapi.Schema(
@@ -88,9 +319,13 @@ retrieve_course_response = openapi.Response(
                 format=openapi.FORMAT_DATETIME,
                 description='Creation date of the course'
             ),
+            'total_views': openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description=TOTAL_VIEWS_DESCRIPTION
+            ),
             'videos': openapi.Schema(
                 type=openapi.TYPE_ARRAY,
-                description='List of videos in the course',
+                description='Outline of the course lessons; full lesson data is paged from /detailed/<id>/videos/',
                 items=openapi.Schema(
                     type=openapi.TYPE_OBJECT,
                     properties={
@@ -102,6 +337,14 @@ retrieve_course_response = openapi.Response(
                             type=openapi.TYPE_STRING,
                             description='Title of the video'
                         ),
+                        'duration': openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description='Duration, HH:MM:SS'
+                        ),
+                        'order': openapi.Schema(
+                            type=openapi.TYPE_INTEGER,
+                            description='Position in the course'
+                        ),
                     },
                 ),
             ),
@@ -0,0 +1,115 @@
+import requests
+from celery import shared_task
+from django.db import DatabaseError, transaction
+from django.db.models import Count
+from datetime import timedelta
+from core.images import needs_refresh, refresh_derivatives
+from mediafiles.mp4 import MP4Error, probe, probe_url
+from .models import CategoryFacet, Course, Video
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reconcile_category_facets():
+    """
+    Recount published courses per category and correct drifted facet rows,
+    e.g. after bulk writes that bypassed Course.save().
+    """
+    with transaction.atomic():
+        actual = dict(
+            Course.objects.order_by().values_list('category').annotate(total=Count('id'))
+        )
+        stored = {
+            facet.category: facet
+            for facet in CategoryFacet.objects.select_for_update()
+        }
+
+        drifted = []
+        for category in actual.keys() | stored.keys():
+            expected = actual.get(category, 0)
+            facet = stored.get(category) or CategoryFacet(category=category)
+            if facet.course_count != expected:
+                logger.warning(f"Category facet drift for {category!r}: stored {facet.course_count}, actual {expected}")
+                facet.course_count = expected
+                drifted.append(facet)
+
+        CategoryFacet.objects.bulk_create(
+            drifted,
+            update_conflicts=True,
+            unique_fields=['category'],
+            update_fields=['course_count', 'updated_at'],
+        )
+    return len(drifted)
+
+
+@shared_task
+def flush_course_views():
+    """Move buffered detail views from Redis into Course.total_views and CourseDailyViews."""
+    from .counters import flush_views
+    return flush_views()
+
+
+@shared_task
+def generate_course_image_derivatives(course_id):
+    """Render the preview image's card/thumbnail derivatives if its content changed."""
+    course = Course.all_objects.filter(pk=course_id).only('preview_image', 'preview_image_derivatives').first()
+    if course is None:
+        return False
+    record = refresh_derivatives(
+        course.preview_image, Course.PREVIEW_IMAGE_SIZES, f'uploads/course_previews/derivatives/{course_id}',
+        course.preview_image_derivatives,
+    )
+    if record is None:
+        return False
+    # Bumps updated_at and drops the cached pages so the new URLs show up.
+    Course.bump_metrics(course_id, preview_image_derivatives=record)
+    return True
+
+
+@shared_task
+def extract_preview_video_metadata(course_id):
+    """Record the preview video's duration, resolution and bitrate, read from its moov box."""
+    course = Course.all_objects.filter(pk=course_id).only('preview_video', 'preview_video_metadata').first()
+    if course is None or not needs_refresh(course.preview_video, course.preview_video_metadata):
+        return False
+    record = {'source': course.preview_video.name or None}
+    if course.preview_video:
+        try:
+            with course.preview_video.open('rb') as source:
+                record.update(probe(source))
+        except (MP4Error, OSError) as exc:
+            # Recorded against this file name so the same upload is not probed again.
+            logger.warning(f"Cannot read preview video metadata of course {course_id}: {exc}")
+    Course.bump_metrics(course_id, preview_video_metadata=record)
+    return True
+
+
+@shared_task
+def extract_video_metadata(video_ids):
+    """Fill in duration, resolution and bitrate of lessons by reading the moov box behind ``video_url``."""
+    updated = 0
+    course_ids = set()
+    for video in Video.objects.filter(pk__in=video_ids).only('course', 'video_url'):
+        try:
+            metadata = probe_url(video.video_url)
+        except (MP4Error, OSError, requests.RequestException) as exc:
+            logger.warning(f"Cannot read metadata of video {video.pk} ({video.video_url}): {exc}")
+            continue
+        try:
+            # A savepoint, so a rejected row does not abort an enclosing transaction.
+            with transaction.atomic():
+                Video.objects.filter(pk=video.pk).update(
+                    duration=timedelta(seconds=metadata['duration']), width=metadata['width'],
+                    height=metadata['height'], bitrate=metadata['bitrate'],
+                )
+        except DatabaseError as exc:
+            logger.warning(f"Cannot store metadata of video {video.pk} ({video.video_url}): {exc}")
+            continue
+        course_ids.add(video.course_id)
+        updated += 1
+    # Lesson durations are part of the course detail.
+    for course_id in course_ids:
+        Course.bump_metrics(course_id)
+    return updated
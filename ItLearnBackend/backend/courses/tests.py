@@ -1,10 +1,24 @@
 from django.test import TestCase
 import pytest
+import time
 from rest_framework.test import APIClient
 from useraccounts.conftest import create_user
 from django.core.files.uploadedfile import SimpleUploadedFile
 from io import BytesIO
 from PIL import Image
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from datetime import timedelta
+from uuid import uuid4
+from useraccounts.models import User
+from io import StringIO
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from .models import CategoryFacet, Course, CourseDailyViews, CourseEnrollment, CourseRating, CoursesProgress, Video
+from .tasks import flush_course_views, reconcile_category_facets
+from .pagination import CourseKeysetPagination
+from .serializers import CourseDynamicSerializer
+from unittest.mock import patch
 
 @pytest.mark.django_db
 def test_create_course_api(api_client: APIClient, create_user):
@@ -121,3 +135,1179 @@ def test_course_detailes(api_client:APIClient, create_course, create_user):
     response = api_client.get(f'/api/courses/detailed/{course.id}/')
     data = response.data
     assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_get_courses_keyset_pages(api_client: APIClient, create_user):
+    Course.objects.bulk_create([
+        Course(title=f'Course {i}', description='Description', category='Programming', price=10, instructor=create_user)
+        for i in range(5)
+    ])
+
+    first = api_client.get('/api/courses/get/', {'page_size': 2})
+    assert first.status_code == 200
+    assert len(first.data['results']) == 2
+    assert first.data['next'] is not None
+
+    # A course created mid-walk sorts before the pages that are still unread.
+    Course.objects.create(title='Newest', description='Description', category='Design', price=10, instructor=create_user)
+
+    titles = [course['title'] for course in first.data['results']]
+    next_url = first.data['next']
+    while next_url:
+        response = api_client.get(next_url)
+        titles.extend(course['title'] for course in response.data['results'])
+        next_url = response.data['next']
+
+    assert sorted(titles) == sorted(f'Course {i}' for i in range(5))
+
+
+@pytest.mark.django_db
+def test_get_courses_page_size_is_capped(api_client: APIClient, create_user):
+    Course.objects.bulk_create([
+        Course(title=f'Course {i}', description='Description', category='Programming', price=10, instructor=create_user)
+        for i in range(CourseKeysetPagination.max_page_size + 5)
+    ])
+    response = api_client.get('/api/courses/get/', {'page_size': 10_000})
+    assert response.status_code == 200
+    assert len(response.data['results']) == CourseKeysetPagination.max_page_size
+
+
+@pytest.mark.django_db
+def test_get_courses_invalid_cursor(api_client: APIClient):
+    response = api_client.get('/api/courses/get/', {'cursor': 'not-a-cursor'})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_get_courses_deep_page_uses_no_offset(api_client: APIClient, create_user):
+    Course.objects.bulk_create([
+        Course(title=f'Course {i}', description='Description', category='Programming', price=10, instructor=create_user)
+        for i in range(30)
+    ])
+    first = api_client.get('/api/courses/get/', {'page_size': 10})
+    with CaptureQueriesContext(connection) as queries:
+        api_client.get(first.data['next'])
+    catalog_sql = [q['sql'] for q in queries.captured_queries if 'courses_course' in q['sql']]
+    assert catalog_sql
+    assert not any('OFFSET' in sql.upper() for sql in catalog_sql)
+
+
+def seed_catalog(size):
+    """Grow the catalog to ``size`` courses, each with its own instructor."""
+    missing = size - Course.objects.count()
+    instructors = User.objects.bulk_create([
+        User(id=uuid4(), email=f'instructor-{uuid4().hex}@test.com', name='Instructor')
+        for _ in range(missing)
+    ])
+    Course.objects.bulk_create([
+        Course(title='Course', description='Description', category='Programming', price=10, instructor=instructor)
+        for instructor in instructors
+    ])
+
+
+@pytest.mark.django_db
+def test_get_courses_query_budget(api_client: APIClient, query_budget):
+    # One aggregate for the ETag, one keyset page with the instructor joined.
+    query_budget(
+        2,
+        lambda: api_client.get('/api/courses/get/', {'page_size': 100}),
+        seed=seed_catalog,
+        sizes=(1, 10, 50),
+    )
+
+
+@pytest.mark.django_db
+def test_course_detail_query_budget(api_client: APIClient, create_course, create_user, query_budget):
+    course = create_course
+
+    def seed_videos(size):
+        Video.objects.bulk_create([
+            Video(course=course, title=f'Lesson {i}', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=i)
+            for i in range(course.videos.count(), size)
+        ])
+
+    # Anonymous: ETag lookup, course with instructor, prefetched videos.
+    response = query_budget(
+        3,
+        lambda: api_client.get(f'/api/courses/detailed/{course.id}/'),
+        seed=seed_videos,
+        sizes=(1, 20),
+    )
+    assert len(response.data['videos']) == 20
+    assert response.data['instructor']['email'] == create_user.email
+    assert response.data['progress'] is None
+
+    # Signed in: one more query for the progress overlay, however much progress there is.
+    api_client.force_authenticate(user=create_user)
+    progress = CoursesProgress.objects.create(user=create_user, course=course)
+
+    def seed_progress(size):
+        seed_videos(size)
+        for video in course.videos.all()[:size // 2]:
+            progress.mark_completed(video)
+
+    response = query_budget(
+        4,
+        lambda: api_client.get(f'/api/courses/detailed/{course.id}/'),
+        seed=seed_progress,
+        sizes=(2, 40),
+    )
+    assert len(response.data['progress']['completed_videos']) == 20
+
+
+@pytest.mark.django_db
+def test_course_queries_load_only_serialized_instructor_columns(api_client: APIClient, create_course):
+    with CaptureQueriesContext(connection) as queries:
+        api_client.get('/api/courses/get/')
+    sql = ' '.join(q['sql'] for q in queries.captured_queries)
+    assert '"useraccounts_user"."email"' in sql
+    assert '"useraccounts_user"."password"' not in sql
+    assert '"useraccounts_user"."bio"' not in sql
+
+
+@pytest.mark.django_db
+def test_get_courses_served_from_cache(api_client: APIClient, create_course, query_budget):
+    first = api_client.get('/api/courses/get/')
+    # On a cache hit: the ETag aggregate and the fresh view counts of the page.
+    cached = query_budget(2, lambda: api_client.get('/api/courses/get/'))
+    assert cached.data == first.data
+    fields = 'title,category'
+    api_client.get('/api/courses/get/', {'fields': fields})
+    query_budget(1, lambda: api_client.get('/api/courses/get/', {'fields': fields}))
+
+
+@pytest.mark.django_db
+def test_get_courses_shows_flushed_views_over_cached_page(api_client: APIClient, create_course):
+    course = create_course
+    first = api_client.get('/api/courses/get/')
+    assert first.data['results'][0]['total_views'] == 0
+    api_client.get(f'/api/courses/detailed/{course.id}/')
+    assert flush_course_views() == 1
+
+    # The page is still cached and still validates; a full response carries the new count.
+    assert api_client.get('/api/courses/get/', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+    assert api_client.get('/api/courses/get/').data['results'][0]['total_views'] == 1
+
+
+@pytest.mark.django_db
+def test_get_courses_cache_invalidated_on_course_change(api_client: APIClient, create_course, create_user, django_capture_on_commit_callbacks, mocker):
+    mocker.patch('courses.signals.generate_course_image_derivatives.delay')
+    mocker.patch('courses.signals.extract_preview_video_metadata.delay')
+    course = create_course
+    assert len(api_client.get('/api/courses/get/').data['results']) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Course.objects.create(title='Second', description='Description', category='Design', price=10, instructor=create_user)
+    assert len(api_client.get('/api/courses/get/').data['results']) == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        course.soft_delete()
+    titles = [c['title'] for c in api_client.get('/api/courses/get/').data['results']]
+    assert titles == ['Second']
+
+
+@pytest.mark.django_db
+def test_course_cache_invalidated_after_commit(api_client: APIClient, create_course, django_capture_on_commit_callbacks, mocker):
+    mocker.patch('courses.signals.generate_course_image_derivatives.delay')
+    mocker.patch('courses.signals.extract_preview_video_metadata.delay')
+    course = create_course
+    api_client.get(f'/api/courses/detailed/{course.id}/')
+    with django_capture_on_commit_callbacks() as callbacks:
+        course.title = 'Renamed'
+        course.save()
+        # Until the commit, a reader may still cache the old row; nothing is dropped yet.
+        assert api_client.get(f'/api/courses/detailed/{course.id}/').data['title'] != 'Renamed'
+    for callback in callbacks:
+        callback()
+    assert api_client.get(f'/api/courses/detailed/{course.id}/').data['title'] == 'Renamed'
+
+
+@pytest.mark.django_db
+def test_course_detail_cache_invalidated_on_video_and_soft_delete(api_client: APIClient, create_course, create_user, django_capture_on_commit_callbacks, mocker):
+    mocker.patch('courses.signals.generate_course_image_derivatives.delay')
+    mocker.patch('courses.signals.extract_preview_video_metadata.delay')
+    course = create_course
+    api_client.force_authenticate(user=create_user)
+    assert api_client.get(f'/api/courses/detailed/{course.id}/').data['videos'] == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        video = Video.objects.create(course=course, title='Intro', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=1)
+    assert [v['title'] for v in api_client.get(f'/api/courses/detailed/{course.id}/').data['videos']] == ['Intro']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        video.delete()
+    assert api_client.get(f'/api/courses/detailed/{course.id}/').data['videos'] == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        course.soft_delete()
+    assert api_client.get(f'/api/courses/detailed/{course.id}/').status_code == 404
+
+
+@pytest.mark.django_db
+def test_course_cache_invalidated_on_instructor_change(api_client: APIClient, create_course, create_user, django_capture_on_commit_callbacks):
+    course = create_course
+    first = api_client.get(f'/api/courses/detailed/{course.id}/')
+    api_client.get('/api/courses/get/')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        User.objects.get(pk=create_user.pk).save(update_fields=['last_login'])
+    assert api_client.get(f'/api/courses/detailed/{course.id}/', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+    # A full save lists name and email too, but leaves them as loaded.
+    instructor = User.objects.get(pk=create_user.pk)
+    instructor.bio = 'Unrelated edit'
+    with django_capture_on_commit_callbacks(execute=True):
+        instructor.save()
+    assert api_client.get(f'/api/courses/detailed/{course.id}/', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+
+    instructor = User.objects.get(pk=create_user.pk)
+    instructor.name = 'Renamed Instructor'
+    with django_capture_on_commit_callbacks(execute=True):
+        instructor.save()
+    detail = api_client.get(f'/api/courses/detailed/{course.id}/', HTTP_IF_NONE_MATCH=first['ETag'])
+    assert detail.status_code == 200 and detail.data['instructor']['name'] == 'Renamed Instructor'
+    assert api_client.get('/api/courses/get/').data['results'][0]['instructor']['name'] == 'Renamed Instructor'
+
+
+@pytest.mark.django_db
+def test_course_cache_counters_exported(api_client: APIClient, create_course):
+    api_client.get('/api/courses/get/')
+    api_client.get('/api/courses/get/')
+    metrics = api_client.get('/metrics').content.decode()
+    assert 'courses_cache_hits_total{endpoint="list"}' in metrics
+    assert 'courses_cache_misses_total{endpoint="list"}' in metrics
+    assert 'courses_cache_evictions_total' in metrics
+
+
+@pytest.mark.django_db
+def test_get_courses_conditional_get(api_client: APIClient, create_course, create_user, query_budget):
+    response = api_client.get('/api/courses/get/')
+    etag = response['ETag']
+    assert etag.startswith('"')
+    assert response['Last-Modified']
+
+    not_modified = query_budget(1, lambda: api_client.get('/api/courses/get/', HTTP_IF_NONE_MATCH=etag))
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+
+    Course.objects.create(title='Second', description='Description', category='Design', price=10, instructor=create_user)
+    assert api_client.get('/api/courses/get/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_course_detail_conditional_get(api_client: APIClient, create_course, create_user):
+    course = create_course
+    api_client.force_authenticate(user=create_user)
+    etag = api_client.get(f'/api/courses/detailed/{course.id}/')['ETag']
+
+    with patch.object(CourseDynamicSerializer, 'to_representation') as to_representation:
+        response = api_client.get(f'/api/courses/detailed/{course.id}/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    to_representation.assert_not_called()
+
+    # Editing a lesson bumps the parent course's version.
+    Video.objects.create(course=course, title='Intro', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=1)
+    response = api_client.get(f'/api/courses/detailed/{course.id}/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_search_courses_ranks_title_matches_first(api_client: APIClient, create_user):
+    Course.objects.create(title='Cooking basics', description='Includes a short django detour.', category='Design', price=10, instructor=create_user)
+    Course.objects.create(title='Django for beginners', description='Web development.', category='Programming', price=10, instructor=create_user)
+    Course.objects.create(title='Gardening', description='Nothing relevant.', category='Business', price=10, instructor=create_user)
+
+    response = api_client.get('/api/courses/search/', {'q': 'django'})
+    assert response.status_code == 200
+    assert [c['title'] for c in response.data['results']] == ['Django for beginners', 'Cooking basics']
+
+
+@pytest.mark.django_db
+def test_search_courses_follows_edits_and_soft_delete(api_client: APIClient, create_course):
+    course = create_course
+    assert api_client.get('/api/courses/search/', {'q': 'kubernetes'}).data['results'] == []
+
+    course.title = 'Kubernetes in production'
+    course.save()
+    assert len(api_client.get('/api/courses/search/', {'q': 'kubern'}).data['results']) == 1
+
+    course.soft_delete()
+    assert api_client.get('/api/courses/search/', {'q': 'kubernetes'}).data['results'] == []
+
+
+@pytest.mark.django_db
+def test_search_courses_paginates(api_client: APIClient, create_user):
+    for i in range(5):
+        Course.objects.create(title=f'Python part {i}', description='Python.', category='Programming', price=10, instructor=create_user)
+
+    first = api_client.get('/api/courses/search/', {'q': 'python', 'page_size': 3})
+    assert len(first.data['results']) == 3
+    second = api_client.get(first.data['next'])
+    assert len(second.data['results']) == 2
+    assert second.data['next'] is None
+
+
+@pytest.mark.parametrize('params', [{}, {'q': '   '}])
+@pytest.mark.django_db
+def test_search_courses_requires_query(api_client: APIClient, params):
+    response = api_client.get('/api/courses/search/', params)
+    assert response.status_code == 400
+
+
+def facet_counts(api_client):
+    return {row['category']: row['course_count'] for row in api_client.get('/api/courses/facets/').data}
+
+
+@pytest.mark.django_db
+def test_category_facets_follow_course_writes(api_client: APIClient, create_user):
+    course = Course.objects.create(title='One', description='Description', category='Design', price=10, instructor=create_user)
+    Course.objects.create(title='Two', description='Description', category='Design', price=10, instructor=create_user)
+    assert facet_counts(api_client) == {'Design': 2}
+
+    course.category = 'Marketing'
+    course.save()
+    assert facet_counts(api_client) == {'Design': 1, 'Marketing': 1}
+
+    course.soft_delete()
+    assert facet_counts(api_client) == {'Design': 1}
+
+    Course.all_objects.get(pk=course.pk).soft_revovery()
+    assert facet_counts(api_client) == {'Design': 1, 'Marketing': 1}
+
+    course.delete()
+    assert facet_counts(api_client) == {'Design': 1}
+
+
+@pytest.mark.django_db
+def test_reconcile_category_facets_corrects_drift(api_client: APIClient, create_user):
+    Course.objects.create(title='One', description='Description', category='Design', price=10, instructor=create_user)
+    # Bulk inserts bypass Course.save(), so the facet drifts.
+    Course.objects.bulk_create([
+        Course(title='Bulk', description='Description', category='Business', price=10, instructor=create_user)
+    ])
+    CategoryFacet.objects.filter(category='Design').update(course_count=7)
+
+    assert reconcile_category_facets() == 2
+    assert facet_counts(api_client) == {'Design': 1, 'Business': 1}
+
+
+@pytest.mark.django_db
+def test_course_payload_omits_search_vector(create_course):
+    assert 'search_vector' not in CourseDynamicSerializer(create_course).data
+
+
+@pytest.mark.django_db
+def test_paid_enrollment_increments_enrolled_students(create_course_enrollment):
+    enrollment = create_course_enrollment
+    course = enrollment.course
+    course.refresh_from_db()
+    assert course.enrolled_students == 0
+
+    enrollment.has_paid = True
+    enrollment.save()
+    enrollment.save()  # saving an already-paid enrollment does not count twice
+    course.refresh_from_db()
+    assert course.enrolled_students == 1
+
+
+@pytest.mark.django_db
+def test_deleting_paid_enrollment_decrements_enrolled_students(create_course, create_user):
+    course = create_course
+    student = User.objects.create(id=uuid4(), email='student@test.com', name='Student')
+    paid = CourseEnrollment.objects.create(id=uuid4(), created_by=create_user, course=course, total_price=10, has_paid=True)
+    CourseEnrollment.objects.create(id=uuid4(), created_by=student, course=course, total_price=10, has_paid=True)
+    CourseEnrollment.objects.create(id=uuid4(), created_by=student, course=course, total_price=10)
+    course.refresh_from_db()
+    assert course.enrolled_students == 2
+
+    paid.delete()
+    course.refresh_from_db()
+    assert course.enrolled_students == 1
+
+    # Cascades from the user: only the paid enrollment was counted.
+    student.delete()
+    course.refresh_from_db()
+    assert course.enrolled_students == 0
+
+
+@pytest.mark.django_db
+def test_rate_course_updates_average(api_client: APIClient, create_course, create_user, django_capture_on_commit_callbacks):
+    course = create_course
+    other = User.objects.create(id=uuid4(), email='other@test.com', name='Other')
+    for user in (create_user, other):
+        CourseEnrollment.objects.create(id=uuid4(), created_by=user, course=course, total_price=10, has_paid=True)
+
+    api_client.force_authenticate(user=create_user)
+    assert api_client.post(f'/api/courses/rate/{course.id}/', {'score': 5}).data['average_rating'] == 5.0
+    api_client.force_authenticate(user=other)
+    assert api_client.post(f'/api/courses/rate/{course.id}/', {'score': 2}).data['average_rating'] == 3.5
+
+    # Re-rating replaces the earlier score instead of adding another one.
+    with django_capture_on_commit_callbacks(execute=True):
+        response = api_client.post(f'/api/courses/rate/{course.id}/', {'score': 4})
+    assert response.data['average_rating'] == 4.5
+    assert response.data['rating_count'] == 2
+
+    listed = api_client.get('/api/courses/get/').data['results'][0]
+    assert listed['average_rating'] == 4.5
+    assert listed['enrolled_students'] == 2
+
+
+@pytest.mark.django_db
+def test_rate_twice_keeps_one_rating(create_course, create_user):
+    course = create_course
+    with CaptureQueriesContext(connection) as queries:
+        first = CourseRating.rate(create_user, course.id, 3)
+    # The course row is locked before the rating is looked up, so a
+    # simultaneous first rating waits instead of hitting the unique constraint.
+    selects = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+    assert 'courses_course' in selects[0] and 'courses_courserating' in selects[1]
+
+    second = CourseRating.rate(create_user, course.id, 5)
+    assert second.pk == first.pk
+    assert CourseRating.objects.filter(user=create_user, course=course).count() == 1
+    course.refresh_from_db()
+    assert (course.average_rating, course.rating_count) == (5.0, 1)
+
+
+@pytest.mark.parametrize('score', [0, 6, 'five'])
+@pytest.mark.django_db
+def test_rate_course_rejects_invalid_scores(api_client: APIClient, create_course, create_user, score):
+    api_client.force_authenticate(user=create_user)
+    response = api_client.post(f'/api/courses/rate/{create_course.id}/', {'score': score})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_rate_course_requires_paid_enrollment(api_client: APIClient, create_course_enrollment):
+    enrollment = create_course_enrollment
+    api_client.force_authenticate(user=enrollment.created_by)
+    response = api_client.post(f'/api/courses/rate/{enrollment.course_id}/', {'score': 5})
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_rebuild_course_metrics_command(create_course, create_user):
+    course = create_course
+    CourseEnrollment.objects.create(id=uuid4(), created_by=create_user, course=course, total_price=10, has_paid=True)
+    CourseRating.objects.create(user=create_user, course=course, score=3)
+    Course.all_objects.filter(pk=course.pk).update(enrolled_students=40, average_rating=1.0, rating_count=9)
+
+    call_command('rebuild_course_metrics', stdout=StringIO())
+
+    course.refresh_from_db()
+    assert (course.enrolled_students, course.average_rating, course.rating_count) == (1, 3.0, 1)
+
+
+@pytest.mark.django_db
+def test_course_views_buffered_then_flushed(api_client: APIClient, create_course, create_user, django_capture_on_commit_callbacks):
+    course = create_course
+    api_client.force_authenticate(user=create_user)
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(3):
+            api_client.get(f'/api/courses/detailed/{course.id}/')
+    assert not [q for q in queries.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT'))]
+    course.refresh_from_db()
+    assert course.total_views == 0
+
+    other = User.objects.create(id=uuid4(), email='viewer@example.com', name='Viewer')
+    api_client.force_authenticate(user=other)
+    api_client.get(f'/api/courses/detailed/{course.id}/')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert flush_course_views() == 4
+    course.refresh_from_db()
+    assert course.total_views == 4
+    daily = CourseDailyViews.objects.get(course=course)
+    assert (daily.views, daily.unique_viewers) == (4, 2)
+    assert api_client.get(f'/api/courses/detailed/{course.id}/').data['total_views'] == 4
+
+    # Only the view since the last flush is added; per-day rows stay absolute.
+    with django_capture_on_commit_callbacks(execute=True):
+        assert flush_course_views() == 1
+    assert flush_course_views() == 0
+    course.refresh_from_db()
+    daily.refresh_from_db()
+    assert (course.total_views, daily.views, daily.unique_viewers) == (5, 5, 2)
+
+
+@pytest.mark.django_db
+def test_flush_course_views_coalesces_into_one_update(create_user):
+    from .counters import record_view
+    courses = Course.objects.bulk_create([
+        Course(title=f'Course {i}', description='Course', category='Data', instructor=create_user, price=10)
+        for i in range(5)
+    ])
+    for i, course in enumerate(courses):
+        for viewer in range(i + 1):
+            record_view(course.pk, f'a:{viewer}')
+    record_view(10 ** 9, 'a:gone')
+
+    with CaptureQueriesContext(connection) as queries:
+        flush_course_views()
+    updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+    assert len(updates) == 1
+    assert sorted(Course.objects.values_list('total_views', flat=True)) == [1, 2, 3, 4, 5]
+    assert CourseDailyViews.objects.count() == 5
+
+
+@pytest.mark.django_db
+def test_flush_course_views_keeps_validators_and_cache(api_client: APIClient, create_course, create_user):
+    course = create_course
+    first = api_client.get(f'/api/courses/detailed/{course.id}/')
+    updated_at = Course.objects.get(pk=course.pk).updated_at
+
+    assert flush_course_views() == 1
+    assert Course.objects.get(pk=course.pk).updated_at == updated_at
+    assert api_client.get(f'/api/courses/detailed/{course.id}/', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+    # A full response still carries the flushed count, over the cached body.
+    assert api_client.get(f'/api/courses/detailed/{course.id}/').data['total_views'] == 1
+
+
+@pytest.mark.django_db
+def test_overlapping_flush_finds_nothing_to_drain(create_course):
+    from .counters import drain_pending, get_store, record_view
+    record_view(create_course.pk, 'a:1')
+    store = get_store()
+    # The first flush renames the pending hash away; the second must not fail on the missing key.
+    assert sum(drain_pending(store).values()) == 1
+    assert drain_pending(store) == {}
+
+
+@pytest.mark.django_db
+def test_course_detail_survives_redis_outage(api_client: APIClient, create_course):
+    from redis.exceptions import ConnectionError
+    with patch('courses.counters.get_store', side_effect=ConnectionError('Connection refused')):
+        response = api_client.get(f'/api/courses/detailed/{create_course.id}/')
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_mark_video_completed_is_one_insert_and_one_update(create_course, create_user):
+    course = create_course
+    videos = [
+        Video.objects.create(course=course, title=f'Lesson {i}', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=i)
+        for i in range(4)
+    ]
+    course.refresh_from_db()
+    assert course.video_count == 4
+    progress = CoursesProgress.objects.create(user=create_user, course=course)
+
+    with CaptureQueriesContext(connection) as queries:
+        assert progress.mark_completed(videos[0]) is True
+    statements = [q['sql'].split()[0] for q in queries.captured_queries]
+    assert statements.count('INSERT') == 1 and statements.count('UPDATE') == 1
+    assert 'COUNT(' not in ' '.join(q['sql'] for q in queries.captured_queries)
+
+    assert progress.mark_completed(videos[0]) is False
+    for video in videos[1:]:
+        progress.mark_completed(video)
+    progress.refresh_from_db()
+    assert (progress.completed_count, progress.progress_percentage) == (4, 100.0)
+    assert progress.completed_at is not None
+    assert progress.current_video_id == videos[-1].pk
+
+
+@pytest.mark.django_db
+def test_mark_completed_rejects_video_of_another_course(create_course, create_user):
+    course = create_course
+    other = Course.objects.create(title='Other', description='Course', category='Data', instructor=create_user, price=10)
+    foreign = Video.objects.create(course=other, title='Elsewhere', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=0)
+    progress = CoursesProgress.objects.create(user=create_user, course=course)
+
+    with pytest.raises(ValidationError):
+        progress.mark_completed(foreign)
+    progress.refresh_from_db()
+    assert progress.completed_count == 0 and not progress.completed_videos.exists()
+
+
+@pytest.mark.django_db
+def test_progress_follows_lesson_count_changes(create_course, create_user):
+    course = create_course
+    videos = [
+        Video.objects.create(course=course, title=f'Lesson {i}', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=i)
+        for i in range(2)
+    ]
+    progress = CoursesProgress.objects.create(user=create_user, course=course)
+    progress.mark_completed(videos[0])
+
+    Video.objects.create(course=course, title='Extra', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=2)
+    progress.refresh_from_db()
+    assert round(progress.progress_percentage, 2) == 33.33
+
+    videos[0].delete()
+    progress.refresh_from_db()
+    course.refresh_from_db()
+    assert (course.video_count, progress.completed_count, progress.progress_percentage) == (2, 0, 0.0)
+
+
+@pytest.mark.django_db
+def test_stale_course_save_keeps_counters(create_course):
+    stale = Course.objects.get(pk=create_course.pk)
+    Video.objects.create(course=create_course, title='Intro', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=1)
+    stale.title = 'Renamed'
+    stale.save()
+    stale.refresh_from_db()
+    assert (stale.title, stale.video_count) == ('Renamed', 1)
+
+
+@pytest.mark.django_db
+def test_progress_batch_query_budget(api_client: APIClient, create_course_enrollment, query_budget):
+    enrollment = create_course_enrollment
+    CourseEnrollment.objects.filter(pk=enrollment.pk).update(has_paid=True)
+    course = enrollment.course
+    api_client.force_authenticate(user=enrollment.created_by)
+    items = []
+
+    def seed_items(size):
+        Video.objects.bulk_create([
+            Video(course=course, title=f'Lesson {i}', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=i)
+            for i in range(len(items), size)
+        ])
+        Course.all_objects.filter(pk=course.pk).update(video_count=size)
+        items[:] = [{'course': course.pk, 'video': pk} for pk in course.videos.values_list('pk', flat=True)]
+
+    # Video filter; savepoint, progress insert and lookup, M2M insert, two recounts, release; progress read.
+    response = query_budget(
+        9,
+        lambda: api_client.post('/api/courses/progress/batch/', {'items': items}, format='json'),
+        seed=seed_items,
+        sizes=(1, 300),
+    )
+    assert (response.data['accepted'], response.data['skipped']) == (300, 0)
+    assert response.data['progress'][0]['completed_count'] == 300
+    assert response.data['progress'][0]['progress_percentage'] == 100.0
+
+
+@pytest.mark.django_db
+def test_progress_batch_skips_foreign_items_and_is_idempotent(api_client: APIClient, create_course_enrollment, create_user):
+    enrollment = create_course_enrollment
+    CourseEnrollment.objects.filter(pk=enrollment.pk).update(has_paid=True)
+    course = enrollment.course
+    videos = [
+        Video.objects.create(course=course, title=f'Lesson {i}', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=i)
+        for i in range(2)
+    ]
+    unpaid = Course.objects.create(title='Other', description='Other', category='Design', price=5, instructor=create_user)
+    foreign = Video.objects.create(course=unpaid, title='Other', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=1)
+    api_client.force_authenticate(user=enrollment.created_by)
+
+    items = [
+        {'course': course.pk, 'video': videos[0].pk, 'completed_at': '2026-01-02T10:00:00Z'},
+        {'course': course.pk, 'video': videos[1].pk, 'completed_at': '2026-01-01T10:00:00Z'},
+        {'course': course.pk, 'video': foreign.pk},
+        {'course': unpaid.pk, 'video': foreign.pk},
+    ]
+    for _ in range(2):
+        response = api_client.post('/api/courses/progress/batch/', {'items': items}, format='json')
+        assert (response.data['accepted'], response.data['skipped']) == (2, 2)
+
+    progress = CoursesProgress.objects.get(user=enrollment.created_by, course=course)
+    assert (progress.completed_count, progress.progress_percentage) == (2, 100.0)
+    assert progress.current_video_id == videos[0].pk
+    assert progress.completed_at.isoformat().startswith('2026-01-02T10:00:00')
+    assert not CoursesProgress.objects.filter(course=unpaid).exists()
+
+
+@pytest.mark.django_db
+def test_progress_batch_rejects_oversized_batches(api_client: APIClient, create_user):
+    api_client.force_authenticate(user=create_user)
+    items = [{'course': 1, 'video': i + 1} for i in range(501)]
+    assert api_client.post('/api/courses/progress/batch/', {'items': items}, format='json').status_code == 400
+    assert api_client.post('/api/courses/progress/batch/', {'items': []}, format='json').status_code == 400
+
+
+@pytest.mark.django_db
+def test_reorder_videos_in_one_update(api_client: APIClient, create_course, create_user, django_capture_on_commit_callbacks):
+    course = create_course
+    videos = Video.objects.bulk_create([
+        Video(course=course, title=f'Lesson {i}', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=i)
+        for i in range(1, 51)
+    ])
+    api_client.force_authenticate(user=create_user)
+    before = api_client.get(f'/api/courses/detailed/{course.id}/')['ETag']
+    new_order = [video.pk for video in reversed(videos)]
+
+    with django_capture_on_commit_callbacks(execute=True), CaptureQueriesContext(connection) as queries:
+        response = api_client.post(f'/api/courses/videos/reorder/{course.id}/', {'order': new_order}, format='json')
+    assert response.status_code == 200
+    assert len([q for q in queries.captured_queries if q['sql'].startswith('UPDATE "courses_video"')]) == 1
+
+    detail = api_client.get(f'/api/courses/detailed/{course.id}/')
+    assert detail['ETag'] != before
+    assert [video['id'] for video in detail.data['videos']] == new_order
+
+
+@pytest.mark.django_db
+def test_reorder_videos_requires_every_lesson_once(api_client: APIClient, create_course, create_user):
+    course = create_course
+    videos = Video.objects.bulk_create([
+        Video(course=course, title=f'Lesson {i}', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=i)
+        for i in range(1, 4)
+    ])
+    api_client.force_authenticate(user=create_user)
+    for order in ([videos[0].pk, videos[1].pk], [videos[0].pk, videos[0].pk, videos[1].pk], [v.pk for v in videos] + [10 ** 9]):
+        response = api_client.post(f'/api/courses/videos/reorder/{course.id}/', {'order': order}, format='json')
+        assert response.status_code == 400
+    assert list(course.videos.values_list('order', flat=True)) == [1, 2, 3]
+
+    other = User.objects.create(id=uuid4(), email='other@example.com', name='Other')
+    api_client.force_authenticate(user=other)
+    response = api_client.post(f'/api/courses/videos/reorder/{course.id}/', {'order': [v.pk for v in videos]}, format='json')
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_ingest_videos_query_budget(api_client: APIClient, create_course, create_user, query_budget, django_capture_on_commit_callbacks):
+    course = create_course
+    api_client.force_authenticate(user=create_user)
+    Video.objects.create(course=course, title='Intro', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=1)
+    manifest = []
+
+    def seed_manifest(size):
+        manifest[:] = [
+            {'title': f'Lesson {i}', 'description': 'Lesson', 'video_url': 'https://example.com/v.mp4', 'duration': '00:05:00'}
+            for i in range(size)
+        ]
+
+    # Ownership check; savepoint, course lock, last order, INSERT, course bump, progress refresh, release.
+    # (80 rows stay under SQLite's 999-parameter limit, so the INSERT is not split.)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = query_budget(
+            8,
+            lambda: api_client.post(f'/api/courses/videos/bulk/{course.id}/', {'videos': manifest}, format='json'),
+            seed=seed_manifest,
+            sizes=(1, 80),
+        )
+    assert response.status_code == 201
+    assert [video['order'] for video in response.data['videos']][:2] == [3, 4]
+    course.refresh_from_db()
+    assert course.video_count == 82
+    assert len(api_client.get(f'/api/courses/detailed/{course.id}/').data['videos']) == 82
+
+
+@pytest.mark.django_db
+def test_course_detail_embeds_compact_video_outline(api_client: APIClient, create_course, create_user):
+    course = create_course
+    Video.objects.create(course=course, title='Intro', description='A long lesson description', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=1)
+    api_client.force_authenticate(user=create_user)
+    with CaptureQueriesContext(connection) as queries:
+        videos = api_client.get(f'/api/courses/detailed/{course.id}/').data['videos']
+    assert set(videos[0]) == {'id', 'title', 'duration', 'order'}
+    video_query = next(q['sql'] for q in queries.captured_queries if 'FROM "courses_video"' in q['sql'])
+    assert '"description"' not in video_query
+
+
+@pytest.mark.django_db
+def test_course_videos_keyset_pages(api_client: APIClient, create_course, create_user, django_capture_on_commit_callbacks):
+    course = create_course
+    Video.objects.bulk_create([
+        Video(course=course, title=f'Lesson {i}', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=i // 2)
+        for i in range(7)
+    ])
+    api_client.force_authenticate(user=create_user)
+
+    seen, url = [], f'/api/courses/detailed/{course.id}/videos/?page_size=3'
+    while url:
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+        assert response.status_code == 200
+        assert not any('OFFSET' in q['sql'] for q in queries.captured_queries)
+        seen.extend((video['order'], video['id']) for video in response.data['results'])
+        url = response.data['next']
+    assert seen == sorted(seen) and len(seen) == 7
+    assert set(response.data['results'][0]) == {
+        'id', 'title', 'description', 'video_url', 'duration', 'width', 'height', 'bitrate', 'order', 'is_preview',
+    }
+
+    first = api_client.get(f'/api/courses/detailed/{course.id}/videos/')
+    assert api_client.get(f'/api/courses/detailed/{course.id}/videos/', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+    with django_capture_on_commit_callbacks(execute=True):
+        Video.reorder(course.id, [video_id for _, video_id in reversed(seen)])
+    response = api_client.get(f'/api/courses/detailed/{course.id}/videos/', HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == 200
+    assert response.data['results'][0]['id'] == seen[-1][1]
+
+    assert api_client.get(f'/api/courses/detailed/{10 ** 9}/videos/').status_code == 404
+    assert api_client.get(f'/api/courses/detailed/{course.id}/videos/?cursor=bogus').status_code == 404
+
+
+@pytest.mark.django_db
+def test_course_videos_hide_urls_of_non_preview_lessons(api_client: APIClient, create_course, create_user):
+    course = create_course
+    Video.objects.create(course=course, title='Trailer', description='Lesson', video_url='https://example.com/preview.mp4', order=0, is_preview=True)
+    Video.objects.create(course=course, title='Lesson', description='Lesson', video_url='https://example.com/paid.mp4', order=1)
+    api_client.force_authenticate(user=create_user)
+
+    response = api_client.get(f'/api/courses/detailed/{course.id}/videos/')
+    assert response.status_code == 200
+    assert [video['video_url'] for video in response.data['results']] == ['https://example.com/preview.mp4', None]
+    assert response['ETag']
+
+
+@pytest.mark.django_db
+def test_course_videos_sign_protected_preview_urls(api_client: APIClient, create_course, create_user, settings):
+    course = create_course
+    url = f'{settings.WEBSITE_URL}/media/uploads/lessons/trailer.mp4'
+    Video.objects.create(course=course, title='Trailer', description='Lesson', video_url=url, order=0, is_preview=True)
+    api_client.force_authenticate(user=create_user)
+
+    first = api_client.get(f'/api/courses/detailed/{course.id}/videos/')
+    signed = first.data['results'][0]['video_url']
+    assert signed.startswith(f'{url}?expires=') and 'signature=' in signed
+    assert 'ETag' not in first and 'no-store' in first['Cache-Control']
+    # Served from the cached page, signed afresh for every response.
+    with patch('mediafiles.signing.time.time', return_value=time.time() + 60):
+        later = api_client.get(f'/api/courses/detailed/{course.id}/videos/')
+    assert later.data['results'][0]['video_url'] != signed
+
+
+@pytest.mark.django_db
+def test_course_detail_progress_overlay_shares_cached_body(api_client: APIClient, create_course, create_user):
+    course = create_course
+    videos = [
+        Video.objects.create(course=course, title=f'Lesson {i}', description='Lesson', video_url='https://example.com/v.mp4', duration=timedelta(minutes=5), order=i)
+        for i in range(4)
+    ]
+    progress = CoursesProgress.objects.create(user=create_user, course=course)
+    progress.mark_completed(videos[2])
+    progress.mark_completed(videos[0])
+
+    anonymous = api_client.get(f'/api/courses/detailed/{course.id}/')
+    assert anonymous.status_code == 200
+    assert 'Authorization' in anonymous['Vary']
+
+    api_client.force_authenticate(user=create_user)
+    with patch.object(CourseDynamicSerializer, 'to_representation') as to_representation:
+        response = api_client.get(f'/api/courses/detailed/{course.id}/')
+    to_representation.assert_not_called()
+    assert response.data['progress'] == {
+        'current_video': videos[0].pk,
+        'progress_percentage': 50.0,
+        'completed_videos': [videos[0].pk, videos[2].pk],
+    }
+    assert response['ETag'] != anonymous['ETag']
+
+    # Progress moves the ETag even though the course did not change.
+    etag = response['ETag']
+    assert api_client.get(f'/api/courses/detailed/{course.id}/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+    progress.mark_completed(videos[1])
+    response = api_client.get(f'/api/courses/detailed/{course.id}/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['progress']['progress_percentage'] == 75.0
+
+
+@pytest.mark.django_db
+def test_dynamic_serializer_field_plans_are_built_once(create_course):
+    from rest_framework.serializers import ModelSerializer
+    from useraccounts.mixins import DynamicFieldsMixin
+    DynamicFieldsMixin._field_plans.clear()
+    fields = ['title', 'instructor', 'created_at']
+    with patch.object(ModelSerializer, 'get_fields', autospec=True, side_effect=ModelSerializer.get_fields) as get_fields:
+        first = CourseDynamicSerializer(create_course, fields=fields).data
+        for _ in range(5):
+            assert CourseDynamicSerializer(create_course, fields=fields).data == first
+    # Once for the course serializer, once for its nested instructor serializer.
+    assert get_fields.call_count == 2
+    assert set(first) == set(fields)
+
+
+@pytest.mark.django_db
+def test_values_fast_path_matches_serializer(create_course):
+    from django.core.exceptions import ImproperlyConfigured
+    from .api import CourseAPI
+    fields = CourseAPI.LIST_FIELDS
+    Course.objects.create(title='No media', description='Course', category='Design', price=5, instructor=create_course.instructor)
+
+    queryset = CourseDynamicSerializer.build_queryset(Course.objects.order_by('pk'), fields)
+    expected = CourseDynamicSerializer(queryset, many=True, fields=fields).data
+    plan = CourseDynamicSerializer.values_plan(fields)
+    assert plan.render(Course.objects.order_by('pk').values(*plan.columns)) == expected
+    assert expected[0]['preview_image'] and expected[1]['preview_image'] is None
+
+    with pytest.raises(ImproperlyConfigured):
+        CourseDynamicSerializer.values_plan(['title', 'image_url'])
+
+
+def test_orjson_renderer_matches_drf_json():
+    import datetime
+    import json
+    from decimal import Decimal
+    from django.utils.translation import gettext_lazy
+    from rest_framework.renderers import JSONRenderer
+    from core.renderers import ORJSONRenderer
+    payload = {
+        'price': Decimal('19.90'),
+        'id': uuid4(),
+        'duration': timedelta(minutes=3, seconds=5),
+        'created_at': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'date': datetime.date(2024, 5, 1),
+        'label': gettext_lazy('Course'),
+        'text': 'line break',
+        7: [1.5, None, True],
+    }
+    expected = JSONRenderer().render(payload)
+    rendered = ORJSONRenderer().render(payload)
+    assert json.loads(rendered) == json.loads(expected)
+    assert b'\\u2028' in rendered
+    assert ORJSONRenderer().render(None) == b''
+
+
+@pytest.mark.django_db
+def test_msgpack_is_negotiated_on_request(api_client: APIClient, create_course):
+    import msgpack
+    json_response = api_client.get('/api/courses/get/')
+    response = api_client.get('/api/courses/get/', HTTP_ACCEPT='application/msgpack')
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/msgpack'
+    assert msgpack.unpackb(response.content) == json_response.json()
+    assert response['ETag'] != json_response['ETag']
+    assert 'Accept' in response['Vary']
+
+    # The JSON ETag must not validate the msgpack representation.
+    stale = api_client.get('/api/courses/get/', HTTP_ACCEPT='application/msgpack', HTTP_IF_NONE_MATCH=json_response['ETag'])
+    assert stale.status_code == 200
+
+
+def test_msgpack_parser_round_trip():
+    import msgpack
+    from io import BytesIO
+    from rest_framework.exceptions import ParseError
+    from core.parsers import MessagePackParser, ORJSONParser
+    body = {'completions': [{'video': 1, 'completed_at': '2024-05-01T12:30:15Z'}]}
+    assert MessagePackParser().parse(BytesIO(msgpack.packb(body))) == body
+    with pytest.raises(ParseError):
+        MessagePackParser().parse(BytesIO(b'\xc1'))
+    with pytest.raises(ParseError):
+        ORJSONParser().parse(BytesIO(b'{"video": '))
+
+
+@pytest.mark.django_db
+def test_course_list_sparse_fields_skip_unselected_columns(api_client: APIClient, create_course):
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get('/api/courses/get/', {'fields': 'price,title,category'})
+    assert response.status_code == 200
+    assert list(response.data['results'][0]) == ['title', 'category', 'price']
+    assert response.data['results'][0]['price'] == '29.99'
+    page_query = next(query['sql'] for query in queries.captured_queries if '"courses_course"."title"' in query['sql'])
+    assert '"description"' not in page_query
+
+    full = api_client.get('/api/courses/get/')
+    assert 'description' in full.data['results'][0] and 'price' not in full.data['results'][0]
+    assert full['ETag'] != response['ETag']
+
+    response = api_client.get('/api/courses/get/', {'fields': 'title,search_vector'})
+    assert response.status_code == 400
+    assert 'search_vector' in response.data['fields'][0]
+
+
+@pytest.mark.django_db
+def test_course_detail_sparse_fields(api_client: APIClient, create_course):
+    course = create_course
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(f'/api/courses/detailed/{course.id}/', {'fields': 'title,price'})
+    assert response.status_code == 200
+    assert set(response.data) == {'title', 'price', 'progress'}
+    course_query = next(query['sql'] for query in queries.captured_queries if '"courses_course"."title"' in query['sql'])
+    assert '"description"' not in course_query
+    # Without videos selected the lessons are not prefetched.
+    assert not any('courses_video' in query['sql'] for query in queries.captured_queries)
+
+    full = api_client.get(f'/api/courses/detailed/{course.id}/')
+    assert 'videos' in full.data and 'price' not in full.data
+
+
+@pytest.mark.django_db
+def test_export_enrollments_csv_and_ndjson(api_client: APIClient, create_course_enrollment, create_user):
+    import csv
+    import json
+    enrollment = create_course_enrollment
+    other_instructor = User.objects.create(id=uuid4(), email='other@test.com', name='Other')
+    other_course = Course.objects.create(title='Other', description='Course', category='Design', price=5, instructor=other_instructor)
+    CourseEnrollment.objects.create(id=uuid4(), created_by=create_user, course=other_course, total_price=5)
+
+    api_client.force_authenticate(user=create_user)
+    response = api_client.get('/api/courses/export/enrollments/')
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/csv'
+    rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+    # Instructors only export their own courses.
+    assert [row['id'] for row in rows] == [str(enrollment.id)]
+    assert rows[0]['course_title'] == enrollment.course.title and rows[0]['user_email'] == create_user.email
+
+    response = api_client.get('/api/courses/export/progress/', {'output': 'ndjson'})
+    assert response['Content-Type'] == 'application/x-ndjson'
+    assert b''.join(response.streaming_content) == b''
+
+    create_user.is_staff = True
+    create_user.save()
+    response = api_client.get('/api/courses/export/enrollments/', {'output': 'ndjson', 'course': other_course.id})
+    lines = b''.join(response.streaming_content).splitlines()
+    assert [json.loads(line)['course_id'] for line in lines] == [other_course.id]
+
+    assert api_client.get('/api/courses/export/payouts/').status_code == 404
+    assert api_client.get('/api/courses/export/enrollments/', {'output': 'xlsx'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_export_command_writes_every_row(create_course_enrollment):
+    out, err = StringIO(), StringIO()
+    call_command('export_course_data', 'enrollments', '--output', 'ndjson', stdout=out, stderr=err)
+    assert out.getvalue().count('\n') == 1
+    assert str(create_course_enrollment.id) in out.getvalue()
+    assert 'Exported enrollments' in err.getvalue()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('rows', [5_000, pytest.param(1_000_000, marks=pytest.mark.slow)])
+def test_export_streams_under_rss_ceiling(api_client: APIClient, create_course, create_user, rows):
+    """
+    Streams enrollments and samples resident memory as chunks go out; it must
+    stay within a fixed ceiling over the starting RSS instead of growing with
+    the row count. The million-row run is opt-in: ``pytest -m slow``.
+    """
+    import resource
+    try:
+        with open('/proc/self/statm') as statm:
+            statm.read()
+    except OSError:
+        pytest.skip('needs /proc to sample resident memory')
+
+    def rss():
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+
+    batch_size = 10_000
+    for start in range(0, rows, batch_size):
+        CourseEnrollment.objects.bulk_create([
+            CourseEnrollment(
+                id=uuid4(), created_by=create_user, course=create_course, total_price=29.99,
+                stripe_checkout_id=f'cs_{n}', has_paid=True,
+            )
+            for n in range(start, min(start + batch_size, rows))
+        ])
+    create_user.is_staff = True
+    create_user.save()
+    api_client.force_authenticate(user=create_user)
+
+    response = api_client.get('/api/courses/export/enrollments/')
+    baseline = rss()
+    peak, lines = baseline, 0
+    for chunk in response.streaming_content:
+        lines += chunk.count(b'\n')
+        peak = max(peak, rss())
+    assert lines == rows + 1
+    assert peak - baseline < 64 * 1024 * 1024
+
+
+@pytest.mark.django_db
+def test_import_courses_command(tmp_path, create_user, django_capture_on_commit_callbacks):
+    import json
+    lesson = {'title': 'Intro', 'description': 'Start here', 'video_url': 'https://cdn.example.com/1.mp4', 'duration': '00:05:00'}
+    rows = [
+        {'title': f'Course {n}', 'description': 'Imported', 'category': 'Design', 'price': '10.00',
+         'instructor_email': create_user.email, 'videos': [lesson, {**lesson, 'title': 'Next', 'order': 5}]}
+        for n in range(250)
+    ]
+    rows.append({**rows[0], 'instructor_email': 'nobody@test.com'})
+    rows.append({**rows[0], 'category': 'Cooking'})
+    catalog = tmp_path / 'catalog.jsonl'
+    catalog.write_text('\n'.join(json.dumps(row) for row in rows))
+
+    out, err = StringIO(), StringIO()
+    with CaptureQueriesContext(connection) as queries, django_capture_on_commit_callbacks(execute=True):
+        call_command('import_courses', str(catalog), '--batch-size', '100', stdout=out, stderr=err)
+
+    assert 'Imported 250 courses and 500 videos, rejected 2 rows' in out.getvalue() and 'rows/s' in out.getvalue()
+    assert 'Row 251' in err.getvalue() and 'Row 252' in err.getvalue()
+    assert Course.objects.filter(description='Imported').count() == 250
+    assert CategoryFacet.objects.get(category='Design').course_count == 250
+    course = Course.objects.filter(description='Imported').order_by('pk').first()
+    assert course.video_count == 2
+    assert list(course.videos.values_list('title', 'order')) == [('Intro', 1), ('Next', 5)]
+    # Per batch: one instructor lookup, the bulk INSERTs (split by SQLite's parameter limit), facets and FTS rows.
+    assert len(queries) < 3 * 12
+
+    csv_catalog = tmp_path / 'catalog.csv'
+    csv_catalog.write_text(
+        'title,description,category,price,instructor_email,is_published,videos\n'
+        f'CSV course,From CSV,Business,5,{create_user.email},,"{json.dumps([lesson]).replace(chr(34), chr(34) * 2)}"\n'
+    )
+    call_command('import_courses', str(csv_catalog), stdout=StringIO(), stderr=StringIO())
+    course = Course.objects.get(title='CSV course')
+    assert course.is_published and course.videos.get().duration == timedelta(minutes=5)
+
+
+@pytest.mark.django_db
+def test_bulk_unpublish_and_restore(api_client: APIClient, create_user, django_capture_on_commit_callbacks):
+    from .cache import LIST_GENERATION_KEY
+    from django.core.cache import cache
+    other = User.objects.create(id=uuid4(), email='other@test.com', name='Other')
+    mine = [
+        Course.objects.create(title=f'Mine {n}', description='Course', category='Design', price=5, instructor=create_user)
+        for n in range(3)
+    ]
+    foreign = Course.objects.create(title='Foreign', description='Course', category='Design', price=5, instructor=other)
+    Course.all_objects.filter(pk=mine[2].pk).update(is_published=False)
+    CategoryFacet.objects.filter(category='Design').update(course_count=3)
+    ids = [course.pk for course in mine] + [foreign.pk, 999_999]
+    api_client.force_authenticate(user=create_user)
+
+    cache.set(LIST_GENERATION_KEY, 1)
+    with CaptureQueriesContext(connection) as queries, django_capture_on_commit_callbacks(execute=True):
+        response = api_client.delete('/api/courses/bulk_publish/', {'ids': ids}, format='json')
+    assert response.status_code == 200
+    assert [row['status'] for row in response.data['results']] == ['updated', 'updated', 'unchanged', 'not_found', 'not_found']
+    assert len([query for query in queries.captured_queries if query['sql'].startswith('UPDATE "courses_course"')]) == 1
+    assert set(Course.objects.values_list('pk', flat=True)) == {foreign.pk}
+    assert CategoryFacet.objects.get(category='Design').course_count == 1
+    assert cache.get(LIST_GENERATION_KEY) is None
+
+    response = api_client.patch('/api/courses/bulk_publish/', {'ids': ids[:3]}, format='json')
+    assert [row['status'] for row in response.data['results']] == ['updated'] * 3
+    assert CategoryFacet.objects.get(category='Design').course_count == 4
+    assert api_client.patch('/api/courses/bulk_publish/', {'ids': []}, format='json').status_code == 400
+
+
+@pytest.mark.django_db
+def test_preview_image_derivatives(create_course, django_capture_on_commit_callbacks):
+    from django.core.files.storage import default_storage
+    from .tasks import generate_course_image_derivatives
+    course = create_course
+    assert generate_course_image_derivatives(course.pk) is True
+    course.refresh_from_db()
+    record = course.preview_image_derivatives
+    assert record['source'] == course.preview_image.name
+    for name, size in Course.PREVIEW_IMAGE_SIZES.items():
+        for path in record['files'][name].values():
+            with default_storage.open(path) as derivative:
+                assert Image.open(derivative).size == size
+    # Same content: nothing is rendered again.
+    assert generate_course_image_derivatives(course.pk) is False
+
+    data = CourseDynamicSerializer(course, fields=['image_url', 'image_derivatives']).data
+    assert data['image_derivatives']['card_2x']['webp'].endswith('.webp')
+    assert data['image_derivatives']['thumbnail']['jpeg'].endswith('.jpg')
+
+    # Metadata edits do not schedule a render; a new upload does.
+    with patch('courses.signals.generate_course_image_derivatives.delay') as delay, \
+            patch('courses.signals.extract_preview_video_metadata.delay'):
+        with django_capture_on_commit_callbacks(execute=True):
+            course.title = 'Renamed'
+            course.save()
+        assert not delay.called
+        buffer = BytesIO()
+        Image.new('RGB', (50, 80), color='green').save(buffer, format='PNG')
+        with django_capture_on_commit_callbacks(execute=True):
+            course.preview_image = SimpleUploadedFile('new.png', buffer.getvalue(), content_type='image/png')
+            course.save()
+        delay.assert_called_once_with(course.pk)
+
+    assert generate_course_image_derivatives(course.pk) is True
+    course.refresh_from_db()
+    assert course.preview_image_derivatives['sha256'] != record['sha256']
+    # The replaced derivatives are released and removed by the next garbage collection.
+    with override_settings(MEDIA_BLOB_GC_GRACE=0):
+        default_storage.collect_garbage()
+    assert not default_storage.exists(record['files']['card']['webp'])
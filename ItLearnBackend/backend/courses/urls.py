@@ -4,7 +4,16 @@ from . import api
 urlpatterns = [
     path('create/', api.CourseAPI.as_view(), name='create_course_api'),
     path('get/', api.CourseAPI.as_view(), name='get_courses_api'),
+    path('search/', api.CourseSearchAPI.as_view(), name='search_courses_api'),
+    path('facets/', api.CategoryFacetAPI.as_view(), name='category_facets_api'),
     path('soft_delete/<int:pk>/', api.CourseUpdateAPI.as_view(), name='soft_delete_course_api'),
     path('recovery/<int:pk>/', api.CourseUpdateAPI.as_view(), name='recover_course_api'),
+    path('bulk_publish/', api.CourseBulkUpdateAPI.as_view(), name='bulk_publish_courses_api'),
     path('detailed/<int:pk>/', api.CourseDetailAPI.as_view(), name='detailed_course_api'),
+    path('detailed/<int:pk>/videos/', api.CourseVideosAPI.as_view(), name='course_videos_api'),
+    path('rate/<int:pk>/', api.CourseRatingAPI.as_view(), name='rate_course_api'),
+    path('videos/reorder/<int:pk>/', api.VideoReorderAPI.as_view(), name='reorder_videos_api'),
+    path('videos/bulk/<int:pk>/', api.VideoIngestAPI.as_view(), name='ingest_videos_api'),
+    path('progress/batch/', api.ProgressBatchAPI.as_view(), name='progress_batch_api'),
+    path('export/<str:name>/', api.CourseExportAPI.as_view(), name='course_export_api'),
 ]
\ No newline at end of file
@@ -0,0 +1,278 @@
+import base64
+import binascii
+import datetime
+from botocore.exceptions import ClientError
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+from core.messages import COURSE_MESSAGES, MEDIA_MESSAGES
+from courses.models import Course, CourseEnrollment, Video
+from .models import UploadSession
+from .serializers import DIRECT_UPLOAD_FIELDS, DirectUploadCompleteSerializer, DirectUploadSerializer, UploadSessionSerializer
+from .signing import absolute_url, media_path, signed_url
+from .swagger_usecases import (
+    response_direct_upload_abort, response_direct_upload_complete, response_direct_upload_start, response_playback_url,
+    response_upload_created, response_upload_chunk, response_upload_finalize, upload_chunk_params,
+)
+
+
+def has_active_subscription(user):
+    return user.is_subscription_active and (
+        user.subscription_end_date is None or user.subscription_end_date > timezone.now()
+    )
+
+
+class VideoPlaybackURLAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Short-lived signed URL for a lesson video. Requires a paid enrollment, an active subscription, or a preview lesson.",
+        responses=response_playback_url
+    )
+    def get(self, request, pk):
+        user = request.user
+        paid = CourseEnrollment.objects.filter(course=OuterRef('course_id'), created_by=user, has_paid=True)
+        video = (
+            Video.objects.filter(pk=pk, course__is_published=True)
+            .annotate(paid=Exists(paid), instructor=F('course__instructor_id'))
+            .values('video_url', 'is_preview', 'paid', 'instructor').first()
+        )
+        if video is None:
+            return Response({'error': MEDIA_MESSAGES['video_not_found']}, status=status.HTTP_404_NOT_FOUND)
+        entitled = video['is_preview'] or video['paid'] or video['instructor'] == user.pk or has_active_subscription(user)
+        if not entitled:
+            return Response({'error': MEDIA_MESSAGES['purchase_required']}, status=status.HTTP_403_FORBIDDEN)
+
+        path = media_path(video['video_url'])
+        if path is None:
+            # Hosted elsewhere (e.g. a CDN); nothing for us to sign.
+            return Response({'url': video['video_url'], 'expires_at': None}, status=status.HTTP_200_OK)
+        url, expires = signed_url(path)
+        expires_at = datetime.datetime.fromtimestamp(expires, tz=datetime.timezone.utc)
+        return Response({'url': url, 'expires_at': expires_at}, status=status.HTTP_200_OK)
+
+
+class UploadSessionAPI(APIView):
+    @swagger_auto_schema(
+        operation_description="Start a resumable upload of a course preview video. Send chunks with PUT, then finalize.",
+        request_body=UploadSessionSerializer,
+        responses=response_upload_created
+    )
+    def post(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not Course.all_objects.filter(pk=serializer.validated_data['course'].pk, instructor=request.user).exists():
+            return Response({'error': COURSE_MESSAGES['not_found']}, status=status.HTTP_404_NOT_FOUND)
+        session = serializer.save(user=request.user)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadChunkAPI(APIView):
+    """
+    ``GET``/``HEAD`` report how many bytes the server has (``Upload-Offset``);
+    ``PUT`` appends the raw request body at that offset. The body is read
+    from the request stream in fixed-size pieces and written straight to
+    disk, never parsed or buffered, so chunk size does not affect memory.
+    """
+    def get_session(self, request, pk):
+        return UploadSession.objects.filter(pk=pk, user=request.user, completed_at__isnull=True).first()
+
+    @staticmethod
+    def progress(session, status_code=status.HTTP_200_OK):
+        response = Response({'offset': session.offset, 'size': session.size}, status=status_code)
+        response['Upload-Offset'] = str(session.offset)
+        response['Upload-Length'] = str(session.size)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    @swagger_auto_schema(
+        operation_description="Bytes received so far; resume by sending the chunk that starts at `offset`.",
+        responses={200: response_upload_chunk[200], 404: response_upload_chunk[404]}
+    )
+    def get(self, request, pk):
+        session = self.get_session(request, pk)
+        if session is None:
+            return Response({'error': MEDIA_MESSAGES['upload_not_found']}, status=status.HTTP_404_NOT_FOUND)
+        return self.progress(session)
+
+    @swagger_auto_schema(
+        operation_description="Append one chunk: the raw body, starting at `Upload-Offset`.",
+        manual_parameters=upload_chunk_params,
+        responses=response_upload_chunk
+    )
+    def put(self, request, pk):
+        session = self.get_session(request, pk)
+        if session is None:
+            return Response({'error': MEDIA_MESSAGES['upload_not_found']}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            length = int(request.META['CONTENT_LENGTH'])
+            offset = int(request.headers['Upload-Offset'])
+            sha256 = self.parse_checksum(request.headers.get('Upload-Checksum'))
+        except (KeyError, ValueError, binascii.Error):
+            return Response({'error': MEDIA_MESSAGES['upload_invalid_headers']}, status=status.HTTP_400_BAD_REQUEST)
+        if length > settings.RESUMABLE_UPLOAD_MAX_CHUNK:
+            return Response({'error': MEDIA_MESSAGES['upload_chunk_too_large']}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if offset != session.offset:
+            response = self.progress(session, status.HTTP_409_CONFLICT)
+            response.data['error'] = MEDIA_MESSAGES['upload_offset_mismatch']
+            return response
+
+        if not session.append(request.stream, length, sha256):
+            # 460 is the tus "Checksum Mismatch" status; the chunk was discarded.
+            response = self.progress(session, 460)
+            response.data['error'] = MEDIA_MESSAGES['upload_checksum_mismatch']
+            return response
+        return self.progress(session)
+
+    @staticmethod
+    def parse_checksum(header):
+        """``sha256 <base64 digest>``, as in the tus checksum extension."""
+        if not header:
+            return None
+        algorithm, _, value = header.partition(' ')
+        if algorithm.lower() != 'sha256':
+            raise ValueError(algorithm)
+        digest = base64.b64decode(value, validate=True)
+        if len(digest) != 32:
+            raise ValueError(value)
+        return digest
+
+
+class UploadFinalizeAPI(APIView):
+    @swagger_auto_schema(
+        operation_description="Attach a fully received upload to its course as the preview video.",
+        responses=response_upload_finalize
+    )
+    def post(self, request, pk):
+        session = UploadSession.objects.filter(pk=pk, user=request.user, completed_at__isnull=True).first()
+        if session is None:
+            return Response({'error': MEDIA_MESSAGES['upload_not_found']}, status=status.HTTP_404_NOT_FOUND)
+        if session.offset != session.size:
+            return Response(
+                {'error': MEDIA_MESSAGES['upload_incomplete'], 'offset': session.offset, 'size': session.size},
+                status=status.HTTP_409_CONFLICT,
+            )
+        course = session.finalize()
+        if course is None:
+            return Response({'error': MEDIA_MESSAGES['upload_not_found']}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'success': MEDIA_MESSAGES['upload_completed'],
+            'course': course.pk,
+            'video_url': course.course_preview_video_url(),
+        }, status=status.HTTP_200_OK)
+
+
+DIRECT_UPLOAD_SALT = 'mediafiles.direct_upload'
+
+
+def upload_target(user, field, course_id=None):
+    """The row a direct upload attaches to: the user's own course, or the user for an avatar."""
+    model = apps.get_model(DIRECT_UPLOAD_FIELDS[field])
+    if model is Course:
+        return Course.all_objects.filter(pk=course_id, instructor=user).first()
+    return user
+
+
+class DirectUploadAPI(APIView):
+    """
+    Upload straight to the bucket: ``POST`` returns a presigned PUT URL per
+    part and a token; the client PUTs each ``part_size`` slice, then posts the
+    token and the parts' ETags to ``direct-uploads/complete/``.
+    """
+    @swagger_auto_schema(
+        operation_description="Start a direct-to-bucket upload of a course preview image/video or the user's avatar.",
+        request_body=DirectUploadSerializer,
+        responses=response_direct_upload_start
+    )
+    def post(self, request):
+        serializer = DirectUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        target = upload_target(request.user, data['field'], data.get('course'))
+        if target is None:
+            return Response({'error': COURSE_MESSAGES['not_found']}, status=status.HTTP_404_NOT_FOUND)
+        field = target._meta.get_field(data['field'])
+        if not hasattr(field.storage, 'start_direct_upload'):
+            return Response({'error': MEDIA_MESSAGES['direct_upload_unavailable']}, status=status.HTTP_400_BAD_REQUEST)
+
+        name = field.storage.get_available_name(field.generate_filename(target, data['filename']), max_length=field.max_length)
+        upload = field.storage.start_direct_upload(name, data['size'], data['content_type'])
+        token = signing.dumps(
+            {
+                'name': name, 'upload_id': upload['upload_id'], 'size': data['size'],
+                'field': data['field'], 'course': data.get('course'), 'user': str(request.user.pk),
+            },
+            salt=DIRECT_UPLOAD_SALT,
+        )
+        return Response({'token': token, 'name': name, **upload}, status=status.HTTP_201_CREATED)
+
+
+class DirectUploadCompleteAPI(APIView):
+    @staticmethod
+    def load_token(request, token):
+        try:
+            upload = signing.loads(token, salt=DIRECT_UPLOAD_SALT, max_age=settings.AWS_S3_DIRECT_UPLOAD_TTL)
+        except signing.BadSignature:
+            return None
+        return upload if upload['user'] == str(request.user.pk) else None
+
+    @swagger_auto_schema(
+        operation_description="Assemble the uploaded parts and attach the file to its course or user.",
+        request_body=DirectUploadCompleteSerializer,
+        responses=response_direct_upload_complete
+    )
+    def post(self, request):
+        serializer = DirectUploadCompleteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        upload = self.load_token(request, serializer.validated_data['token'])
+        if upload is None:
+            return Response({'error': MEDIA_MESSAGES['direct_upload_invalid_token']}, status=status.HTTP_400_BAD_REQUEST)
+        target = upload_target(request.user, upload['field'], upload['course'])
+        if target is None:
+            return Response({'error': COURSE_MESSAGES['not_found']}, status=status.HTTP_404_NOT_FOUND)
+
+        storage = target._meta.get_field(upload['field']).storage
+        try:
+            size = storage.complete_direct_upload(upload['name'], upload['upload_id'], serializer.validated_data['parts'])
+        except ClientError:
+            # Unknown upload id, a wrong ETag, a part below the minimum size...
+            return Response({'error': MEDIA_MESSAGES['direct_upload_failed']}, status=status.HTTP_400_BAD_REQUEST)
+        if size != upload.get('size'):
+            # The presigned part URLs do not bound the part sizes; only the declared size was validated.
+            storage.delete(upload['name'])
+            return Response({'error': MEDIA_MESSAGES['direct_upload_size_mismatch']}, status=status.HTTP_400_BAD_REQUEST)
+        setattr(target, upload['field'], upload['name'])
+        # Course.save() adds updated_at; the post_save signals schedule derivatives and metadata.
+        target.save(update_fields=[upload['field']] + (['updated_at'] if isinstance(target, Course) else []))
+        return Response({
+            'success': MEDIA_MESSAGES['upload_completed'],
+            'field': upload['field'],
+            'url': absolute_url(storage.url(upload['name'])),
+            'size': size,
+        }, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description="Abort a direct upload and drop the parts sent so far.",
+        request_body=DirectUploadCompleteSerializer,
+        responses=response_direct_upload_abort
+    )
+    def delete(self, request):
+        upload = self.load_token(request, request.data.get('token', ''))
+        if upload is None:
+            return Response({'error': MEDIA_MESSAGES['direct_upload_invalid_token']}, status=status.HTTP_400_BAD_REQUEST)
+        storage = apps.get_model(DIRECT_UPLOAD_FIELDS[upload['field']])._meta.get_field(upload['field']).storage
+        try:
+            storage.abort_direct_upload(upload['name'], upload['upload_id'])
+        except ClientError:
+            return Response({'error': MEDIA_MESSAGES['direct_upload_failed']}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'success': MEDIA_MESSAGES['direct_upload_aborted']}, status=status.HTTP_200_OK)
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+from courses.models import Course
+from useraccounts.models import User
+
+# Bytes read from the request per write; memory per upload never exceeds this.
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class PartFile(File):
+    """
+    An assembled upload handed to storage. ``temporary_file_path`` lets
+    FileSystemStorage move it into place instead of copying it.
+    """
+    def temporary_file_path(self):
+        return self.name
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload of a course preview video. Chunks are appended to a
+    part file outside MEDIA_ROOT; ``offset`` is how many bytes are on disk.
+    ``finalize()`` moves the file into storage and attaches it to the course.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+    @property
+    def part_path(self):
+        return Path(settings.RESUMABLE_UPLOAD_DIR) / f'{self.pk}.part'
+
+    def append(self, stream, length, sha256=None):
+        """
+        Write ``length`` bytes from ``stream`` at the current offset, reading
+        ``COPY_CHUNK_SIZE`` at a time. With a ``sha256`` digest the chunk is
+        kept only if it arrived whole and matches; otherwise whatever arrived
+        is kept, so a dropped connection resumes where it stopped.
+        Returns False if the chunk was rejected.
+        """
+        with transaction.atomic():
+            # One writer per session; a retried chunk waits for the first attempt.
+            session = UploadSession.objects.select_for_update().get(pk=self.pk)
+            start = session.offset
+            length = min(length, session.size - start)
+            digest = hashlib.sha256()
+            path = session.part_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), 'r+b') as part:
+                part.seek(start)
+                remaining = length
+                while remaining:
+                    chunk = stream.read(min(COPY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    part.write(chunk)
+                    digest.update(chunk)
+                    remaining -= len(chunk)
+                accepted = sha256 is None or (not remaining and digest.digest() == sha256)
+                end = start + length - remaining if accepted else start
+                part.truncate(end)
+
+            UploadSession.objects.filter(pk=self.pk).update(offset=end, updated_at=timezone.now())
+            self.offset = end
+        return accepted
+
+    def finalize(self):
+        """
+        Attach the assembled file to the course as its preview video. Returns
+        the course, or None if a concurrent call already finalized the session.
+        """
+        with transaction.atomic():
+            # Session before course, the order append() takes it in; the loser of a race sees completed_at.
+            pending = UploadSession.objects.select_for_update().filter(pk=self.pk, completed_at__isnull=True)
+            if pending.values_list('pk', flat=True).first() is None:
+                return None
+            course = Course.all_objects.select_for_update().get(pk=self.course_id)
+            with PartFile(open(self.part_path, 'rb'), name=str(self.part_path)) as part:
+                course.preview_video.save(self.filename, part, save=False)
+            course.save(update_fields=['preview_video', 'updated_at'])
+            self.completed_at = timezone.now()
+            self.save(update_fields=['completed_at', 'updated_at'])
+        # Still there if storage already had the same content and kept its copy.
+        self.part_path.unlink(missing_ok=True)
+        return course
+
+    def discard(self):
+        self.part_path.unlink(missing_ok=True)
+        self.delete()
+
+
+class Blob(models.Model):
+    """
+    A file kept once by ``mediafiles.storage.ContentAddressedStorage``, named
+    after its SHA-256. ``refcount`` is how many saves currently point at it;
+    blobs released to zero are removed by ``collect_garbage`` after a grace period.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Backs the garbage collector's scan for released blobs.
+            models.Index(fields=['updated_at'], name='blob_unreferenced_idx', condition=models.Q(refcount=0)),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount} refs)'
+
+    @classmethod
+    def acquire(cls, name, sha256, size):
+        """Take a reference to blob ``name``, creating its row if needed. Returns True if it was new."""
+        if cls.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=timezone.now()):
+            return False
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, sha256=sha256, size=size)
+            return True
+        except IntegrityError:
+            # Another upload of the same content created it first.
+            cls.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=timezone.now())
+            return False
+
+    @classmethod
+    def release(cls, name):
+        """Drop a reference to ``name``. Returns False if no blob has that name."""
+        return bool(
+            cls.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1, updated_at=timezone.now())
+            or cls.objects.filter(name=name).exists()
+        )
+
+    @classmethod
+    def collect_garbage(cls, storage, grace, batch_size=500):
+        """
+        Delete blobs that have had no references for ``grace`` seconds, with
+        their files, ``batch_size`` rows per transaction. Rows are locked, and
+        skipped if another worker holds them, so a concurrent save that takes
+        a new reference either lands first or re-creates the blob afterwards.
+        Returns the number of blobs removed.
+        """
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        removed = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    cls.objects.select_for_update(skip_locked=True)
+                    .filter(refcount=0, updated_at__lt=cutoff).order_by('updated_at')
+                    .values_list('pk', 'name')[:batch_size]
+                )
+                for _, name in batch:
+                    storage.remove(name)
+                cls.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+            removed += len(batch)
+            if len(batch) < batch_size:
+                return removed
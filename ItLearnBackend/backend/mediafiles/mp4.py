@@ -0,0 +1,251 @@
+"""
+Duration, resolution and bitrate of MP4/MOV files, read from the ``moov`` box.
+
+Only box headers are read while walking the top level, so a multi-GB ``mdat``
+is skipped with one seek whether ``moov`` sits before it (fast-start) or after
+it; then ``moov`` itself is read, which is a few KB to a few MB. Sources are
+anything with ``seek``/``read``: a storage file, or ``HTTPRangeFile`` for
+remote URLs, which turns each read into one ``Range`` request. Remote URLs
+are only fetched from the https hosts in ``MEDIA_PROBE_HOSTS``.
+"""
+import os
+import struct
+from urllib.parse import urlsplit
+import requests
+from django.conf import settings
+from django.core.files.storage import default_storage
+from .signing import media_path
+
+# Top-level boxes a file may start with; anything else is not ISO-BMFF/QuickTime.
+TOP_LEVEL_BOXES = {b'ftyp', b'styp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pdin', b'uuid', b'sidx', b'moof'}
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'mvex'}
+MAX_TOP_LEVEL_BOXES = 1024
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+# Video.bitrate is a PositiveIntegerField, a 32-bit column on PostgreSQL; real
+# video stays far below this, so anything above comes from a bogus duration.
+MAX_BITRATE = 2 ** 31 - 1
+HTTP_TIMEOUT = 10
+
+
+class MP4Error(Exception):
+    pass
+
+
+class HTTPRangeFile:
+    """
+    A read-only file over HTTP: ``read(n)`` fetches exactly the ``n`` bytes at
+    the current position with a ``Range`` request. The server must answer
+    ranges with 206, which the media server and every CDN do.
+    """
+    def __init__(self, url, session=None):
+        self.url = url
+        self.session = session or requests.Session()
+        self.position = 0
+        self.size = None
+        self.bytes_read = 0
+
+    def fetch(self, start, length):
+        headers = {'Range': f'bytes={start}-{start + length - 1}'}
+        with self.session.get(self.url, headers=headers, stream=True, timeout=HTTP_TIMEOUT, allow_redirects=False) as response:
+            if response.status_code == 416:
+                return b''
+            if 300 <= response.status_code < 400:
+                raise MP4Error(f'{self.url} redirects; redirects are not followed')
+            response.raise_for_status()
+            if response.status_code == 206:
+                self.size = int(response.headers['Content-Range'].rsplit('/', 1)[1])
+            elif start:
+                raise MP4Error(f'{self.url} does not support range requests')
+            elif 'Content-Length' in response.headers:
+                # The whole file is on its way; only ``length`` bytes of it are read.
+                self.size = int(response.headers['Content-Length'])
+            data = response.raw.read(length, decode_content=True)
+        self.bytes_read += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_END:
+            if self.size is None:
+                self.fetch(0, 1)
+            if self.size is None:
+                raise MP4Error(f'{self.url} does not report its size')
+            offset += self.size
+        elif whence == os.SEEK_CUR:
+            offset += self.position
+        self.position = offset
+        return offset
+
+    def tell(self):
+        return self.position
+
+    def read(self, size):
+        data = self.fetch(self.position, size) if size > 0 else b''
+        self.position += len(data)
+        return data
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_media(url):
+    """
+    Our own media URLs are opened from storage; anything else is read over
+    HTTP, and only from an allowed CDN host, so a lesson URL cannot make the
+    worker fetch internal addresses.
+    """
+    path = media_path(url)
+    if path is not None:
+        if '..' in path.split('/'):
+            raise MP4Error(f'{url} is not a media path')
+        return default_storage.open(path, 'rb')
+    parts = urlsplit(url)
+    if parts.scheme != 'https' or parts.hostname not in settings.MEDIA_PROBE_HOSTS:
+        raise MP4Error(f'{url} is not on an allowed media host')
+    return HTTPRangeFile(url)
+
+
+def read_exactly(source, offset, size):
+    source.seek(offset)
+    data = source.read(size)
+    if len(data) != size:
+        raise MP4Error('file is truncated')
+    return data
+
+
+def find_moov(source, size):
+    """The payload of the top-level ``moov`` box, reading only box headers on the way."""
+    offset = 0
+    for _ in range(MAX_TOP_LEVEL_BOXES):
+        if offset + 8 > size:
+            break
+        header = read_exactly(source, offset, min(16, size - offset))
+        box_size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if box_size == 1:
+            if len(header) < 16:
+                raise MP4Error('file is truncated')
+            box_size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = size - offset
+        if box_type not in TOP_LEVEL_BOXES or box_size < header_size:
+            raise MP4Error('not an MP4/MOV file')
+        if box_type == b'moov':
+            if box_size > MAX_MOOV_SIZE:
+                raise MP4Error('moov box is too large')
+            return read_exactly(source, offset + header_size, box_size - header_size)
+        offset += box_size
+    raise MP4Error('no moov box')
+
+
+def iter_boxes(data):
+    """``(type, payload)`` of the boxes packed in ``data``."""
+    offset = 0
+    while offset + 8 <= len(data):
+        box_size, box_type = struct.unpack_from('>I4s', data, offset)
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = len(data) - offset
+        if box_size < header_size or offset + box_size > len(data):
+            raise MP4Error(f'corrupt {box_type!r} box')
+        yield box_type, data[offset + header_size:offset + box_size]
+        offset += box_size
+
+
+def walk(data, path=()):
+    """Every box under ``data`` as ``(path, payload)``, descending into containers."""
+    for box_type, payload in iter_boxes(data):
+        yield path + (box_type,), payload
+        if box_type in CONTAINER_BOXES:
+            yield from walk(payload, path + (box_type,))
+
+
+def timescale_and_duration(payload):
+    """``(timescale, duration)`` from an ``mvhd`` or ``mdhd`` payload (version 0 or 1)."""
+    if len(payload) < (32 if payload[:1] == b'\x01' else 20):
+        raise MP4Error('truncated header box')
+    if payload[0] == 1:
+        timescale, duration = struct.unpack_from('>IQ', payload, 20)
+        unknown = 0xFFFFFFFFFFFFFFFF
+    else:
+        timescale, duration = struct.unpack_from('>II', payload, 12)
+        unknown = 0xFFFFFFFF
+    return timescale, (0 if duration == unknown else duration)
+
+
+def parse_moov(moov):
+    """``(seconds, width, height)`` from a ``moov`` payload; the size is that of the first video track."""
+    seconds, fragment_duration, movie_timescale = 0.0, 0, 0
+    width = height = None
+    track_seconds, track_size, handler = 0.0, None, None
+    tracks = []
+    for path, payload in walk(moov):
+        box_type = path[-1]
+        if box_type == b'mvhd':
+            movie_timescale, duration = timescale_and_duration(payload)
+            seconds = duration / movie_timescale if movie_timescale else 0.0
+        elif box_type == b'mehd' and len(payload) >= 8:
+            fragment_duration = struct.unpack_from('>Q' if payload[0] == 1 else '>I', payload, 4)[0]
+        elif box_type == b'trak':
+            if handler is not None:
+                tracks.append((handler, track_seconds, track_size))
+            track_seconds, track_size, handler = 0.0, None, b''
+        elif box_type == b'tkhd' and len(payload) >= 8:
+            # Width and height are the last two fields, 16.16 fixed point.
+            track_size = tuple(value >> 16 for value in struct.unpack('>II', payload[-8:]))
+        elif box_type == b'mdhd':
+            timescale, duration = timescale_and_duration(payload)
+            track_seconds = duration / timescale if timescale else 0.0
+        elif box_type == b'hdlr' and len(payload) >= 12:
+            handler = payload[8:12]
+    if handler is not None:
+        tracks.append((handler, track_seconds, track_size))
+
+    if not seconds and fragment_duration and movie_timescale:
+        seconds = fragment_duration / movie_timescale
+    if not seconds:
+        seconds = max((track[1] for track in tracks), default=0.0)
+    for handler, _, size in tracks:
+        if handler == b'vide' and size and all(size):
+            width, height = size
+            break
+    return seconds, width, height
+
+
+def probe(source):
+    """
+    ``{'duration', 'width', 'height', 'bitrate'}`` of the MP4/MOV in the
+    seekable ``source``; duration in seconds, bitrate in bits per second over
+    the whole file. Raises MP4Error for anything it cannot read, including a
+    duration too short for the file's size.
+    """
+    size = source.seek(0, os.SEEK_END)
+    try:
+        seconds, width, height = parse_moov(find_moov(source, size))
+    except (struct.error, IndexError):
+        raise MP4Error('corrupt moov box')
+    if seconds <= 0:
+        raise MP4Error('no duration in moov box')
+    bitrate = int(size * 8 / seconds)
+    if bitrate > MAX_BITRATE:
+        raise MP4Error(f'implausible bitrate {bitrate} for a {seconds}s duration')
+    return {
+        'duration': round(seconds, 3),
+        'width': width,
+        'height': height,
+        'bitrate': bitrate,
+    }
+
+
+def probe_url(url):
+    with open_media(url) as source:
+        return probe(source)
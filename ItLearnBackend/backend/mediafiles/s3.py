@@ -0,0 +1,248 @@
+"""
+Media on an S3-compatible bucket (AWS S3, MinIO, Ceph, R2...).
+
+Enabled with ``MEDIA_STORAGE=s3``; see the ``AWS_S3_*`` settings. Uploads
+above ``AWS_S3_MULTIPART_THRESHOLD`` go up as multipart uploads whose parts
+are sent by a pool of ``AWS_S3_MAX_WORKERS`` threads, so one large preview
+video uses several connections at once. Clients can also upload straight to
+the bucket with presigned part URLs (``mediafiles.api.DirectUploadAPI``), in
+which case the bytes never pass through the application servers.
+
+Reads are streamed: ``open()`` returns a seekable file that issues one ranged
+GET per seek, so reading a video's header does not download the video.
+"""
+import io
+import math
+import mimetypes
+import posixpath
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import Storage
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import filepath_to_uri
+
+# S3 limits on multipart uploads.
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+
+class S3ObjectReader(io.RawIOBase):
+    """
+    A seekable read-only view of one object. Sequential reads share one
+    streaming GET; a seek drops it and the next read starts a new ranged GET
+    at the new position.
+    """
+    def __init__(self, client, bucket, key, size):
+        self.client, self.bucket, self.key, self.size = client, bucket, key, size
+        self.position = 0
+        self.body = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset != self.position:
+            self.drop_body()
+            self.position = offset
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size or not len(buffer):
+            return 0
+        if self.body is None:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key, Range=f'bytes={self.position}-')
+            self.body = response['Body']
+        data = self.body.read(len(buffer))
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def drop_body(self):
+        if self.body is not None:
+            self.body.close()
+            self.body = None
+
+    def close(self):
+        self.drop_body()
+        super().close()
+
+
+@deconstructible
+class S3Storage(Storage):
+    def __init__(self, bucket=None, endpoint_url=None, region=None, access_key=None, secret_key=None,
+                 custom_domain=None, querystring_auth=None, max_workers=None, multipart_threshold=None,
+                 multipart_chunksize=None):
+        self.bucket = bucket or settings.AWS_STORAGE_BUCKET_NAME
+        self.endpoint_url = endpoint_url or settings.AWS_S3_ENDPOINT_URL
+        self.region = region or settings.AWS_S3_REGION_NAME
+        self.access_key = access_key or settings.AWS_S3_ACCESS_KEY_ID
+        self.secret_key = secret_key or settings.AWS_S3_SECRET_ACCESS_KEY
+        self.custom_domain = custom_domain or settings.AWS_S3_CUSTOM_DOMAIN
+        self.querystring_auth = settings.AWS_S3_QUERYSTRING_AUTH if querystring_auth is None else querystring_auth
+        self.max_workers = max_workers or settings.AWS_S3_MAX_WORKERS
+        self.multipart_threshold = multipart_threshold or settings.AWS_S3_MULTIPART_THRESHOLD
+        self.multipart_chunksize = multipart_chunksize or settings.AWS_S3_MULTIPART_CHUNKSIZE
+        self._client = None
+
+    @property
+    def client(self):
+        # botocore clients are thread-safe; one per storage shares its connection pool.
+        if self._client is None:
+            self._client = boto3.session.Session().client(
+                's3',
+                endpoint_url=self.endpoint_url,
+                region_name=self.region,
+                aws_access_key_id=self.access_key,
+                aws_secret_access_key=self.secret_key,
+                config=Config(
+                    signature_version='s3v4',
+                    # Stand-ins such as MinIO serve buckets by path, not by subdomain.
+                    s3={'addressing_style': 'path' if self.endpoint_url else 'auto'},
+                    max_pool_connections=max(10, self.max_workers * 2),
+                ),
+            )
+        return self._client
+
+    @property
+    def transfer_config(self):
+        return TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.multipart_chunksize,
+            max_concurrency=self.max_workers,
+            use_threads=self.max_workers > 1,
+        )
+
+    @property
+    def base_url(self):
+        if self.custom_domain:
+            return f'https://{self.custom_domain}/'
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/"
+        return f'https://{self.bucket}.s3.{self.region}.amazonaws.com/'
+
+    def key(self, name):
+        return posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+
+    def content_type(self, name):
+        return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    def _save(self, name, content):
+        key = self.key(name)
+        extra_args = {'ContentType': getattr(content, 'content_type', None) or self.content_type(name)}
+        if hasattr(content, 'temporary_file_path'):
+            # Parts are read from the file concurrently, each worker at its own offset.
+            self.client.upload_file(content.temporary_file_path(), self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config)
+        else:
+            content.seek(0)
+            self.client.upload_fileobj(content, self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config)
+        return key
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode:
+            raise ValueError('S3 media is read-only once stored; save a new file instead.')
+        key = self.key(name)
+        try:
+            size = self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+        except ClientError as exc:
+            if exc.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(name) from exc
+            raise
+        return File(S3ObjectReader(self.client, self.bucket, key, size), name=name)
+
+    def head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        except ClientError as exc:
+            if exc.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, name):
+        return self.head(name) is not None
+
+    def size(self, name):
+        head = self.head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head['ContentLength']
+
+    def get_modified_time(self, name):
+        head = self.head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head['LastModified']
+
+    def delete(self, name):
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+
+    def url(self, name):
+        key = self.key(name)
+        if self.querystring_auth and not self.custom_domain:
+            return self.presigned_url(key)
+        return f'{self.base_url}{filepath_to_uri(key)}'
+
+    def presigned_url(self, name, ttl=None):
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self.key(name)},
+            ExpiresIn=ttl or settings.MEDIA_SIGNED_URL_TTL,
+        )
+
+    def part_size(self, size):
+        """The part size for a ``size``-byte upload: the configured one, grown to stay within 10,000 parts."""
+        return max(self.multipart_chunksize, MIN_PART_SIZE, math.ceil(size / MAX_PARTS))
+
+    def start_direct_upload(self, name, size, content_type=None):
+        """
+        Open a multipart upload of ``size`` bytes to ``name`` and presign a PUT
+        URL per part. Returns ``{'upload_id', 'part_size', 'parts': [{'part_number', 'url'}]}``;
+        the client PUTs each slice and hands the returned ETags to ``complete_direct_upload``.
+        """
+        key = self.key(name)
+        upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=key, ContentType=content_type or self.content_type(name),
+        )['UploadId']
+        part_size = self.part_size(size)
+        parts = [
+            {
+                'part_number': number,
+                'url': self.client.generate_presigned_url(
+                    'upload_part',
+                    Params={'Bucket': self.bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': number},
+                    ExpiresIn=settings.AWS_S3_DIRECT_UPLOAD_TTL,
+                ),
+            }
+            for number in range(1, max(1, math.ceil(size / part_size)) + 1)
+        ]
+        return {'upload_id': upload_id, 'part_size': part_size, 'parts': parts}
+
+    def complete_direct_upload(self, name, upload_id, parts):
+        """Assemble the uploaded ``parts`` (``{'part_number', 'etag'}``). Returns the stored size."""
+        key = self.key(name)
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={'Parts': [
+                {'PartNumber': part['part_number'], 'ETag': part['etag']}
+                for part in sorted(parts, key=lambda part: part['part_number'])
+            ]},
+        )
+        return self.size(key)
+
+    def abort_direct_upload(self, name, upload_id):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key(name), UploadId=upload_id)
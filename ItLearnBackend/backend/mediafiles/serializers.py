@@ -0,0 +1,58 @@
+import mimetypes
+from django.conf import settings
+from rest_framework import serializers
+from .models import UploadSession
+from .s3 import MAX_PARTS
+
+# Fields a client can upload straight to the bucket, and the model they belong to.
+DIRECT_UPLOAD_FIELDS = {'preview_image': 'courses.Course', 'preview_video': 'courses.Course', 'avatar': 'useraccounts.User'}
+# Content types each field accepts; the type is derived from the file name, never taken from the client.
+IMAGE_CONTENT_TYPES = frozenset({'image/jpeg', 'image/png', 'image/webp'})
+DIRECT_UPLOAD_CONTENT_TYPES = {
+    'preview_image': IMAGE_CONTENT_TYPES,
+    'preview_video': frozenset({'video/mp4', 'video/quicktime', 'video/webm'}),
+    'avatar': IMAGE_CONTENT_TYPES,
+}
+
+
+def validate_upload_size(value):
+    if not 0 < value <= settings.RESUMABLE_UPLOAD_MAX_SIZE:
+        raise serializers.ValidationError(f'Size must be between 1 and {settings.RESUMABLE_UPLOAD_MAX_SIZE} bytes.')
+    return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'course', 'filename', 'size', 'offset', 'created_at', 'completed_at']
+        read_only_fields = ['offset', 'created_at', 'completed_at']
+
+    def validate_size(self, value):
+        return validate_upload_size(value)
+
+
+class DirectUploadSerializer(serializers.Serializer):
+    field = serializers.ChoiceField(choices=sorted(DIRECT_UPLOAD_FIELDS))
+    course = serializers.IntegerField(required=False, help_text='Required for course fields.')
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(validators=[validate_upload_size])
+
+    def validate(self, attrs):
+        if DIRECT_UPLOAD_FIELDS[attrs['field']] == 'courses.Course' and attrs.get('course') is None:
+            raise serializers.ValidationError({'course': ['This field is required for course uploads.']})
+        allowed = DIRECT_UPLOAD_CONTENT_TYPES[attrs['field']]
+        content_type = mimetypes.guess_type(attrs['filename'])[0]
+        if content_type not in allowed:
+            raise serializers.ValidationError({'filename': [f"Unsupported file type; expected one of {', '.join(sorted(allowed))}."]})
+        attrs['content_type'] = content_type
+        return attrs
+
+
+class UploadedPartSerializer(serializers.Serializer):
+    part_number = serializers.IntegerField(min_value=1, max_value=MAX_PARTS)
+    etag = serializers.CharField(max_length=128)
+
+
+class DirectUploadCompleteSerializer(serializers.Serializer):
+    token = serializers.CharField()
+    parts = UploadedPartSerializer(many=True, allow_empty=False)
@@ -0,0 +1,151 @@
+"""
+Serving ``MEDIA_ROOT`` with conditional GETs and single byte ranges.
+
+Whole files go out through ``FileResponse`` (the server's ``wsgi.file_wrapper``),
+ranges through a chunked generator; neither reads more than ``CHUNK_SIZE`` at
+a time. With ``MEDIA_OFFLOAD`` set, the response only names the file and the
+front proxy (nginx ``X-Accel-Redirect`` or Apache/lighttpd ``X-Sendfile``)
+streams it, including ranges, without holding a worker.
+"""
+import mimetypes
+import posixpath
+from pathlib import Path
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    ``(first, last)`` byte positions, inclusive, for a single ``bytes=`` range
+    of a ``size``-byte file. Returns None when the whole file should be sent:
+    no header, a malformed one, or several ranges, which servers may answer
+    with the full representation. Raises RangeNotSatisfiable for ranges that
+    start past the end.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    spec = header[len('bytes='):].strip()
+    if ',' in spec:
+        return None
+    first, dash, last = spec.partition('-')
+    if not dash:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable
+            return max(size - suffix, 0), size - 1
+        first = int(first)
+        last = int(last) if last else None
+    except ValueError:
+        return None
+    if last is not None and first > last:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable
+    return first, size - 1 if last is None else min(last, size - 1)
+
+
+def _read_range(path, first, length):
+    with open(path, 'rb') as source:
+        source.seek(first)
+        while length > 0:
+            chunk = source.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _range_applies(request, etag, last_modified):
+    """``If-Range``: honor Range only if the client's copy is still current."""
+    condition = request.headers.get('If-Range')
+    if not condition:
+        return True
+    if condition.startswith(('"', 'W/')):
+        return condition == etag
+    since = parse_http_date_safe(condition)
+    return since is not None and int(last_modified) <= since
+
+
+def normalize_path(path):
+    """
+    The canonical media-relative form of ``path`` (``//`` and ``.`` collapsed),
+    so prefix checks see the file that will actually be served. ``..``
+    segments and paths that leave MEDIA_ROOT are not found.
+    """
+    if '..' in path.split('/') or '\0' in path:
+        raise Http404('Invalid media path')
+    path = posixpath.normpath(path).lstrip('/')
+    if path in ('', '.'):
+        raise Http404('Invalid media path')
+    return path
+
+
+def serve(request, path, document_root=None):
+    document_root = document_root or settings.MEDIA_ROOT
+    try:
+        fullpath = Path(safe_join(document_root, path))
+    except SuspiciousFileOperation:
+        raise Http404('Invalid media path')
+    try:
+        stat = fullpath.stat()
+    except OSError:
+        raise Http404('Media file not found')
+    if not fullpath.is_file():
+        raise Http404('Media file not found')
+
+    size = stat.st_size
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{size:x}')
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        return response
+
+    content_type, encoding = mimetypes.guess_type(str(fullpath))
+    content_type = content_type or 'application/octet-stream'
+    offload = getattr(settings, 'MEDIA_OFFLOAD', None)
+
+    if offload:
+        # The proxy does ranges and conditional requests itself.
+        response = HttpResponse(content_type=content_type)
+        if offload == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+        else:
+            response['X-Sendfile'] = str(fullpath)
+    else:
+        byte_range = None
+        if request.method in ('GET', 'HEAD') and _range_applies(request, etag, stat.st_mtime):
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range is None:
+            response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+        else:
+            first, last = byte_range
+            length = last - first + 1
+            response = StreamingHttpResponse(_read_range(fullpath, first, length), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {first}-{last}/{size}'
+            response['Content-Length'] = str(length)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from courses.models import Course
+from useraccounts.models import User
+from core.images import derivative_paths
+from .storage import ContentAddressedStorage
+
+# File columns whose stored blobs are released when replaced or when their row is deleted.
+REFERENCE_FIELDS = {
+    Course: ('preview_image', 'preview_video'),
+    User: ('avatar',),
+}
+
+# Source file column -> the JSON column recording its rendered derivatives, whose
+# blobs go with the source: on replace the record is cleared for the next render.
+DERIVATIVE_FIELDS = {
+    Course: {'preview_image': 'preview_image_derivatives'},
+    User: {'avatar': 'avatar_derivatives'},
+}
+
+
+def loaded_files(instance):
+    """``{field: name}`` of the tracked file columns that were loaded (not deferred)."""
+    return {
+        field: instance.__dict__[field] and str(instance.__dict__[field])
+        for field in REFERENCE_FIELDS[type(instance)] if field in instance.__dict__
+    }
+
+
+def release(instance, names):
+    for field, name in names:
+        storage = instance._meta.get_field(field).storage
+        if name and isinstance(storage, ContentAddressedStorage):
+            transaction.on_commit(lambda storage=storage, name=name: storage.delete(name))
+
+
+def release_derivatives(instance, field, record):
+    release(instance, [(field, path) for path in derivative_paths(record)])
+
+
+def remember_files(sender, instance, **kwargs):
+    instance._stored_files = loaded_files(instance)
+
+
+def release_replaced_files(sender, instance, created=False, update_fields=None, **kwargs):
+    stored = getattr(instance, '_stored_files', {})
+    current = loaded_files(instance)
+    if not created:
+        replaced = [
+            (field, name) for field, name in stored.items()
+            if field in current and current[field] != name and (update_fields is None or field in update_fields)
+        ]
+        release(instance, replaced)
+        for field, name in replaced:
+            record_field = DERIVATIVE_FIELDS[type(instance)].get(field)
+            if record_field:
+                # Read back rather than trusting the instance, which may hold a stale or deferred record.
+                rows = type(instance)._base_manager.filter(pk=instance.pk)
+                release_derivatives(instance, field, rows.values_list(record_field, flat=True).first())
+                rows.update(**{record_field: None})
+                setattr(instance, record_field, None)
+    instance._stored_files = current
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    release(instance, loaded_files(instance).items())
+    for field, record_field in DERIVATIVE_FIELDS[type(instance)].items():
+        if record_field in instance.__dict__:
+            release_derivatives(instance, field, instance.__dict__[record_field])
+
+
+for model in REFERENCE_FIELDS:
+    post_init.connect(remember_files, sender=model, dispatch_uid=f'remember_files_{model.__name__}')
+    post_save.connect(release_replaced_files, sender=model, dispatch_uid=f'release_replaced_files_{model.__name__}')
+    post_delete.connect(release_deleted_files, sender=model, dispatch_uid=f'release_deleted_files_{model.__name__}')
@@ -0,0 +1,55 @@
+"""
+Short-lived HMAC-signed media URLs.
+
+A URL carries ``expires`` (a Unix timestamp) and ``signature``, an HMAC of
+the media path and expiry keyed from ``SECRET_KEY``. Checking one needs no
+database access, so signed downloads cost the serving worker nothing extra.
+"""
+import time
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+SALT = 'mediafiles.signing'
+
+
+def is_protected(path):
+    return path.startswith(tuple(settings.MEDIA_PROTECTED_PREFIXES))
+
+
+def signature(path, expires):
+    return salted_hmac(SALT, f'{path}:{expires}', algorithm='sha256').hexdigest()
+
+
+def signed_url(path, ttl=None):
+    """Absolute URL for media ``path``, valid for ``ttl`` seconds. Returns ``(url, expires)``."""
+    expires = int(time.time()) + (ttl or settings.MEDIA_SIGNED_URL_TTL)
+    if hasattr(default_storage, 'presigned_url'):
+        # Media on a bucket: let the bucket check the signature.
+        return default_storage.presigned_url(path, ttl), expires
+    url = f'{absolute_url(default_storage.url(path))}?expires={expires}&signature={signature(path, expires)}'
+    return url, expires
+
+
+def verify(path, expires, given):
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return constant_time_compare(signature(path, expires), given or '')
+
+
+def absolute_url(url):
+    """A storage URL made absolute: local media is served from WEBSITE_URL, bucket URLs already are."""
+    return url if urlsplit(url).scheme else f'{settings.WEBSITE_URL}{url}'
+
+
+def media_path(url):
+    """The media-relative path of ``url`` if it points at our own media, else None."""
+    for base in (f'{settings.WEBSITE_URL}{default_storage.base_url}', default_storage.base_url):
+        if url.startswith(base):
+            return url[len(base):].split('?', 1)[0]
+    return None
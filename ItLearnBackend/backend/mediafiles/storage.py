@@ -0,0 +1,107 @@
+"""
+Content-addressed, deduplicated media storage.
+
+Every saved file is named after the SHA-256 of its bytes, under the directory
+the field asked for::
+
+    uploads/course_previews/3f/3f2a...e1.jpg
+
+so the same image uploaded for ten courses is stored once and all ten rows
+point at one name. The digest is computed while the upload streams to a
+temporary file next to its destination, then the file is renamed into place,
+or dropped if that content is already stored. ``mediafiles.Blob`` counts the
+references; ``delete()`` releases one, and ``collect_garbage`` removes blobs
+nobody has referenced for ``MEDIA_BLOB_GC_GRACE`` seconds.
+
+Files stored before this backend was enabled have no Blob row and keep the
+plain ``FileSystemStorage`` behaviour.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+COPY_CHUNK_SIZE = 1024 * 1024
+# Staging directory for uploads still being hashed; never served.
+INCOMING_DIR = '.incoming'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content, so the requested one never collides.
+        return name
+
+    def blob_name(self, name, sha256):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, sha256[:2], f'{sha256}{extension}')
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        incoming = os.path.join(self.location, INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (large uploads, assembled resumable uploads): hash it in place.
+            source = content.temporary_file_path()
+            with open(source, 'rb') as upload:
+                while chunk := upload.read(COPY_CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+            staged = None
+        else:
+            fd, staged = tempfile.mkstemp(dir=incoming)
+            with os.fdopen(fd, 'wb') as output:
+                content.seek(0)
+                for chunk in content.chunks(COPY_CHUNK_SIZE):
+                    output.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            source = staged
+
+        sha256 = digest.hexdigest()
+        blob_name = self.blob_name(name, sha256)
+        path = self.path(blob_name)
+        try:
+            Blob.acquire(blob_name, sha256, size)
+            # Placed after the reference is taken, so garbage collection of an
+            # earlier copy cannot remove it; a missing file is simply restored.
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if staged is not None:
+                    os.replace(staged, path)
+                    staged = None
+                else:
+                    file_move_safe(source, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        finally:
+            if staged is not None:
+                os.remove(staged)
+        return blob_name
+
+    def delete(self, name):
+        """Release one reference; the file itself goes once garbage collection finds it unreferenced."""
+        from .models import Blob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        if not Blob.release(name):
+            super().delete(name)
+
+    def remove(self, name):
+        """Remove the file behind ``name`` now, whatever references it."""
+        super().delete(name)
+        directory = os.path.dirname(self.path(name))
+        try:
+            os.rmdir(directory)  # The two-character shard, once empty.
+        except OSError:
+            pass
+
+    def collect_garbage(self, batch_size=None):
+        from .models import Blob
+        return Blob.collect_garbage(self, settings.MEDIA_BLOB_GC_GRACE, batch_size or settings.MEDIA_BLOB_GC_BATCH)
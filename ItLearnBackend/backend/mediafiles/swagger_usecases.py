@@ -0,0 +1,116 @@
+from drf_yasg import openapi
+
+response_playback_url = {
+    200: openapi.Response(
+        description="Signed playback URL; `expires_at` is null for lessons hosted outside our media storage",
+        examples={"application/json": {
+            "url": "http://127.0.0.1:8015/media/uploads/lessons/intro.mp4?expires=1767225600&signature=3f1c...",
+            "expires_at": "2026-01-01T00:00:00Z",
+        }},
+    ),
+    403: openapi.Response(
+        description="No paid enrollment or active subscription",
+        examples={"application/json": {"error": "Buy this course or subscribe to watch this lesson."}},
+    ),
+    404: openapi.Response(
+        description="Lesson not found",
+        examples={"application/json": {"error": "Lesson not found."}},
+    ),
+}
+
+response_upload_created = {
+    201: openapi.Response(
+        description="Upload session created; PUT chunks to /api/media/uploads/<id>/",
+        examples={"application/json": {
+            "id": "5d8f0a4e-1f53-4c1b-9b38-7b1c7d3d9a11", "course": 3, "filename": "intro.mp4",
+            "size": 3221225472, "offset": 0, "created_at": "2026-01-01T00:00:00Z", "completed_at": None,
+        }},
+    ),
+    404: openapi.Response(
+        description="Course not found or not owned by the user",
+        examples={"application/json": {"error": "Course not found or you do not have permission."}},
+    ),
+}
+
+upload_chunk_params = [
+    openapi.Parameter(
+        'Upload-Offset',
+        openapi.IN_HEADER,
+        description='Byte position of this chunk; must equal the offset the server reports.',
+        type=openapi.TYPE_INTEGER,
+        required=True,
+    ),
+    openapi.Parameter(
+        'Upload-Checksum',
+        openapi.IN_HEADER,
+        description='`sha256 <base64 digest of the chunk>`; a mismatching chunk is discarded.',
+        type=openapi.TYPE_STRING,
+        required=False,
+    ),
+]
+
+response_upload_chunk = {
+    200: openapi.Response(
+        description="Bytes received so far, also in the `Upload-Offset` header",
+        examples={"application/json": {"offset": 67108864, "size": 3221225472}},
+    ),
+    404: openapi.Response(
+        description="Upload not found or already finalized",
+        examples={"application/json": {"error": "Upload not found."}},
+    ),
+    409: openapi.Response(
+        description="`Upload-Offset` is not where the server is; resume from `offset`",
+        examples={"application/json": {"offset": 67108864, "size": 3221225472, "error": "Upload-Offset does not match the bytes received so far."}},
+    ),
+    413: openapi.Response(description="Chunk larger than the maximum chunk size"),
+    460: openapi.Response(
+        description="Checksum mismatch; the chunk was discarded",
+        examples={"application/json": {"offset": 67108864, "size": 3221225472, "error": "Chunk checksum does not match; resend it."}},
+    ),
+}
+
+response_upload_finalize = {
+    200: openapi.Response(
+        description="File attached to the course as its preview video",
+        examples={"application/json": {"success": "Upload complete.", "course": 3, "video_url": "http://127.0.0.1:8015/media/uploads/course_videos/intro.mp4"}},
+    ),
+    409: openapi.Response(
+        description="Not all bytes have been received",
+        examples={"application/json": {"error": "The upload is not complete yet.", "offset": 1024, "size": 3221225472}},
+    ),
+}
+
+response_direct_upload_start = {
+    201: openapi.Response(
+        description="PUT each `part_size` slice of the file to its URL, keep the ETag response headers, then complete",
+        examples={"application/json": {
+            "token": "eyJuYW1lIjoi...", "name": "uploads/course_videos/intro.mp4",
+            "upload_id": "2~abc", "part_size": 16777216,
+            "parts": [{"part_number": 1, "url": "https://bucket.s3.amazonaws.com/uploads/course_videos/intro.mp4?partNumber=1&uploadId=2~abc&X-Amz-Signature=..."}],
+        }},
+    ),
+    400: openapi.Response(
+        description="Invalid request, or media is not on S3-compatible storage",
+        examples={"application/json": {"error": "Direct uploads need media on S3-compatible storage."}},
+    ),
+    404: openapi.Response(
+        description="Course not found or not owned by the user",
+        examples={"application/json": {"error": "Course not found or you do not have permission."}},
+    ),
+}
+
+response_direct_upload_complete = {
+    200: openapi.Response(
+        description="Parts assembled and the file attached",
+        examples={"application/json": {"success": "Upload complete.", "field": "preview_video", "url": "https://cdn.example.com/uploads/course_videos/intro.mp4", "size": 3221225472}},
+    ),
+    400: openapi.Response(
+        description="Invalid or expired token, parts the storage rejects, or a file that does not match the declared size",
+        examples={"application/json": {"error": "This upload token is invalid or has expired."}},
+    ),
+}
+
+response_direct_upload_abort = {
+    200: openapi.Response(description="Upload aborted", examples={"application/json": {"success": "Upload aborted."}}),
+    400: response_direct_upload_complete[400],
+}
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from .models import UploadSession
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def expire_upload_sessions():
+    """Drop unfinished uploads idle for longer than RESUMABLE_UPLOAD_EXPIRY, with their part files."""
+    cutoff = timezone.now() - timedelta(seconds=settings.RESUMABLE_UPLOAD_EXPIRY)
+    stale = UploadSession.objects.filter(completed_at__isnull=True, updated_at__lt=cutoff)
+    expired = 0
+    for session in stale.iterator():
+        session.discard()
+        expired += 1
+    if expired:
+        logger.info(f"Expired {expired} idle upload sessions")
+    return expired
+
+
+@shared_task
+def collect_unreferenced_blobs():
+    """Remove stored media no course or user has referenced for MEDIA_BLOB_GC_GRACE seconds."""
+    if not hasattr(default_storage, 'collect_garbage'):
+        return 0
+    removed = default_storage.collect_garbage()
+    if removed:
+        logger.info(f"Removed {removed} unreferenced media blobs")
+    return removed
@@ -0,0 +1,752 @@
+import base64
+import hashlib
+import os
+import struct
+import tracemalloc
+from io import BytesIO
+import pytest
+from PIL import Image
+from uuid import uuid4
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.test import APIClient
+from useraccounts.conftest import create_user
+from courses.conftest import create_course
+from courses.models import Course, CourseEnrollment, Video
+from courses.tasks import extract_preview_video_metadata, extract_video_metadata, generate_course_image_derivatives
+from core.images import derivative_paths
+from useraccounts.models import User
+from .models import Blob, UploadSession
+from .s3 import S3Storage
+from .mp4 import HTTPRangeFile, MP4Error, probe, probe_url
+from .serving import RangeNotSatisfiable, parse_range
+from .signing import signed_url
+
+CONTENT = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    (tmp_path / 'uploads' / 'course_videos').mkdir(parents=True)
+    (tmp_path / 'uploads' / 'course_videos' / 'preview.mp4').write_bytes(CONTENT)
+    (tmp_path / 'uploads' / 'lessons').mkdir(parents=True)
+    (tmp_path / 'uploads' / 'lessons' / 'lesson.mp4').write_bytes(CONTENT)
+    return tmp_path
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', (0, 99)),
+    ('bytes=100-', (100, 10239)),
+    ('bytes=-100', (10140, 10239)),
+    ('bytes=10000-20000', (10000, 10239)),
+    ('bytes=-20000', (0, 10239)),
+    ('bytes=0-1,5-6', None),
+    ('bytes=9-3', None),
+    ('items=0-1', None),
+    ('bytes=abc-', None),
+    (None, None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(CONTENT)) == expected
+
+
+def test_parse_range_past_the_end():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range('bytes=10240-', len(CONTENT))
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range('bytes=-0', len(CONTENT))
+
+
+def test_serve_whole_file_and_ranges(client, media_root):
+    response = client.get('/media/uploads/course_videos/preview.mp4')
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content) == CONTENT
+    assert response['Accept-Ranges'] == 'bytes' and response['Content-Type'] == 'video/mp4'
+
+    response = client.get('/media/uploads/course_videos/preview.mp4', HTTP_RANGE='bytes=1000-1999')
+    assert response.status_code == 206
+    assert response['Content-Range'] == f'bytes 1000-1999/{len(CONTENT)}'
+    assert response['Content-Length'] == '1000'
+    assert b''.join(response.streaming_content) == CONTENT[1000:2000]
+
+    etag = response['ETag']
+    assert client.get('/media/uploads/course_videos/preview.mp4', HTTP_IF_NONE_MATCH=etag).status_code == 304
+    # A stale If-Range validator gets the whole, current file instead of a piece of it.
+    response = client.get('/media/uploads/course_videos/preview.mp4', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+    assert response.status_code == 200
+    response = client.get('/media/uploads/course_videos/preview.mp4', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+    assert response.status_code == 206
+
+    response = client.get('/media/uploads/course_videos/preview.mp4', HTTP_RANGE='bytes=20000-')
+    assert response.status_code == 416
+    assert response['Content-Range'] == f'bytes */{len(CONTENT)}'
+
+    assert client.get('/media/uploads/course_videos/missing.mp4').status_code == 404
+    assert client.get('/media/../settings.py').status_code == 404
+
+
+def test_serve_offloads_to_proxy(client, media_root, settings):
+    settings.MEDIA_OFFLOAD = 'x-accel-redirect'
+    response = client.get('/media/uploads/course_videos/preview.mp4', HTTP_RANGE='bytes=0-9')
+    assert response.status_code == 200 and response.content == b''
+    assert response['X-Accel-Redirect'] == '/protected-media/uploads/course_videos/preview.mp4'
+
+    settings.MEDIA_OFFLOAD = 'x-sendfile'
+    response = client.get('/media/uploads/course_videos/preview.mp4')
+    assert response['X-Sendfile'] == str(media_root / 'uploads' / 'course_videos' / 'preview.mp4')
+
+
+@pytest.mark.django_db
+def test_protected_media_needs_valid_signature(client, media_root, django_assert_num_queries):
+    path = 'uploads/lessons/lesson.mp4'
+    assert client.get(f'/media/{path}').status_code == 403
+
+    url, expires = signed_url(path)
+    query = url.split('?', 1)[1]
+    with django_assert_num_queries(0):
+        response = client.get(f'/media/{path}?{query}', HTTP_RANGE='bytes=0-9')
+    assert response.status_code == 206
+    assert 'private' in response['Cache-Control']
+
+    tampered = query.replace(f'expires={expires}', f'expires={expires + 3600}')
+    assert client.get(f'/media/{path}?{tampered}').status_code == 403
+    assert client.get(f'/media/uploads/lessons/other.mp4?{query}').status_code == 403
+
+    url, _ = signed_url(path, ttl=-1)
+    assert client.get(f"/media/{path}?{url.split('?', 1)[1]}").status_code == 403
+
+
+@pytest.mark.parametrize('url, status_code', [
+    ('/media/uploads//lessons/lesson.mp4', 403),
+    ('/media/./uploads/lessons/lesson.mp4', 403),
+    ('/media/avatars/../uploads/lessons/lesson.mp4', 404),
+])
+@pytest.mark.django_db
+def test_protected_media_is_not_reachable_through_path_tricks(client, media_root, url, status_code):
+    assert client.get(url).status_code == status_code
+    # A valid signature is checked against the normalized path.
+    signed, _ = signed_url('uploads/lessons/lesson.mp4')
+    query = signed.split('?', 1)[1]
+    if status_code == 403:
+        assert client.get(f'{url}?{query}').status_code == 200
+
+
+def test_staging_uploads_and_unsafe_methods_are_not_served(client, media_root):
+    (media_root / '.incoming').mkdir()
+    (media_root / '.incoming' / 'tmp1234.upload').write_bytes(CONTENT)
+    assert client.get('/media/.incoming/tmp1234.upload').status_code == 404
+    assert client.get('/media/uploads/../.incoming/tmp1234.upload').status_code == 404
+    assert client.get('/media/.//.incoming/tmp1234.upload').status_code == 404
+    assert client.head('/media/uploads/course_videos/preview.mp4').status_code == 200
+    assert client.post('/media/uploads/course_videos/preview.mp4').status_code == 405
+    assert client.delete('/media/uploads/course_videos/preview.mp4').status_code == 405
+
+
+def test_equivalent_path_of_public_media_is_served(client, media_root):
+    response = client.get('/media/uploads//course_videos/./preview.mp4')
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content) == CONTENT
+
+
+@pytest.mark.django_db
+def test_playback_url_requires_purchase_or_subscription(api_client: APIClient, create_course, settings, media_root):
+    course = create_course
+    lesson = Video.objects.create(
+        course=course, title='Lesson', description='Paid', order=1, duration=timedelta(minutes=3),
+        video_url=f'{settings.WEBSITE_URL}/media/uploads/lessons/lesson.mp4',
+    )
+    student = User.objects.create(id=uuid4(), email='student@test.com', name='Student')
+    api_client.force_authenticate(user=student)
+    url = f'/api/media/videos/{lesson.pk}/url/'
+
+    assert api_client.get(url).status_code == 403
+
+    enrollment = CourseEnrollment.objects.create(id=uuid4(), created_by=student, course=course, total_price=10, has_paid=True)
+    response = api_client.get(url)
+    assert response.status_code == 200
+    signed = response.data['url']
+    assert signed.startswith(f'{settings.WEBSITE_URL}/media/uploads/lessons/lesson.mp4?expires=')
+    assert response.data['expires_at'] > timezone.now()
+    response = APIClient().get(signed[len(settings.WEBSITE_URL):])
+    assert response.status_code == 200
+
+    CourseEnrollment.objects.filter(pk=enrollment.pk).update(has_paid=False)
+    assert api_client.get(url).status_code == 403
+    User.objects.filter(pk=student.pk).update(is_subscription_active=True, subscription_end_date=timezone.now() + timedelta(days=1))
+    api_client.force_authenticate(user=User.objects.get(pk=student.pk))
+    assert api_client.get(url).status_code == 200
+
+    Video.objects.filter(pk=lesson.pk).update(video_url='https://cdn.example.com/lesson.mp4')
+    response = api_client.get(url)
+    assert response.data == {'url': 'https://cdn.example.com/lesson.mp4', 'expires_at': None}
+    assert api_client.get('/api/media/videos/999999/url/').status_code == 404
+
+
+@pytest.fixture
+def upload_dir(settings, tmp_path):
+    settings.RESUMABLE_UPLOAD_DIR = tmp_path / 'incomplete'
+    return settings.RESUMABLE_UPLOAD_DIR
+
+
+def checksum(data):
+    return f"sha256 {base64.b64encode(hashlib.sha256(data).digest()).decode()}"
+
+
+@pytest.mark.django_db
+def test_resumable_upload(api_client: APIClient, media_root, upload_dir, create_course):
+    course = create_course
+    video = bytes(range(256)) * 4096  # 1 MiB
+    api_client.force_authenticate(user=course.instructor)
+
+    response = api_client.post('/api/media/uploads/', {'course': course.pk, 'filename': 'intro.mp4', 'size': len(video)}, format='json')
+    assert response.status_code == 201 and response.data['offset'] == 0
+    url = f"/api/media/uploads/{response.data['id']}/"
+
+    def put(start, end, offset=None, digest=None):
+        chunk = video[start:end]
+        return api_client.put(
+            url, chunk, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(start if offset is None else offset), HTTP_UPLOAD_CHECKSUM=digest or checksum(chunk),
+        )
+
+    response = put(0, 300_000)
+    assert response.status_code == 200 and response['Upload-Offset'] == '300000'
+    assert put(300_000, 600_000, offset=0).status_code == 409
+    response = put(300_000, 600_000, digest=checksum(b'other bytes'))
+    assert response.status_code == 460 and response.data['offset'] == 300_000
+    assert api_client.post(f'{url}finalize/').status_code == 409
+
+    # Resume: ask the server where it is, then continue from there.
+    response = api_client.get(url)
+    assert response.data == {'offset': 300_000, 'size': len(video)}
+    assert put(300_000, 800_000).status_code == 200
+    assert put(800_000, len(video)).data['offset'] == len(video)
+
+    stranger = User.objects.create(id=uuid4(), email='stranger@test.com', name='Stranger')
+    api_client.force_authenticate(user=stranger)
+    assert api_client.get(url).status_code == 404
+    assert api_client.post('/api/media/uploads/', {'course': course.pk, 'filename': 'x.mp4', 'size': 1}, format='json').status_code == 404
+
+    api_client.force_authenticate(user=course.instructor)
+    response = api_client.post(f'{url}finalize/')
+    assert response.status_code == 200
+    course.refresh_from_db()
+    assert course.preview_video.name == f'uploads/course_videos/{hashlib.sha256(video).hexdigest()[:2]}/{hashlib.sha256(video).hexdigest()}.mp4'
+    with course.preview_video.open('rb') as stored:
+        assert stored.read() == video
+    assert not any(upload_dir.iterdir())
+    assert api_client.get(url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_concurrent_finalize_attaches_once(api_client: APIClient, media_root, upload_dir, create_course, mocker):
+    mocker.patch('courses.signals.extract_preview_video_metadata.delay')
+    course = create_course
+    video = bytes(range(256)) * 16
+    session = UploadSession.objects.create(user=course.instructor, course=course, filename='intro.mp4', size=len(video))
+    session.append(BytesIO(video), len(video))
+
+    # Both requests passed the view's completed_at check before either finalized.
+    first, second = UploadSession.objects.get(pk=session.pk), UploadSession.objects.get(pk=session.pk)
+    assert first.finalize() == course
+    assert second.finalize() is None
+    assert UploadSession.objects.get(pk=session.pk).completed_at is not None
+
+
+class GeneratedStream:
+    """A file-like body of ``size`` bytes produced on demand, like a socket."""
+    def __init__(self, size):
+        self.remaining = size
+        self.block = bytes(range(256)) * 4096
+
+    def read(self, size):
+        size = min(size, self.remaining, len(self.block))
+        self.remaining -= size
+        return self.block[:size]
+
+
+@pytest.mark.django_db
+def test_upload_append_uses_constant_memory(media_root, upload_dir, create_course):
+    size = 256 * 1024 * 1024
+    session = UploadSession.objects.create(user=create_course.instructor, course=create_course, filename='big.mp4', size=size)
+    tracemalloc.start()
+    try:
+        for _ in range(4):
+            assert session.append(GeneratedStream(size // 4), size // 4)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert session.offset == size and session.part_path.stat().st_size == size
+    assert peak < 4 * 1024 * 1024
+    session.discard()
+
+
+def box(kind, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def full_box(kind, body, version=0):
+    return box(kind, bytes([version, 0, 0, 0]) + body)
+
+
+def track(handler, seconds, width=0, height=0, timescale=48000):
+    tkhd = struct.pack('>5I', 0, 0, 1, 0, 0) + bytes(52) + struct.pack('>II', width << 16, height << 16)
+    mdhd = struct.pack('>QQIQ', 0, 0, timescale, int(seconds * timescale)) + bytes(4)
+    hdlr = struct.pack('>I4s', 0, handler) + bytes(13)
+    return box(b'trak', full_box(b'tkhd', tkhd) + box(b'mdia', full_box(b'mdhd', mdhd, version=1) + full_box(b'hdlr', hdlr)))
+
+
+def make_moov(seconds=90.5, width=1280, height=720):
+    mvhd = struct.pack('>4I', 0, 0, 1000, int(seconds * 1000)) + bytes(80)
+    return box(b'moov', full_box(b'mvhd', mvhd) + track(b'soun', seconds) + track(b'vide', seconds, width, height))
+
+
+def make_mp4(mdat_size=4096, fast_start=False):
+    ftyp = box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41')
+    mdat = box(b'mdat', bytes(mdat_size))
+    return ftyp + make_moov() + mdat if fast_start else ftyp + mdat + make_moov()
+
+
+class CountingFile:
+    def __init__(self, source):
+        self.source, self.bytes_read, self.reads = source, 0, 0
+
+    def seek(self, *args):
+        return self.source.seek(*args)
+
+    def read(self, size):
+        self.reads += 1
+        data = self.source.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+@pytest.mark.parametrize('fast_start', [False, True])
+def test_probe_reads_moov(tmp_path, fast_start):
+    path = tmp_path / 'lesson.mp4'
+    path.write_bytes(make_mp4(fast_start=fast_start))
+    with open(path, 'rb') as source:
+        info = probe(source)
+    size = path.stat().st_size
+    assert info == {'duration': 90.5, 'width': 1280, 'height': 720, 'bitrate': int(size * 8 / 90.5)}
+
+
+def test_probe_rejects_other_files(tmp_path):
+    for content in (b'0' * 1024, b'<html><body>not a video</body></html>', box(b'ftyp', b'isom') + box(b'mdat', bytes(64))):
+        path = tmp_path / 'file.bin'
+        path.write_bytes(content)
+        with open(path, 'rb') as source, pytest.raises(MP4Error):
+            probe(source)
+
+
+def test_probe_rejects_implausible_bitrate(tmp_path):
+    path = tmp_path / 'lesson.mp4'
+    path.write_bytes(box(b'ftyp', b'isom') + box(b'mdat', bytes(300_000)) + make_moov(seconds=0.001))
+    with open(path, 'rb') as source, pytest.raises(MP4Error, match='bitrate'):
+        probe(source)
+
+
+@pytest.mark.parametrize('moov', [
+    box(b'moov', box(b'mvhd')),
+    box(b'moov', full_box(b'mvhd', bytes(8))),
+    box(b'moov', box(b'trak', box(b'mdia', box(b'mdhd')))),
+    box(b'moov', box(b'mvex', box(b'mehd'))),
+])
+def test_probe_rejects_truncated_header_boxes(tmp_path, moov):
+    path = tmp_path / 'lesson.mp4'
+    path.write_bytes(box(b'ftyp', b'isom') + moov)
+    with open(path, 'rb') as source, pytest.raises(MP4Error):
+        probe(source)
+
+
+def test_probe_multi_gb_file_reads_only_headers(tmp_path):
+    """The moov box behind a 4 GiB mdat is found with a handful of small reads."""
+    path = tmp_path / 'lecture.mp4'
+    ftyp = box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41')
+    mdat_size = 4 * 1024 ** 3
+    with open(path, 'wb') as output:
+        # A 64-bit mdat header; the payload is a hole in a sparse file.
+        output.write(ftyp + struct.pack('>I4sQ', 1, b'mdat', mdat_size))
+        output.seek(len(ftyp) + mdat_size)
+        output.write(make_moov(seconds=3600, width=1920, height=1080))
+    size = path.stat().st_size
+
+    with open(path, 'rb') as raw:
+        source = CountingFile(raw)
+        info = probe(source)
+
+    assert info['duration'] == 3600 and (info['width'], info['height']) == (1920, 1080)
+    assert info['bitrate'] == int(size * 8 / 3600)
+    assert source.reads <= 4
+    assert source.bytes_read < 4096
+
+
+class ClientResponse:
+    def __init__(self, response):
+        self.status_code, self.headers = response.status_code, response.headers
+        self.content = b''.join(response.streaming_content) if response.streaming else response.content
+
+    def raise_for_status(self):
+        assert self.status_code < 400
+
+    def read(self, size, decode_content=True):
+        return self.content[:size]
+
+    @property
+    def raw(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class ClientSession:
+    """Sends HTTPRangeFile's requests through the test client to the media server."""
+    def __init__(self, client):
+        self.client, self.requests = client, 0
+
+    def get(self, url, headers, **kwargs):
+        self.requests += 1
+        return ClientResponse(self.client.get(url, HTTP_RANGE=headers['Range']))
+
+    def close(self):
+        pass
+
+
+def test_probe_over_http_ranges(client, media_root):
+    (media_root / 'uploads' / 'course_videos' / 'remote.mp4').write_bytes(make_mp4(mdat_size=2 * 1024 * 1024))
+    session = ClientSession(client)
+    with HTTPRangeFile('/media/uploads/course_videos/remote.mp4', session=session) as source:
+        info = probe(source)
+        assert source.bytes_read < 4096 and session.requests <= 5
+    assert (info['duration'], info['width'], info['height']) == (90.5, 1280, 720)
+
+
+@pytest.mark.parametrize('url', [
+    'http://169.254.169.254/latest/meta-data/',
+    'https://localhost:6379/',
+    'http://cdn.example.com/lesson.mp4',
+    'https://cdn.example.com.attacker.net/lesson.mp4',
+    'file:///etc/passwd',
+])
+def test_probe_url_only_fetches_allowed_hosts(url, settings, mocker):
+    settings.MEDIA_PROBE_HOSTS = ['cdn.example.com']
+    get = mocker.patch('requests.Session.get')
+    with pytest.raises(MP4Error):
+        probe_url(url)
+    get.assert_not_called()
+
+
+def test_probe_does_not_follow_redirects(settings, mocker):
+    settings.MEDIA_PROBE_HOSTS = ['cdn.example.com']
+    response = mocker.MagicMock(status_code=302, headers={'Location': 'http://10.0.0.1/'})
+    get = mocker.patch('requests.Session.get')
+    get.return_value.__enter__.return_value = response
+    with pytest.raises(MP4Error):
+        probe_url('https://cdn.example.com/lesson.mp4')
+    assert get.call_args.kwargs['allow_redirects'] is False
+
+
+@pytest.mark.django_db
+def test_metadata_tasks_fill_videos_and_preview(media_root, create_course, settings, django_capture_on_commit_callbacks, mocker):
+    course = create_course
+    delay = mocker.patch('courses.tasks.extract_video_metadata.delay')
+    (media_root / 'uploads' / 'lessons' / 'intro.mp4').write_bytes(make_mp4())
+    url = f'{settings.WEBSITE_URL}/media/uploads/lessons/intro.mp4'
+    with django_capture_on_commit_callbacks(execute=True):
+        lesson = Video.objects.create(course=course, title='Intro', description='Lesson', video_url=url, order=1)
+        Video.objects.create(course=course, title='Timed', description='Lesson', video_url=url, duration=timedelta(minutes=1), order=2)
+    delay.assert_called_once_with([lesson.pk])
+
+    # A broken file is logged and skipped; the rest of the batch is still probed.
+    (media_root / 'uploads' / 'lessons' / 'broken.mp4').write_bytes(box(b'ftyp', b'isom') + box(b'moov', box(b'mvhd')))
+    broken = Video.objects.create(course=course, title='Broken', description='Lesson', video_url=url.replace('intro', 'broken'), duration=timedelta(minutes=1), order=3)
+    assert extract_video_metadata([broken.pk, lesson.pk]) == 1
+    lesson.refresh_from_db()
+    assert lesson.duration == timedelta(seconds=90.5)
+    assert (lesson.width, lesson.height) == (1280, 720) and lesson.bitrate > 0
+    assert probe_url(url)['duration'] == 90.5
+
+    # A row the database rejects is logged and skipped too.
+    rejected = Video.objects.create(course=course, title='Rejected', description='Lesson', video_url=url.replace('intro', 'rejected'), duration=timedelta(minutes=1), order=4)
+    metadata = {'duration': 90.5, 'width': 1280, 'height': 720, 'bitrate': 1000}
+    mocker.patch('courses.tasks.probe_url', side_effect=lambda video_url: {**metadata, 'bitrate': -1} if 'rejected' in video_url else metadata)
+    assert extract_video_metadata([rejected.pk, lesson.pk]) == 1
+    assert Video.objects.get(pk=rejected.pk).bitrate is None and Video.objects.get(pk=lesson.pk).bitrate == 1000
+
+    # The fixture's preview video is not an MP4: recorded, so it is not probed again.
+    assert extract_preview_video_metadata(course.pk)
+    course.refresh_from_db()
+    assert course.preview_video_metadata == {'source': course.preview_video.name}
+    assert not extract_preview_video_metadata(course.pk)
+
+    (media_root / 'uploads' / 'course_videos' / 'trailer.mp4').write_bytes(make_mp4())
+    Course.all_objects.filter(pk=course.pk).update(preview_video='uploads/course_videos/trailer.mp4')
+    assert extract_preview_video_metadata(course.pk)
+    response = APIClient().get(f'/api/courses/detailed/{course.pk}/?fields=title,video_metadata')
+    assert response.data['video_metadata'] == {'duration': 90.5, 'width': 1280, 'height': 720, 'bitrate': Course.objects.get(pk=course.pk).preview_video_metadata['bitrate']}
+
+
+@pytest.mark.django_db
+def test_duplicate_uploads_share_one_blob(media_root, create_course, django_capture_on_commit_callbacks, mocker):
+    mocker.patch('courses.signals.generate_course_image_derivatives.delay')
+    mocker.patch('courses.signals.extract_preview_video_metadata.delay')
+    first = create_course
+    with first.preview_image.open('rb') as image:
+        content = image.read()
+    second = Course.objects.create(
+        title='Copy', description='Same preview', category='Design', price=5, instructor=first.instructor,
+        preview_image=SimpleUploadedFile('other_name.JPG', content),
+    )
+    assert second.preview_image.name == first.preview_image.name
+    assert second.preview_image.name.endswith('.jpg')
+    blob = Blob.objects.get(name=first.preview_image.name)
+    assert blob.refcount == 2 and blob.size == first.preview_image.size
+    assert len(list((media_root / 'uploads' / 'course_previews').rglob('*.jpg'))) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        second.preview_image = SimpleUploadedFile('new.jpg', b'a different image')
+        second.save()
+    blob.refresh_from_db()
+    assert blob.refcount == 1
+    assert Blob.objects.get(name=second.preview_image.name).refcount == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first.delete()
+    blob.refresh_from_db()
+    assert blob.refcount == 0 and default_storage.exists(blob.name)
+
+    # Within the grace period nothing is removed; a re-upload revives the blob.
+    assert default_storage.collect_garbage() == 0
+    with default_storage.open(blob.name) as stored:
+        name = default_storage.save('uploads/course_previews/again.jpg', SimpleUploadedFile('again.jpg', stored.read()))
+    assert name == blob.name and Blob.objects.get(pk=blob.pk).refcount == 1
+    default_storage.delete(name)
+
+
+@pytest.mark.django_db
+def test_derivative_blobs_released_with_their_source(media_root, create_course, django_capture_on_commit_callbacks, mocker):
+    mocker.patch('courses.signals.generate_course_image_derivatives.delay')
+    mocker.patch('courses.signals.extract_preview_video_metadata.delay')
+    course = create_course
+
+    def rendered():
+        assert generate_course_image_derivatives(course.pk)
+        paths = derivative_paths(Course.all_objects.get(pk=course.pk).preview_image_derivatives)
+        assert paths and refcounts(paths) == {1}
+        return paths
+
+    def refcounts(paths):
+        return set(Blob.objects.filter(name__in=paths).values_list('refcount', flat=True))
+
+    paths = rendered()
+    # A new upload releases the old derivatives and clears the record for the next render.
+    buffer = BytesIO()
+    Image.new('RGB', (60, 40), color='green').save(buffer, format='PNG')
+    with django_capture_on_commit_callbacks(execute=True):
+        course.preview_image = SimpleUploadedFile('new.png', buffer.getvalue())
+        course.save()
+    assert refcounts(paths) == {0}
+    assert Course.all_objects.get(pk=course.pk).preview_image_derivatives is None
+
+    paths = rendered()
+    with django_capture_on_commit_callbacks(execute=True):
+        Course.all_objects.get(pk=course.pk).delete()
+    assert refcounts(paths) == {0}
+
+
+@pytest.mark.django_db
+def test_blob_garbage_collection_runs_in_batches(media_root, settings, django_assert_max_num_queries):
+    settings.MEDIA_BLOB_GC_GRACE = 0
+    names = [default_storage.save('uploads/course_videos/v.mp4', SimpleUploadedFile('v.mp4', bytes([i]) * 100)) for i in range(5)]
+    kept = default_storage.save('uploads/course_videos/kept.mp4', SimpleUploadedFile('kept.mp4', b'kept'))
+    assert len(set(names)) == 5
+    for name in names:
+        default_storage.delete(name)
+    assert all(default_storage.exists(name) for name in names)
+
+    # Per batch: select, delete, and the savepoint pair; three batches of at most 2.
+    with django_assert_max_num_queries(12):
+        assert default_storage.collect_garbage(batch_size=2) == 5
+    assert not any(default_storage.exists(name) for name in names)
+    assert list(Blob.objects.values_list('name', flat=True)) == [kept]
+    assert default_storage.exists(kept)
+
+
+S3_OPTIONS = {'bucket': 'itlearn-test', 'region': 'us-east-1', 'access_key': 'testing', 'secret_key': 'testing'}
+
+
+@pytest.fixture
+def s3_options():
+    """
+    Bucket options for S3 tests: a MinIO (or other) endpoint from
+    S3_TEST_ENDPOINT_URL if set, otherwise moto's in-process S3.
+    """
+    endpoint = os.environ.get('S3_TEST_ENDPOINT_URL')
+    if endpoint:
+        options = {
+            **S3_OPTIONS, 'endpoint_url': endpoint, 'bucket': f'itlearn-test-{uuid4().hex[:8]}',
+            'access_key': os.environ['S3_TEST_ACCESS_KEY'], 'secret_key': os.environ['S3_TEST_SECRET_KEY'],
+        }
+        S3Storage(**options).client.create_bucket(Bucket=options['bucket'])
+        yield options
+        return
+    moto = pytest.importorskip('moto')
+    with moto.mock_aws():
+        S3Storage(**S3_OPTIONS).client.create_bucket(Bucket=S3_OPTIONS['bucket'])
+        yield S3_OPTIONS
+
+
+def test_s3_storage_round_trip_and_ranged_reads(s3_options):
+    storage = S3Storage(**s3_options)
+    name = storage.save('uploads/course_videos/intro.mp4', SimpleUploadedFile('intro.mp4', make_mp4(mdat_size=1024 * 1024)))
+    assert name == 'uploads/course_videos/intro.mp4'
+    assert storage.exists(name) and not storage.exists('uploads/missing.mp4')
+    assert storage.get_available_name(name) != name
+    assert storage.url(name) == f'{storage.base_url}uploads/course_videos/intro.mp4'
+
+    with storage.open(name) as source:
+        assert probe(source)['duration'] == 90.5
+        source.seek(1000)
+        assert source.read(24) == make_mp4(mdat_size=1024 * 1024)[1000:1024]
+    storage.delete(name)
+    assert not storage.exists(name)
+    with pytest.raises(FileNotFoundError):
+        storage.open(name)
+
+
+def test_s3_parallel_multipart_upload(s3_options, tmp_path):
+    """A file above the threshold goes up in parts, whether by one worker or a pool."""
+    part_size = 5 * 1024 * 1024
+    content = os.urandom(part_size) * 3
+    path = tmp_path / 'lecture.mp4'
+    path.write_bytes(content)
+    for workers in (1, 8):
+        storage = S3Storage(**s3_options, max_workers=workers, multipart_threshold=part_size, multipart_chunksize=part_size)
+        with open(path, 'rb') as source:
+            name = storage.save(f'uploads/course_videos/parts_{workers}.mp4', SimpleUploadedFile('lecture.mp4', source.read()))
+        head = storage.head(name)
+        assert head['ContentLength'] == len(content)
+        assert head['ETag'].strip('"').endswith('-3')  # Assembled from 3 parts.
+        with storage.open(name) as stored:
+            assert hashlib.sha256(stored.read()).digest() == hashlib.sha256(content).digest()
+
+
+@pytest.mark.django_db
+def test_direct_upload_to_bucket(api_client: APIClient, s3_options, settings, create_course, mocker):
+    import requests
+    settings.STORAGES = {**settings.STORAGES, 'default': {
+        'BACKEND': 'mediafiles.s3.S3Storage', 'OPTIONS': {**s3_options, 'multipart_chunksize': 5 * 1024 * 1024},
+    }}
+    mocker.patch('courses.signals.extract_preview_video_metadata.delay')
+    course = create_course
+    video = make_mp4(mdat_size=12 * 1024 * 1024)
+    api_client.force_authenticate(user=course.instructor)
+
+    response = api_client.post('/api/media/direct-uploads/', {
+        'field': 'preview_video', 'course': course.pk, 'filename': 'trailer.mp4', 'size': len(video),
+    }, format='json')
+    assert response.status_code == 201
+    upload = response.data
+    assert upload['name'] == 'uploads/course_videos/trailer.mp4' and upload['part_size'] == 5 * 1024 * 1024
+    assert len(upload['parts']) == 3
+
+    parts = []
+    for part in upload['parts']:
+        start = (part['part_number'] - 1) * upload['part_size']
+        uploaded = requests.put(part['url'], data=video[start:start + upload['part_size']])
+        assert uploaded.status_code == 200
+        parts.append({'part_number': part['part_number'], 'etag': uploaded.headers['ETag']})
+
+    stranger = User.objects.create(id=uuid4(), email='stranger@test.com', name='Stranger')
+    api_client.force_authenticate(user=stranger)
+    response = api_client.post('/api/media/direct-uploads/complete/', {'token': upload['token'], 'parts': parts}, format='json')
+    assert response.status_code == 400
+
+    api_client.force_authenticate(user=course.instructor)
+    response = api_client.post('/api/media/direct-uploads/complete/', {'token': upload['token'], 'parts': parts}, format='json')
+    assert response.status_code == 200 and response.data['size'] == len(video)
+    course.refresh_from_db()
+    assert course.preview_video.name == upload['name']
+    assert course.course_preview_video_url().endswith('uploads/course_videos/trailer.mp4')
+
+    # The stored video is probed over ranged GETs, like any other storage.
+    assert extract_preview_video_metadata(course.pk)
+    course.refresh_from_db()
+    assert course.preview_video_metadata['duration'] == 90.5
+
+
+@pytest.mark.django_db
+def test_direct_upload_rejects_mismatched_or_broken_uploads(api_client: APIClient, s3_options, settings, create_course):
+    import requests
+    settings.STORAGES = {**settings.STORAGES, 'default': {'BACKEND': 'mediafiles.s3.S3Storage', 'OPTIONS': s3_options}}
+    course = create_course
+    api_client.force_authenticate(user=course.instructor)
+
+    def start(size):
+        response = api_client.post('/api/media/direct-uploads/', {
+            'field': 'preview_video', 'course': course.pk, 'filename': 'trailer.mp4', 'size': size,
+        }, format='json')
+        assert response.status_code == 201
+        return response.data
+
+    # The file that arrives is smaller than declared: rejected and removed from the bucket.
+    upload = start(4096)
+    uploaded = requests.put(upload['parts'][0]['url'], data=bytes(1024))
+    storage = S3Storage(**s3_options)
+    parts = [{'part_number': 1, 'etag': uploaded.headers['ETag']}]
+    response = api_client.post('/api/media/direct-uploads/complete/', {'token': upload['token'], 'parts': parts}, format='json')
+    assert response.status_code == 400
+    assert not storage.exists(upload['name'])
+    course.refresh_from_db()
+    assert course.preview_video.name != upload['name']
+
+    # The storage's own errors, e.g. an unknown part, are a bad request rather than a 500.
+    upload = start(4096)
+    response = api_client.post('/api/media/direct-uploads/complete/', {'token': upload['token'], 'parts': [{'part_number': 1, 'etag': '"bogus"'}]}, format='json')
+    assert response.status_code == 400
+    assert api_client.delete('/api/media/direct-uploads/complete/', {'token': upload['token']}, format='json').status_code == 200
+    assert api_client.delete('/api/media/direct-uploads/complete/', {'token': upload['token']}, format='json').status_code == 400
+
+
+@pytest.mark.django_db
+def test_direct_upload_content_type_comes_from_the_field(api_client: APIClient, s3_options, settings, create_course, mocker):
+    import requests
+    settings.STORAGES = {**settings.STORAGES, 'default': {'BACKEND': 'mediafiles.s3.S3Storage', 'OPTIONS': s3_options}}
+    course = create_course
+    api_client.force_authenticate(user=course.instructor)
+    response = api_client.post('/api/media/direct-uploads/', {
+        'field': 'preview_image', 'course': course.pk, 'filename': 'cover.html', 'size': 100, 'content_type': 'image/png',
+    }, format='json')
+    assert response.status_code == 400 and 'filename' in response.data
+
+    response = api_client.post('/api/media/direct-uploads/', {
+        'field': 'preview_image', 'course': course.pk, 'filename': 'cover.png', 'size': 100, 'content_type': 'text/html',
+    }, format='json')
+    assert response.status_code == 201
+    upload = response.data
+    uploaded = requests.put(upload['parts'][0]['url'], data=bytes(100))
+    parts = [{'part_number': 1, 'etag': uploaded.headers['ETag']}]
+    mocker.patch('courses.signals.generate_course_image_derivatives.delay')
+    response = api_client.post('/api/media/direct-uploads/complete/', {'token': upload['token'], 'parts': parts}, format='json')
+    assert response.status_code == 200
+    assert S3Storage(**s3_options).head(upload['name'])['ContentType'] == 'image/png'
+
+
+@pytest.mark.django_db
+def test_direct_upload_needs_bucket_storage(api_client: APIClient, create_course):
+    api_client.force_authenticate(user=create_course.instructor)
+    response = api_client.post('/api/media/direct-uploads/', {
+        'field': 'avatar', 'filename': 'me.png', 'size': 100,
+    }, format='json')
+    assert response.status_code == 400
+    response = api_client.post('/api/media/direct-uploads/', {
+        'field': 'preview_image', 'filename': 'cover.png', 'size': 100,
+    }, format='json')
+    assert 'course' in response.data
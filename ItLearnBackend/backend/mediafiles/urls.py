@@ -0,0 +1,11 @@
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path('videos/<int:pk>/url/', api.VideoPlaybackURLAPI.as_view(), name='video_playback_url_api'),
+    path('uploads/', api.UploadSessionAPI.as_view(), name='upload_session_api'),
+    path('uploads/<uuid:pk>/', api.UploadChunkAPI.as_view(), name='upload_chunk_api'),
+    path('uploads/<uuid:pk>/finalize/', api.UploadFinalizeAPI.as_view(), name='upload_finalize_api'),
+    path('direct-uploads/', api.DirectUploadAPI.as_view(), name='direct_upload_api'),
+    path('direct-uploads/complete/', api.DirectUploadCompleteAPI.as_view(), name='direct_upload_complete_api'),
+]
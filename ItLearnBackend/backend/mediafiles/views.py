@@ -0,0 +1,23 @@
+from django.http import Http404, HttpResponseForbidden
+from django.utils.cache import patch_cache_control
+from .serving import normalize_path, serve
+from .signing import is_protected, verify
+from .storage import INCOMING_DIR
+
+
+def serve_media(request, path):
+    """
+    Public media (previews, avatars) is served to anyone; protected prefixes
+    need a valid signed URL from ``mediafiles.api.VideoPlaybackURLAPI``.
+    """
+    path = normalize_path(path)
+    if path.split('/', 1)[0] == INCOMING_DIR:
+        # Half-written uploads under their temporary names.
+        raise Http404('Invalid media path')
+    if not is_protected(path):
+        return serve(request, path)
+    if not verify(path, request.GET.get('expires'), request.GET.get('signature')):
+        return HttpResponseForbidden()
+    response = serve(request, path)
+    patch_cache_control(response, private=True)
+    return response
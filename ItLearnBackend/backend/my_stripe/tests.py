@@ -75,6 +75,39 @@ def test_payment_cancel_view_parametrized(api_client: APIClient, create_course_e
     else:
         assert response.status_code == 401
 
+@pytest.mark.django_db
+@patch('stripe.checkout.Session.retrieve')
+@patch('stripe.Customer.retrieve')
+def test_payment_success_query_budget(
+    mock_stripe_customer_retrieve,
+    mock_stripe_session_retrieve,
+    api_client: APIClient,
+    create_course,
+    create_user,
+    query_budget,
+):
+    user = create_user
+    api_client.force_authenticate(user=user)
+    mock_session = Mock()
+    mock_session.customer = "mock_customer_id"
+    mock_session.metadata = {
+        'course_id': create_course.id,
+        'user_id': user.id,
+        'total_price': create_course.price,
+    }
+    mock_session.mode = "payment"
+    mock_stripe_session_retrieve.return_value = mock_session
+    mock_customer = Mock()
+    mock_customer.id = user.id
+    mock_customer.email = user.email
+    mock_customer.name = user.name
+    mock_stripe_customer_retrieve.return_value = mock_customer
+
+    # Course read, enrollment insert and the enrolled_students F() update;
+    # under the test transaction the atomic block adds a savepoint pair.
+    query_budget(5, lambda: api_client.get("/api/stripe/payment/success/?session_id=mock_session_id"))
+
+
 # @pytest.mark.django_db
 # @patch('stripe.Webhook.construct_event')
 # def test_webhook_checkout_session_completed(mock_construct_event, create_course, create_user, api_client:APIClient):
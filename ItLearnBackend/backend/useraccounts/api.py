@@ -15,9 +15,9 @@ from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework import status
-from .swagger_usecases import email_schema, login_request_body, login_responses, profile_update_params, profile_schema, password_reset_schema
+from .swagger_usecases import email_schema, login_request_body, login_responses, profile_update_params, profile_fields_param, profile_schema, password_reset_schema
 from .models import User
-from .mixins import ParserMixinAPI
+from .mixins import ParserMixinAPI, SparseFieldsetMixin
 
 logger = logging.getLogger('default')
 
@@ -154,9 +154,9 @@ class CustomPasswordResetConfirmAPI(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
 
-class ProfileDetailViewAPI(ParserMixinAPI, APIView):
+class ProfileDetailViewAPI(ParserMixinAPI, SparseFieldsetMixin, APIView):
     FIELDS = [
-        'email', 'name', 'avatar', 'avatar_url', 'bio', 'location',
+        'email', 'name', 'avatar', 'avatar_url', 'avatar_derivatives', 'bio', 'location',
         'phone_number', 'linkedin', 'github', 'subscription_plan',
         'subscription_start_date', 'subscription_end_date',
         'is_subscription_active', 'is_deleted',
@@ -165,11 +165,13 @@ class ProfileDetailViewAPI(ParserMixinAPI, APIView):
 
     @swagger_auto_schema(
         operation_description="Retrieve user profile details.",
+        manual_parameters=[profile_fields_param],
         responses={200: profile_schema, 401: "Not authenticated"}
     )
     def get(self, request):
         user = request.user
-        serializer = UserModelDynamicSerializer(user, fields=self.FIELDS)
+        # The user row is already loaded by authentication; ?fields= only trims the response.
+        serializer = UserModelDynamicSerializer(user, fields=self.requested_fields(request, self.FIELDS))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('useraccounts', '0026_alter_user_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_derivatives',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
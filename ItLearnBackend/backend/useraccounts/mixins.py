@@ -1,3 +1,6 @@
+import copy
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
 from rest_framework.parsers import FormParser, MultiPartParser
 
 class ParserMixinAPI:
@@ -5,3 +8,125 @@ class ParserMixinAPI:
     Mixin to add common parsers for handling form data and file uploads.
     """
     parser_classes = [FormParser, MultiPartParser]
+
+
+class SparseFieldsetMixin:
+    """
+    View mixin for a ``?fields=title,price`` query parameter that lets clients
+    ask for a subset of a whitelist. The selection is returned in whitelist
+    order, so equal selections share cache keys and ETags.
+    """
+    fields_query_param = 'fields'
+    invalid_fields_message = 'Unknown fields: {unknown}. Choose from: {allowed}.'
+
+    def requested_fields(self, request, default, allowed=None):
+        allowed = allowed or default
+        raw = request.query_params.get(self.fields_query_param, '')
+        requested = {name.strip() for name in raw.split(',') if name.strip()}
+        if not requested:
+            return list(default)
+        unknown = requested.difference(allowed)
+        if unknown:
+            raise serializers.ValidationError({self.fields_query_param: [self.invalid_fields_message.format(
+                unknown=', '.join(sorted(unknown)), allowed=', '.join(allowed),
+            )]})
+        return [name for name in allowed if name in requested]
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin accepting a ``fields`` kwarg that limits the serializer to
+    those field names.
+
+    Building a ModelSerializer's fields means introspecting the model and
+    constructing every field, only to drop the unrequested ones. The filtered
+    field set is therefore built once per ``(serializer class, fields)`` and
+    each instance gets a deep copy of it, which is what DRF itself does with
+    declared fields.
+    """
+    _field_plans = {}
+    _values_plans = {}
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        self.requested_fields = frozenset(fields) if fields is not None else None
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        key = (type(self), self.requested_fields)
+        plan = DynamicFieldsMixin._field_plans.get(key)
+        if plan is None:
+            plan = super().get_fields()
+            if self.requested_fields is not None:
+                plan = {name: field for name, field in plan.items() if name in self.requested_fields}
+            DynamicFieldsMixin._field_plans[key] = plan
+        return copy.deepcopy(plan)
+
+    @classmethod
+    def values_plan(cls, fields):
+        """A ``ValuesPlan`` that renders ``fields`` straight from ``.values()`` rows, built once."""
+        key = (cls, frozenset(fields))
+        plan = DynamicFieldsMixin._values_plans.get(key)
+        if plan is None:
+            plan = DynamicFieldsMixin._values_plans[key] = ValuesPlan(cls(fields=fields))
+        return plan
+
+
+class ValuesPlan:
+    """
+    Read-only fast path for list endpoints: renders ``.values()`` rows as the
+    serializer would render model instances, without building instances.
+
+    Supports fields backed by a model column and nested ``DynamicFieldsMixin``
+    serializers over a foreign key; method fields and reverse relations need
+    the instance, so they raise ImproperlyConfigured here.
+    """
+    UNSUPPORTED = (serializers.SerializerMethodField, serializers.BaseSerializer, serializers.RelatedField, serializers.ManyRelatedField)
+
+    def __init__(self, serializer, prefix=''):
+        model = serializer.Meta.model
+        self.steps = []
+        self.columns = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            path = prefix + field.source
+            if isinstance(field, DynamicFieldsMixin):
+                nested = ValuesPlan(field, prefix=f'{path}__')
+                self.columns.extend(nested.columns)
+                self.steps.append((name, nested, None))
+                continue
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                # The row already holds the key; emit it as is.
+                column = prefix + model._meta.get_field(field.source).attname
+                self.columns.append(column)
+                self.steps.append((name, None, (column, None)))
+                continue
+            if isinstance(field, self.UNSUPPORTED) or field.source == '*':
+                raise ImproperlyConfigured(f"{type(serializer).__name__}.{name} cannot be rendered from .values() rows")
+            model_field = model._meta.get_field(field.source)
+            # File columns come back as names; wrap them so FileField can build the URL.
+            wrap = getattr(model_field, 'attr_class', None)
+            wrap = (lambda value, model_field=model_field, wrap=wrap: wrap(None, model_field, value)) if wrap else None
+            self.columns.append(path)
+            self.steps.append((name, field, (path, wrap)))
+        self.key_column = prefix + model._meta.pk.name
+
+    def to_representation(self, row):
+        if self.key_column in row and row[self.key_column] is None:
+            return None
+        data = {}
+        for name, field, source in self.steps:
+            if source is None:
+                data[name] = field.to_representation(row)
+                continue
+            path, wrap = source
+            value = row[path]
+            if wrap is not None:
+                value = wrap(value)
+            data[name] = value if value is None or field is None else field.to_representation(value)
+        return data
+
+    def render(self, rows):
+        """Render rows fetched with ``.values(*plan.columns)``; extra keys are ignored."""
+        return [self.to_representation(row) for row in rows]
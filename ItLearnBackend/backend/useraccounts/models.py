@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, UserManager
 from uuid import uuid4
-from django.conf import settings
+from mediafiles.signing import absolute_url
 
 
 
@@ -57,10 +57,15 @@ class User(AbstractBaseUser, PermissionsMixin):
     subscription_end_date = models.DateTimeField(blank=True, null=True)
     is_subscription_active = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
+    # Rendered by useraccounts.tasks.generate_avatar_derivatives; see core/images.py.
+    avatar_derivatives = models.JSONField(null=True, blank=True, editable=False)
 
     USERNAME_FIELD = 'email'
     EMAIL_FIELD = 'email'
     REQUIRED_FIELDS = ['name',]
+    AVATAR_SIZES = {'thumbnail': (64, 64), 'card': (128, 128), 'card_2x': (256, 256)}
+    # Columns written in the background; a full save() of a stale instance must not overwrite them.
+    BACKGROUND_FIELDS = frozenset({'avatar_derivatives'})
 
     objects = CustomUserManager()
     def save(self, *args, **kwargs):
@@ -70,9 +75,14 @@ class User(AbstractBaseUser, PermissionsMixin):
             self.linkedin = f'https://{self.linkedin}'
         if self.github and not self.github.startswith(('http://', 'https://')):
             self.github = f'https://{self.github}'
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.BACKGROUND_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     def avatar_url(self):
         if self.avatar:
-            return f'{settings.WEBSITE_URL}{self.avatar.url}'
+            return absolute_url(self.avatar.url)
         return ''
@@ -5,25 +5,41 @@ from rest_framework.exceptions import ValidationError
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from django.contrib.auth.password_validation import validate_password
 from .tasks import send_confirmation_message
+from .mixins import DynamicFieldsMixin
+from core.images import DerivativeURLsField
 
 logger = logging.getLogger(__name__)
 
-class UserModelDynamicSerializer(serializers.ModelSerializer):
+def model_columns(model, fields, method_sources=None):
+    """
+    Map serializer field names to the concrete model columns they read, so
+    querysets can be narrowed with ``.only()`` to what is actually serialized.
+    """
+    method_sources = method_sources or {}
+    concrete = {field.name for field in model._meta.concrete_fields}
+    columns = {model._meta.pk.name}
+    for name in fields:
+        if name in concrete:
+            columns.add(name)
+        columns.update(method_sources.get(name, ()))
+    return sorted(columns)
+
+
+class UserModelDynamicSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Columns read by SerializerMethodFields.
+    METHOD_FIELD_SOURCES = {'avatar_url': ['avatar']}
+
     avatar = serializers.ImageField(required=False)
     avatar_url = serializers.SerializerMethodField()
-    def __init__(self, *args, **kwargs):
-        fields = kwargs.pop('fields', None)
-        super().__init__(*args, **kwargs)
-
-        if fields is not None:
-            allowed = set(fields)
-            existing = set(self.fields)
-            for field_name in existing - allowed:
-                self.fields.pop(field_name)
-                
+    avatar_derivatives = DerivativeURLsField()
+
     def get_avatar_url(self, obj):
         return obj.avatar_url()
 
+    def get_columns(self):
+        """Concrete ``User`` columns needed to serialize this field set."""
+        return model_columns(User, self.fields, self.METHOD_FIELD_SOURCES)
+
     class Meta:
         model = User
         fields = '__all__'
@@ -1,8 +1,11 @@
 import stripe
 from django.conf import settings
+from django.db import transaction
 from django.db.models.signals import post_save
 from .models import User
 from django.dispatch import receiver
+from core.images import needs_refresh
+from .tasks import generate_avatar_derivatives
 import logging
 
 # Set up Stripe API key
@@ -39,3 +42,13 @@ def create_customer_signal(sender, instance, created, **kwargs):
     if created:
         logger.info(f"Creating Stripe customer for new user: {instance.email}")
         create_stripe_customer(instance)
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_derivatives(sender, instance, update_fields=None, **kwargs):
+    """Render avatar derivatives once the upload has committed, and only if the file changed."""
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    if needs_refresh(instance.avatar, instance.avatar_derivatives):
+        user_id = instance.pk
+        transaction.on_commit(lambda: generate_avatar_derivatives.delay(user_id))
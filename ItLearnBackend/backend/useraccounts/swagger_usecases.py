@@ -99,6 +99,14 @@ password_reset_params = [
     ),
 ]
 
+profile_fields_param = openapi.Parameter(
+    name="fields",
+    in_=openapi.IN_QUERY,
+    type=openapi.TYPE_STRING,
+    description="Comma-separated subset of profile fields to return, e.g. `name,avatar_url`",
+    required=False,
+)
+
 profile_update_params = [
     openapi.Parameter(
         name="email",
@@ -1,5 +1,6 @@
 from celery import shared_task
 from helpers.messaging import send_message
+from core.images import refresh_derivatives
 from .models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.conf import settings
@@ -108,3 +109,16 @@ def send_useraccount_changes_message(user_id):
         )
     except Exception as e:
         logger.error(f"Error sending account changes email to user {user_id}: {e}")
+
+
+@shared_task
+def generate_avatar_derivatives(user_id):
+    """Render the avatar's derivatives if its content changed."""
+    user = User.objects.filter(pk=user_id).only('avatar', 'avatar_derivatives').first()
+    if user is None:
+        return False
+    record = refresh_derivatives(user.avatar, User.AVATAR_SIZES, f'uploads/avatars/derivatives/{user_id}', user.avatar_derivatives)
+    if record is None:
+        return False
+    User.objects.filter(pk=user_id).update(avatar_derivatives=record)
+    return True
@@ -175,4 +175,47 @@ def test_profile_detail_update(api_client: APIClient, create_user):
 
     assert response.status_code == 200
 
-    assert response.data['name'] == 'Updated Name'
\ No newline at end of file
+    assert response.data['name'] == 'Updated Name'
+
+@pytest.mark.django_db
+def test_profile_detail_query_budget(api_client: APIClient, create_user, query_budget):
+    api_client.force_authenticate(user=create_user)
+    query_budget(0, lambda: api_client.get('/api/user/accounts/profile/detail/'))
+
+
+@pytest.mark.django_db
+def test_profile_detail_sparse_fields(api_client: APIClient, create_user):
+    api_client.force_authenticate(user=create_user)
+    response = api_client.get('/api/user/accounts/profile/detail/', {'fields': 'name,avatar_url'})
+    assert response.status_code == 200
+    assert set(response.data) == {'name', 'avatar_url'}
+
+    response = api_client.get('/api/user/accounts/profile/detail/', {'fields': 'name,password'})
+    assert response.status_code == 400
+    assert 'password' in response.data['fields'][0]
+
+
+@pytest.mark.django_db
+def test_avatar_derivatives(api_client: APIClient, create_user):
+    from .models import User
+    from .tasks import generate_avatar_derivatives
+    user = create_user
+    assert generate_avatar_derivatives(user.pk) is False
+
+    buffer = BytesIO()
+    Image.new('RGBA', (300, 200), color=(0, 0, 255, 128)).save(buffer, format='PNG')
+    user.avatar = SimpleUploadedFile('avatar.png', buffer.getvalue(), content_type='image/png')
+    user.save()
+    assert generate_avatar_derivatives(user.pk) is True
+
+    api_client.force_authenticate(user=User.objects.get(pk=user.pk))
+    response = api_client.get('/api/user/accounts/profile/detail/', {'fields': 'avatar_url,avatar_derivatives'})
+    assert set(response.data['avatar_derivatives']) == set(User.AVATAR_SIZES)
+    assert response.data['avatar_derivatives']['card']['webp'].endswith('.webp')
+
+    # ``user`` still holds no derivatives; a full save of it must not wipe the rendered ones.
+    rendered = User.objects.get(pk=user.pk).avatar_derivatives
+    user.bio = 'Updated'
+    user.save()
+    stored = User.objects.get(pk=user.pk)
+    assert stored.bio == 'Updated' and stored.avatar_derivatives == rendered